@@ -5,23 +5,23 @@ from models import AuthProfile
 from utils.config import get_settings
 from sqlalchemy.exc import IntegrityError
 from fastapi.params import Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordBearer
-from db_module.connection import get_db
+from db_module.connection import get_async_db
 from db_module.create import create_new_user
 from schemas.schemas import (
     CreateUserRequest,
     UserLoginRequest,
     HashSlugRequest
 )
+from utils.basic_auth import invalidate_principal
+from utils.password import hash_password, verify_password
 from utils.services import app_logger
-from passlib.context import CryptContext
 
 settings = get_settings()
 
-pwd_context = CryptContext(schemes=["django_pbkdf2_sha256"], deprecated="auto")
-
 
 
 
@@ -31,7 +31,7 @@ auth_router = APIRouter(
 
 
 @auth_router.post('/register/')
-async def create_user(user: CreateUserRequest, db: Session = Depends(get_db)):
+async def create_user(user: CreateUserRequest, db: AsyncSession = Depends(get_async_db)):
     """Api to create new user
 
     Args:\n
@@ -53,17 +53,19 @@ async def create_user(user: CreateUserRequest, db: Session = Depends(get_db)):
         str : Success message and user_id\n
     """
     try:
-        hashed_password = pwd_context.hash(user.password)
-
         # Check if email already exists
-        existing_user = db.query(AuthProfile).filter(AuthProfile.email == user.email).first()
+        result = await db.execute(select(AuthProfile).where(AuthProfile.email == user.email))
+        existing_user = result.scalars().first()
         if existing_user:
             app_logger.info(f"User Creation Failed | {user.email} | User already present")
             raise HTTPException(status_code=400, detail={"flag":0 ,"message":"Your account has already been registered. Kindly login."})
+        # Hash only once the email is known to be free, the hash is the expensive part
+        hashed_password = await hash_password(user.password)
         # Create new user
         # slug = await create_unique_slug()0
         resp, message = await create_new_user(db=db, user=user, hashed_password=hashed_password)
         if resp:
+            invalidate_principal(user.email)
             user_full_name = user.first_name + user.last_name
             app_logger.info(f"User Created Successfully | {user.email} | User Created")
             return {'message': 'User created successfully', 'user_id': message}  
@@ -77,14 +79,14 @@ async def create_user(user: CreateUserRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=str(e.args))
 
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         app_logger.error(f"User Creation Failed | {user.email} | {e}")
         app_logger.trace(traceback.format_exc(e))
         raise HTTPException(status_code=400, detail='Could not create user')
     
     
 @auth_router.post('/login/')
-async def login(login_user: UserLoginRequest, db: Session = Depends(get_db)):
+async def login(login_user: UserLoginRequest, db: AsyncSession = Depends(get_async_db)):
     """This function is used to login into the portal\n
 
     Args:\n
@@ -100,14 +102,15 @@ async def login(login_user: UserLoginRequest, db: Session = Depends(get_db)):
         JWT token:\n 
     """
     # Get user from database
-    user = db.query(AuthProfile).filter(AuthProfile.email == login_user.email).first()
+    result = await db.execute(select(AuthProfile).where(AuthProfile.email == login_user.email))
+    user = result.scalars().first()
     if not user:
         app_logger.error(f"Login Failed | {None} | User does not exists")
         raise HTTPException(status_code=400, detail={"flag":1 ,"message":"Email Id is not registered"})
     
     # Verify password
     
-    if not pwd_context.verify(login_user.password, user.password):
+    if not await verify_password(login_user.password, user.password):
         app_logger.error(f"Login Failed | {user.auth_profile_id} | Invalid Password")
         raise HTTPException(status_code=400, detail={"flag":2 ,"message":'Invalid password'})
 
@@ -129,13 +132,13 @@ async def login(login_user: UserLoginRequest, db: Session = Depends(get_db)):
     refresh_token = jwt.encode(refresh_token_payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     app_logger.info(f"Login Successful | {user.auth_profile_id} | None")
     # db.commit()
-    db.close()
+    await db.close()
     return {'access_token': access_token, 'token_type': 'bearer', 'refresh_token': refresh_token, "user_details": user_data}
 
 
 
 @auth_router.post('/refresh_token/')
-async def refresh(refresh_token: HashSlugRequest, db : Session = Depends(get_db)):
+async def refresh(refresh_token: HashSlugRequest, db : AsyncSession = Depends(get_async_db)):
     """A Function to verify the\n 
 
     Args:\n
@@ -158,7 +161,8 @@ async def refresh(refresh_token: HashSlugRequest, db : Session = Depends(get_db)
 
     # Get user from database
     email = email.replace("refresh",'')
-    user = db.query(AuthProfile).filter(AuthProfile.email == email).first()
+    result = await db.execute(select(AuthProfile).where(AuthProfile.email == email))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=400, detail='User not found')
 
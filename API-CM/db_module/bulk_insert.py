@@ -0,0 +1,354 @@
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+from models import CompanyProfile
+from db_module.commit_log import record_commit
+from db_module.dataset_state import bump_generation, COMPANY_PROFILE_REWRITES
+from db_module.rollup import ROLLUP_DIMENSIONS, apply_rollup_deltas, rollup_deltas_after, row_dimensions
+from db_module.row_sample import add_to_sample, refresh_sampled_rows, sample_profiles_after
+from db_module.trigram_index import index_profiles, index_profiles_after
+from utils.metrics import ingest_derived_seconds
+from utils.services import app_logger
+
+# Columns expected in an uploaded company profile file, in table order
+CSV_COLUMNS = [
+    "first_name",
+    "last_name",
+    "email",
+    "mobile_number",
+    "city",
+    "state",
+    "country",
+    "industry",
+    "year_founded",
+]
+
+# Ingest modes, selectable per upload
+INGEST_INSERT = "insert"  # plain INSERT, a duplicate email fails the chunk
+INGEST_SKIP_DUPLICATES = "skip-duplicates"  # keep the stored row, drop the new one
+INGEST_UPSERT = "upsert"  # overwrite the stored row with the new one
+INGEST_MODES = (INGEST_INSERT, INGEST_SKIP_DUPLICATES, INGEST_UPSERT)
+
+# Columns rewritten when an upsert hits an existing email
+UPSERT_COLUMNS = [column for column in CSV_COLUMNS if column != "email"] + ["is_active", "updated_at"]
+
+company_profile_table = CompanyProfile.__table__
+
+
+def chunk_to_columns(chunk) -> dict:
+    """Turn a pandas chunk into plain python column lists (NaN -> None)"""
+    chunk = chunk[CSV_COLUMNS].astype(object)
+    chunk = chunk.where(chunk.notna(), None)
+    return {column: chunk[column].tolist() for column in CSV_COLUMNS}
+
+
+def dedupe_chunk(chunk, mode: str):
+    """Drop rows whose email repeats within the chunk.
+
+    skip-duplicates keeps the first occurrence, upsert keeps the last one (as
+    the database would end up with after applying them in order).
+
+    Returns:
+        (deduplicated chunk, number of rows dropped)
+    """
+    if mode == INGEST_INSERT or chunk.empty:
+        return chunk, 0
+    keys = chunk["email"].str.strip().str.lower()
+    duplicated = keys.duplicated(keep="first" if mode == INGEST_SKIP_DUPLICATES else "last")
+    dropped = int(duplicated.sum())
+    return (chunk[~duplicated], dropped) if dropped else (chunk, 0)
+
+
+def build_insert_statement(dialect_name: str, mode: str):
+    """INSERT for the given ingest mode in the dialect's upsert syntax"""
+    if mode == INGEST_INSERT:
+        return insert(company_profile_table)
+    if dialect_name == "mysql":
+        statement = mysql.insert(company_profile_table)
+        if mode == INGEST_SKIP_DUPLICATES:
+            # A no-op update instead of INSERT IGNORE, which would also hide truncation errors
+            return statement.on_duplicate_key_update(email=company_profile_table.c.email)
+        return statement.on_duplicate_key_update({column: statement.inserted[column] for column in UPSERT_COLUMNS})
+    if dialect_name == "sqlite":
+        statement = sqlite.insert(company_profile_table)
+        if mode == INGEST_SKIP_DUPLICATES:
+            return statement.on_conflict_do_nothing(index_elements=["email"])
+        return statement.on_conflict_do_update(
+            index_elements=["email"],
+            set_={column: statement.excluded[column] for column in UPSERT_COLUMNS},
+        )
+    raise ValueError(f"Ingest mode {mode} is not supported on {dialect_name}")
+
+
+def email_key(email: str) -> str:
+    return email.strip().lower()
+
+
+def existing_rows(db: Session, emails: list) -> dict:
+    """Stored rows of the batch, as {lower-cased email: (id, rollup dimensions)}.
+
+    A locking read (in email order, so writers lock in the same order): on
+    InnoDB it sees rows committed after the transaction's snapshot and
+    holds the rows and gaps until commit, so a concurrent writer cannot
+    insert one of these emails between this read and our INSERT.
+    """
+    table = company_profile_table
+    dimensions = [table.c[dimension] for dimension in ROLLUP_DIMENSIONS]
+    rows = db.execute(
+        select(table.c.email, table.c.id, *dimensions)
+        .where(table.c.email.in_(emails))
+        .order_by(table.c.email)
+        .with_for_update()
+    )
+    return {email_key(row[0]): (row[1], tuple(row[2:])) for row in rows}
+
+
+def profile_ids(db: Session, emails: list) -> dict:
+    """{lower-cased email: id} of stored rows, read with locks so rows we just wrote are always seen"""
+    table = company_profile_table
+    rows = db.execute(
+        select(table.c.email, table.c.id)
+        .where(table.c.email.in_(emails))
+        .order_by(table.c.email)
+        .with_for_update()
+    )
+    return {email_key(email): profile_id for email, profile_id in rows}
+
+
+def inserted_id_range(dialect_name: str, result, rows: int) -> range:
+    """Ids given to the rows of one multi-row INSERT, in VALUES order.
+
+    InnoDB hands a multi-row INSERT (a "simple insert", its row count is
+    known up front) consecutive auto-increment values in every
+    innodb_autoinc_lock_mode. lastrowid is the first of them on MySQL
+    (LAST_INSERT_ID()) and the last one on SQLite.
+    """
+    if dialect_name == "sqlite":
+        return range(result.lastrowid - rows + 1, result.lastrowid + 1)
+    return range(result.lastrowid, result.lastrowid + rows)
+
+
+def iter_batches(columns: dict, batch_size: int):
+    """Yield executemany parameter lists of at most batch_size rows"""
+    now = datetime.utcnow()
+    names = list(columns)
+    total = len(columns[names[0]]) if names else 0
+    for start in range(0, total, batch_size):
+        stop = min(start + batch_size, total)
+        values = zip(*(columns[name][start:stop] for name in names))
+        yield [
+            dict(zip(names, row), created_at=now, updated_at=now, is_active=True)
+            for row in values
+        ]
+
+
+class BulkInserter:
+    """Writes column batches into company_profile with set-based multi-row INSERTs.
+
+    Rows are sent in batches of `batch_size` rows. In insert mode a batch
+    is one multi-row INSERT and the ids it was given come from its
+    lastrowid; the other modes read the ids of their new rows back with a
+    locking SELECT. Nothing is committed until `flush`, so the caller can
+    stage a resume checkpoint in the same transaction as the rows of a chunk.
+
+    The derived tables cost more than the rows themselves: a profile has
+    about 50 trigram postings, and the rollup, sample and commit log are
+    extra writes per transaction. Their time is reported per table in
+    ingest_derived_seconds_total; TRIGRAM_INDEX_ENABLED=false and
+    QUERY_SAMPLE_SIZE=0 turn the two largest off.
+
+    Updates to shared rows (rollup counts, the sample counter and slots,
+    the rewrites generation, then the dataset generation and its commit log
+    entry) are summed over the whole transaction and applied once, in this
+    order, right before the commit. Writers then hold those locks only
+    briefly and always take them in the same order.
+    """
+
+    def __init__(self, db: Session, batch_size: int, mode: str = INGEST_INSERT, index_trigrams: bool = False,
+                 sample_size: int = 0, commit_log_size: int = None):
+        if mode not in INGEST_MODES:
+            raise ValueError(f"Unknown ingest mode {mode}")
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.mode = mode
+        self.index_trigrams = index_trigrams
+        self.sample_size = sample_size
+        self.commit_log_size = commit_log_size
+        self.dialect_name = db.get_bind().dialect.name
+        self.statement = build_insert_statement(self.dialect_name, mode)
+        self.rows_inserted = 0
+        self.batches = 0
+        self.commits = 0
+        self._started = time.perf_counter()
+        self.discard()
+
+    def discard(self):
+        """Forget what was staged for the current transaction (after a rollback)"""
+        self._deltas = Counter()
+        self._sampled = []
+        self._resampled = []
+        self._rewrites = False
+        self._inserted_ids = (None, None, 0)
+
+    def _timed(self, table: str, function, *args):
+        started = time.perf_counter()
+        function(*args)
+        ingest_derived_seconds.inc(time.perf_counter() - started, table)
+
+    def add_chunk(self, chunk) -> dict:
+        chunk, dropped = dedupe_chunk(chunk, self.mode)
+        return self.add_columns(chunk_to_columns(chunk), duplicates_dropped=dropped)
+
+    def add_columns(self, columns: dict, duplicates_dropped: int = 0) -> dict:
+        """Write one chunk of columns.
+
+        Returns:
+            counts of rows inserted, merged into existing rows (upsert) and
+            rejected as duplicates (skip-duplicates)
+        """
+        counts = {"inserted": 0, "merged": 0, "rejected": 0}
+        duplicate_key = "merged" if self.mode == INGEST_UPSERT else "rejected"
+        counts[duplicate_key] += duplicates_dropped
+        for batch in iter_batches(columns, self.batch_size):
+            stored = {}
+            if self.mode != INGEST_INSERT:
+                stored = existing_rows(self.db, [row["email"] for row in batch])
+            new_rows = []
+            for row in batch:
+                previous = stored.get(email_key(row["email"]))
+                if previous is None:
+                    new_rows.append(row)
+                    self._deltas[row_dimensions(row)] += 1
+                elif self.mode == INGEST_UPSERT:
+                    self._deltas[previous[1]] -= 1
+                    self._deltas[row_dimensions(row)] += 1
+            existing = len(batch) - len(new_rows)
+            if self.mode == INGEST_INSERT:
+                result = self.db.execute(self.statement.values(batch))
+                id_range = inserted_id_range(self.dialect_name, result, len(batch))
+                self._note_inserted(id_range[0], id_range[-1], len(id_range))
+                ids = {}
+                if self.index_trigrams or self.sample_size > 0:
+                    ids = dict(zip((email_key(row["email"]) for row in batch), id_range))
+            else:
+                self.db.execute(self.statement, batch)
+                ids = profile_ids(self.db, [row["email"] for row in new_rows]) if new_rows else {}
+                if ids:
+                    self._note_inserted(min(ids.values()), max(ids.values()), len(ids))
+            if self.index_trigrams or self.sample_size > 0:
+                self._maintain_derived(batch, new_rows, stored, ids)
+            if self.mode == INGEST_UPSERT and existing:
+                self._rewrites = True
+            counts["inserted"] += len(batch) - existing
+            counts[duplicate_key] += existing
+            self.batches += 1
+        self.rows_inserted += counts["inserted"]
+        return counts
+
+    def _note_inserted(self, low: int, high: int, rows: int):
+        noted_low, noted_high, noted_rows = self._inserted_ids
+        self._inserted_ids = (
+            low if noted_low is None else min(noted_low, low),
+            high if noted_high is None else max(noted_high, high),
+            noted_rows + rows,
+        )
+
+    def _maintain_derived(self, batch: list, new_rows: list, stored: dict, ids: dict):
+        """Trigram postings for inserted and rewritten rows; sample changes are staged for flush"""
+        rewritten = []
+        if self.mode == INGEST_UPSERT:
+            rewritten = [
+                (stored[email_key(row["email"])][0], row) for row in batch if email_key(row["email"]) in stored
+            ]
+        # Skip an email with no stored row rather than fail the chunk; the derived tables only lag for it
+        inserted = [(ids[email_key(row["email"])], row) for row in new_rows if email_key(row["email"]) in ids]
+        if self.index_trigrams:
+            replace_ids = [profile_id for profile_id, row in rewritten]
+            self._timed("trigram", index_profiles, self.db, inserted + rewritten, replace_ids)
+        if self.sample_size > 0:
+            self._sampled.extend(inserted)
+            self._resampled.extend(rewritten)
+
+    def apply_staged(self):
+        """Apply the summed rollup deltas, sample changes and rewrites bump of the transaction,
+        then bump the dataset generation with the inserted id range"""
+        self._timed("rollup", apply_rollup_deltas, self.db, self._deltas)
+        if self.sample_size > 0:
+            self._timed("sample", add_to_sample, self.db, self._sampled, self.sample_size)
+            self._timed("sample", refresh_sampled_rows, self.db, self._resampled)
+        if self._rewrites:
+            bump_generation(self.db, COMPANY_PROFILE_REWRITES)
+        self._timed("commit_log", record_commit, self.db, *self._inserted_ids, self.commit_log_size)
+        self.discard()
+
+    def flush(self):
+        self.apply_staged()
+        self.db.commit()
+        self.commits += 1
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self._started
+        return {
+            "rows_inserted": self.rows_inserted,
+            "batches": self.batches,
+            "commits": self.commits,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.rows_inserted / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+def can_load_data_infile(db: Session) -> bool:
+    return db.get_bind().dialect.name == "mysql"
+
+
+def load_data_infile(db: Session, file_path: str, header: list, index_trigrams: bool = False,
+                     sample_size: int = 0, commit_log_size: int = None) -> tuple:
+    """MySQL fast path: let the server parse the file with LOAD DATA LOCAL INFILE.
+
+    Needs `local_infile` enabled on both the client connection and the server.
+    The rows skip the validation of the parser pipeline and no rejects file
+    is written. With LOCAL the server does not fail on bad rows either: a
+    duplicate email is skipped and a value too long or not a number is
+    truncated or zeroed, each with a warning. The warning count is returned
+    for the job and the first warnings are logged.
+    The derived tables are brought up to date from the loaded rows only
+    (ids above the MAX(id) read before the load). The load runs in one
+    transaction, and its consistent reads do not see rows that other
+    writers commit meanwhile.
+    """
+    unknown = [column for column in header if column not in CSV_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unexpected columns in file: {unknown}")
+    statement = text(
+        "LOAD DATA LOCAL INFILE :file_path INTO TABLE company_profile "
+        "CHARACTER SET utf8mb4 "
+        "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+        "LINES TERMINATED BY '\\n' IGNORE 1 LINES "
+        f"({', '.join(header)}) "
+        "SET created_at = UTC_TIMESTAMP(), updated_at = UTC_TIMESTAMP(), is_active = TRUE"
+    )
+    before = db.execute(select(func.coalesce(func.max(company_profile_table.c.id), 0))).scalar()
+    result = db.execute(statement, {"file_path": os.path.abspath(file_path)})
+    # Diagnostics statements, they keep the LOAD DATA warnings readable
+    warnings = db.execute(text("SHOW COUNT(*) WARNINGS")).scalar()
+    if warnings:
+        first = db.execute(text("SHOW WARNINGS LIMIT 5")).all()
+        samples = "; ".join(f"{code} {message}" for level, code, message in first)
+        app_logger.warning(f"LOAD DATA INFILE | {file_path} | {warnings} warnings, first: {samples}")
+    # The server parsed the rows, so derive the deltas from what it stored
+    if index_trigrams:
+        index_profiles_after(db, before)
+    apply_rollup_deltas(db, rollup_deltas_after(db, before))
+    sample_profiles_after(db, before, sample_size)
+    low, high = db.execute(
+        select(func.min(company_profile_table.c.id), func.max(company_profile_table.c.id))
+        .where(company_profile_table.c.id > before)
+    ).one()
+    record_commit(db, low, high, result.rowcount, keep=commit_log_size)
+    db.commit()
+    app_logger.info(f"LOAD DATA INFILE | {file_path} | {result.rowcount} rows")
+    return result.rowcount, warnings
@@ -0,0 +1,34 @@
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from db_module.dataset_state import bump_generation, get_generation
+from models import CompanyProfileCommit
+
+
+def record_commit(db: Session, min_id: int = None, max_id: int = None, rows: int = 0, keep: int = None):
+    """Bump the company_profile generation and log the id range this transaction inserted.
+
+    Call it last before the commit: the bump locks the generation row until
+    then, so generations are handed out in commit order. Ids are not, two
+    writers can interleave auto-increment values, which is why readers
+    follow this log rather than an id high-water mark.
+
+    Args:
+        keep: generations kept in the log, older entries are deleted
+    """
+    bump_generation(db)
+    generation = get_generation(db)
+    db.execute(insert(CompanyProfileCommit).values(
+        generation=generation, min_id=min_id, max_id=max_id, row_count=rows
+    ))
+    if keep:
+        db.execute(delete(CompanyProfileCommit).where(CompanyProfileCommit.generation <= generation - keep))
+    return generation
+
+
+def commits_after(db: Session, generation: int, up_to: int) -> list:
+    """(generation, min id, max id) of the commits in (generation, up_to], in order"""
+    return db.execute(
+        select(CompanyProfileCommit.generation, CompanyProfileCommit.min_id, CompanyProfileCommit.max_id)
+        .where(CompanyProfileCommit.generation > generation, CompanyProfileCommit.generation <= up_to)
+        .order_by(CompanyProfileCommit.generation)
+    ).all()
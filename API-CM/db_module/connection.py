@@ -1,8 +1,14 @@
 from utils.config import get_settings
+import itertools
+import os
+import threading
 import urllib.parse
 from urllib.parse import quote_plus
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from utils.metrics import instrument_engine, timed_pool
 
 settings = get_settings()
 
@@ -11,17 +17,154 @@ Base = declarative_base()
 
 
 encoded_password = urllib.parse.quote_plus(settings.DB_PASSWORD)
-URL = f"mysql://{settings.DB_USERNAME}:{encoded_password}@{settings.DB_HOSTNAME}:{settings.DB_PORT}/{settings.DB_SCHEMANAME}"
+DB_CREDENTIALS = f"{settings.DB_USERNAME}:{encoded_password}"
+DB_ADDRESS = f"{DB_CREDENTIALS}@{settings.DB_HOSTNAME}:{settings.DB_PORT}/{settings.DB_SCHEMANAME}"
+# DB_URL / ASYNC_DB_URL override the MySQL URLs, e.g. sqlite / sqlite+aiosqlite for tests
+URL = settings.DB_URL or f"mysql://{DB_ADDRESS}"
+ASYNC_URL = settings.ASYNC_DB_URL or f"mysql+aiomysql://{DB_ADDRESS}"
 
 
-engine = create_engine(URL)
+def _split(value: str) -> list:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _replica_address(host: str) -> str:
+    if ":" not in host:
+        host = f"{host}:{settings.DB_PORT}"
+    return f"{DB_CREDENTIALS}@{host}/{settings.DB_SCHEMANAME}"
+
+
+# Read replicas: DB_REPLICA_HOSTS with the primary's credentials, or explicit URLs
+REPLICA_URLS = _split(settings.DB_REPLICA_URLS) or [
+    f"mysql://{_replica_address(host)}" for host in _split(settings.DB_REPLICA_HOSTS)
+]
+ASYNC_REPLICA_URLS = _split(settings.ASYNC_DB_REPLICA_URLS) or [
+    f"mysql+aiomysql://{_replica_address(host)}" for host in _split(settings.DB_REPLICA_HOSTS)
+]
+
+pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+
+# LOAD DATA LOCAL INFILE has to be allowed by the client connection as well
+connect_args = {"local_infile": 1} if settings.INGEST_USE_LOAD_DATA else {}
+
+# Synchronous engine: ingestion writers, exports and CLI tools, all off the event loop
+engine = create_engine(
+    URL, connect_args=connect_args, poolclass=timed_pool(QueuePool, "primary"), **pool_options
+)
+
+# Async engine: request handlers, so a slow query does not block the event loop
+async_engine = create_async_engine(
+    ASYNC_URL, poolclass=timed_pool(AsyncAdaptedQueuePool, "primary-async"), **pool_options
+)
 
 # DB Dependency
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Objects stay readable after commit, like the sync sessions used elsewhere expect
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+replica_engines = [
+    create_engine(url, poolclass=timed_pool(QueuePool, f"replica-{index}"), **pool_options)
+    for index, url in enumerate(REPLICA_URLS)
+]
+async_replica_engines = [
+    create_async_engine(url, poolclass=timed_pool(AsyncAdaptedQueuePool, f"replica-{index}-async"), **pool_options)
+    for index, url in enumerate(ASYNC_REPLICA_URLS)
+]
+
+# Statement timing for /metrics
+instrument_engine(engine, "primary")
+instrument_engine(async_engine.sync_engine, "primary-async")
+for index, replica in enumerate(replica_engines):
+    instrument_engine(replica, f"replica-{index}")
+for index, replica in enumerate(async_replica_engines):
+    instrument_engine(replica.sync_engine, f"replica-{index}-async")
+
+
+# Process that created the engines; a forked child must not reuse their pooled sockets
+_engine_pid = os.getpid()
+
+
+async def prepare_process():
+    """Per-process DB setup, run from the app lifespan of each API worker.
+
+    Engines connect lazily. A process forked after the parent opened
+    connections drops the inherited pools (without closing the parent's
+    sockets), then one connection is opened so an unreachable database
+    fails the worker at startup instead of on its first request.
+    """
+    global _engine_pid
+    if _engine_pid != os.getpid():
+        for sync_engine in [engine, *replica_engines]:
+            sync_engine.dispose(close=False)
+        for other_engine in [async_engine, *async_replica_engines]:
+            await other_engine.dispose(close=False)
+        _engine_pid = os.getpid()
+    async with async_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+async def dispose_engines():
+    """Close pooled connections on shutdown"""
+    for sync_engine in [engine, *replica_engines]:
+        sync_engine.dispose()
+    for other_engine in [async_engine, *async_replica_engines]:
+        await other_engine.dispose()
+
+
+class ReadRouter:
+    """Round-robin over session factories, falling back to the primary's"""
+
+    def __init__(self, factories: list, primary):
+        self.factories = factories or [primary]
+        self._cycle = itertools.cycle(self.factories)
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            return next(self._cycle)
+
+
+read_router = ReadRouter(
+    [sessionmaker(autocommit=False, autoflush=False, bind=replica) for replica in replica_engines],
+    SessionLocal,
+)
+async_read_router = ReadRouter(
+    [async_sessionmaker(replica, autoflush=False, expire_on_commit=False) for replica in async_replica_engines],
+    AsyncSessionLocal,
+)
+
+
+def ReadSessionLocal():
+    """Sync session on the next read replica, for read-only work off the event loop"""
+    return read_router.next()()
+
+
 def get_db():
     try:
         db = SessionLocal()
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_read_db():
+    """AsyncSession on a read replica (the primary when none is configured).
+
+    Only for reads that tolerate replication lag: query builder counts,
+    facets and rows. Auth and ingestion stay on get_async_db.
+    """
+    async with async_read_router.next()() as db:
+        yield db
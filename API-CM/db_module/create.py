@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from models import AuthProfile
 from schemas.schemas import CreateUserRequest
@@ -8,7 +8,7 @@ from utils.services import app_logger
 settings = get_settings()
 
 
-async def create_new_user(db: Session, user:CreateUserRequest, hashed_password):
+async def create_new_user(db: AsyncSession, user:CreateUserRequest, hashed_password):
     try:
         new_user = AuthProfile(
             first_name=user.first_name,
@@ -18,11 +18,11 @@ async def create_new_user(db: Session, user:CreateUserRequest, hashed_password):
             is_active=True,
         )
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         return True, new_user.auth_profile_id
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         app_logger.error(f"Create New User | {user.email} | Failed, {str(e)}")
         return False, str(e)
     
\ No newline at end of file
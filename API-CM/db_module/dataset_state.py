@@ -0,0 +1,41 @@
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from models import DatasetState
+
+COMPANY_PROFILE_DATASET = "company_profile"
+# Bumped when stored company_profile rows are rewritten in place (upsert merges);
+# readers that only follow new ids must reload when it changes
+COMPANY_PROFILE_REWRITES = "company_profile_rewrites"
+
+
+def get_generation(db: Session, name: str = COMPANY_PROFILE_DATASET) -> int:
+    """Current generation of a dataset; it changes whenever its rows change"""
+    generation = db.execute(select(DatasetState.generation).where(DatasetState.name == name)).scalar()
+    return generation or 0
+
+
+def bump_generation(db: Session, name: str = COMPANY_PROFILE_DATASET, step: int = 1):
+    """Stage a generation increment; commit it with the rows it describes"""
+    result = db.execute(
+        update(DatasetState)
+        .where(DatasetState.name == name)
+        .values(generation=DatasetState.generation + step)
+    )
+    if result.rowcount == 0:
+        db.execute(insert(DatasetState).values(name=name, generation=step))
+
+
+def set_generation(db: Session, name: str, generation: int):
+    result = db.execute(update(DatasetState).where(DatasetState.name == name).values(generation=generation))
+    if result.rowcount == 0:
+        db.execute(insert(DatasetState).values(name=name, generation=generation))
+
+
+def mark_backfilled(db: Session, name: str):
+    """Record that a derived table now covers every row; commit it with the rebuild"""
+    set_generation(db, name, 1)
+
+
+def is_backfilled(db: Session, name: str) -> bool:
+    """Whether a derived table was built over the whole base table (fresh install or rebuild)"""
+    return get_generation(db, name) > 0
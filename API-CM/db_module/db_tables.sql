@@ -10,6 +10,9 @@ CREATE TABLE cm_data.auth_profile (
     updated_date DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
+-- Every authenticated request resolves its user by email
+CREATE INDEX ix_auth_profile_email ON cm_data.auth_profile (email);
+
 -- To create company_profile tables
 CREATE TABLE cm_data.company_profile (
     id SERIAL PRIMARY KEY,
@@ -27,3 +30,148 @@ CREATE TABLE cm_data.company_profile (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
+-- To track CSV ingestion jobs and their resume checkpoints
+CREATE TABLE cm_data.ingestion_job (
+    job_id INT AUTO_INCREMENT PRIMARY KEY,
+    auth_profile_id INT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    file_path VARCHAR(500) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    mode VARCHAR(20) NOT NULL DEFAULT 'insert',
+    rows_parsed BIGINT NOT NULL DEFAULT 0,
+    rows_inserted BIGINT NOT NULL DEFAULT 0,
+    rows_merged BIGINT NOT NULL DEFAULT 0,
+    rows_rejected BIGINT NOT NULL DEFAULT 0,
+    rows_per_sec FLOAT NOT NULL DEFAULT 0,
+    checkpoint_offset BIGINT NOT NULL DEFAULT 0,
+    checkpoint_row BIGINT NOT NULL DEFAULT 0,
+    reject_file_path VARCHAR(500) NULL,
+    load_warnings BIGINT NOT NULL DEFAULT 0,
+    error VARCHAR(1000) NULL,
+    worker_id VARCHAR(100) NULL,
+    heartbeat_at DATETIME NULL,
+    started_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    created_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_date DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX ix_ingestion_job_status (status)
+);
+
+-- Chunks of a job committed past its checkpoint (several writers commit out of order);
+-- a resumed job skips them instead of inserting their rows again
+CREATE TABLE cm_data.ingestion_job_chunk (
+    job_id INT NOT NULL,
+    start_offset BIGINT NOT NULL,
+    end_offset BIGINT NOT NULL,
+    row_count BIGINT NOT NULL DEFAULT 0,
+    created_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (job_id, start_offset)
+);
+
+-- Content-addressed uploads, so an identical file is not ingested twice
+CREATE TABLE cm_data.uploaded_file (
+    content_hash CHAR(64) PRIMARY KEY,
+    file_path VARCHAR(500) NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    job_id INT NULL,
+    created_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_date DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Generation counter per dataset, bumped by ingestion; query caches and ETags key on it
+CREATE TABLE cm_data.dataset_state (
+    name VARCHAR(50) PRIMARY KEY,
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_date DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+INSERT INTO cm_data.dataset_state (name, generation) VALUES ('company_profile', 0);
+INSERT INTO cm_data.dataset_state (name, generation) VALUES ('company_profile_rewrites', 0);
+
+-- Id range inserted by each company_profile generation, in commit order; the
+-- columnar snapshot follows it instead of an id high-water mark
+CREATE TABLE cm_data.company_profile_commit (
+    generation BIGINT PRIMARY KEY,
+    min_id BIGINT NULL,
+    max_id BIGINT NULL,
+    row_count BIGINT NOT NULL DEFAULT 0,
+    created_date DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Row counts per exact-match dimension combination, maintained by ingestion
+-- (backfill with: python -m db_module.rollup)
+CREATE TABLE cm_data.company_profile_rollup (
+    city VARCHAR(50) NOT NULL,
+    state VARCHAR(50) NOT NULL,
+    country VARCHAR(50) NOT NULL,
+    industry VARCHAR(100) NOT NULL,
+    year_founded INT NOT NULL,
+    row_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (city, state, country, industry, year_founded)
+);
+
+-- Counts are read from the rollup only once this marker is set: on a fresh
+-- install the rollup starts complete, an existing install sets it by running
+-- the backfill above
+INSERT INTO cm_data.dataset_state (name, generation)
+SELECT 'company_profile_rollup_backfilled', 1 FROM DUAL
+WHERE NOT EXISTS (SELECT 1 FROM cm_data.company_profile);
+
+-- B-tree indexes for exact and prefix matching in the query builder
+CREATE INDEX ix_company_profile_first_name ON cm_data.company_profile (first_name);
+CREATE INDEX ix_company_profile_city ON cm_data.company_profile (city);
+CREATE INDEX ix_company_profile_state ON cm_data.company_profile (state);
+CREATE INDEX ix_company_profile_country ON cm_data.company_profile (country);
+CREATE INDEX ix_company_profile_industry ON cm_data.company_profile (industry);
+
+-- Trigram inverted index for substring filters, maintained by ingestion
+-- (backfill with: python -m db_module.trigram_index). Trigrams are stored
+-- folded (lower case, no accents) under a binary collation; an install that
+-- created the table with the default collation needs
+--   ALTER TABLE cm_data.company_profile_trigram
+--       MODIFY trigram CHAR(3) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL;
+-- followed by the backfill
+CREATE TABLE cm_data.company_profile_trigram (
+    field_name VARCHAR(20) NOT NULL,
+    trigram CHAR(3) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    profile_id INT NOT NULL,
+    PRIMARY KEY (field_name, trigram, profile_id),
+    INDEX ix_company_profile_trigram_profile_id (profile_id)
+);
+
+-- Substring filters use the index only once this marker is set (fresh
+-- install, or the backfill above)
+INSERT INTO cm_data.dataset_state (name, generation)
+SELECT 'company_profile_trigram_backfilled', 1 FROM DUAL
+WHERE NOT EXISTS (SELECT 1 FROM cm_data.company_profile);
+
+-- Uniform reservoir sample of company_profile for approximate counts,
+-- maintained by ingestion (rebuild with: python -m db_module.row_sample)
+CREATE TABLE cm_data.company_profile_sample (
+    slot INT NOT NULL PRIMARY KEY,
+    profile_id INT NOT NULL,
+    first_name VARCHAR(50) NOT NULL,
+    city VARCHAR(50) NOT NULL,
+    state VARCHAR(50) NOT NULL,
+    country VARCHAR(50) NOT NULL,
+    industry VARCHAR(100) NOT NULL,
+    year_founded INT NOT NULL,
+    INDEX ix_company_profile_sample_profile_id (profile_id)
+);
+
+INSERT INTO cm_data.dataset_state (name, generation) VALUES ('company_profile_sample', 0);
+-- Approximate counts use the sample only once this marker is set (fresh
+-- install, or the rebuild above)
+INSERT INTO cm_data.dataset_state (name, generation)
+SELECT 'company_profile_sample_backfilled', 1 FROM DUAL
+WHERE NOT EXISTS (SELECT 1 FROM cm_data.company_profile);
+
+-- Filter combinations seen by the query builder and their latency, flushed by
+-- query_builder/recorder.py (index advice: python -m query_builder.index_advisor)
+CREATE TABLE cm_data.query_pattern_stat (
+    pattern VARCHAR(255) PRIMARY KEY,
+    calls BIGINT NOT NULL DEFAULT 0,
+    total_ms DOUBLE NOT NULL DEFAULT 0,
+    max_ms DOUBLE NOT NULL DEFAULT 0,
+    sample_filters TEXT,
+    updated_date DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
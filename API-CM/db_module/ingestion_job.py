@@ -0,0 +1,231 @@
+import os
+import socket
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.orm import Session
+from models import IngestionJob, IngestionJobChunk
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+def worker_name() -> str:
+    """Identity written to ingestion_job.worker_id by the process running a job"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def create_ingestion_job(db: Session, auth_profile_id: int, file_name: str, file_path: str,
+                         mode: str = "insert", worker_id: str = None, commit: bool = True) -> IngestionJob:
+    """Queue a job for the ingest workers, or mark it running under `worker_id`
+    when the caller ingests it itself (overlapped upload).
+
+    With commit=False the job is only flushed (it has its id but no worker
+    can see it yet) and becomes claimable when the caller commits.
+    """
+    job = IngestionJob(
+        auth_profile_id=auth_profile_id,
+        file_name=file_name,
+        file_path=file_path,
+        mode=mode,
+        status=JOB_RUNNING if worker_id else JOB_QUEUED,
+        worker_id=worker_id,
+        heartbeat_at=datetime.utcnow() if worker_id else None,
+    )
+    db.add(job)
+    if commit:
+        db.commit()
+        db.refresh(job)
+    else:
+        db.flush()
+    return job
+
+
+def get_ingestion_job(db: Session, job_id: int):
+    return db.query(IngestionJob).filter(IngestionJob.job_id == job_id).first()
+
+
+def count_pending_jobs(db: Session, auth_profile_id: int = None) -> int:
+    """Queued and running jobs, overall or of one user"""
+    query = select(func.count(IngestionJob.job_id)).where(IngestionJob.status.in_([JOB_QUEUED, JOB_RUNNING]))
+    if auth_profile_id is not None:
+        query = query.where(IngestionJob.auth_profile_id == auth_profile_id)
+    return db.execute(query).scalar()
+
+
+def claim_next_job(db: Session, worker_id: str, scan: int = 100):
+    """Claim a queued job for `worker_id`, or return None.
+
+    Users with the fewest running jobs go first, then the oldest job, so
+    one user's backlog cannot hold everybody else's uploads back. The
+    claim is a conditional UPDATE on status, so concurrent workers never
+    take the same job.
+    """
+    running = Counter(
+        dict(
+            db.execute(
+                select(IngestionJob.auth_profile_id, func.count(IngestionJob.job_id))
+                .where(IngestionJob.status == JOB_RUNNING)
+                .group_by(IngestionJob.auth_profile_id)
+            ).all()
+        )
+    )
+    candidates = db.execute(
+        select(IngestionJob.job_id, IngestionJob.auth_profile_id)
+        .where(IngestionJob.status == JOB_QUEUED)
+        .order_by(IngestionJob.job_id)
+        .limit(scan)
+    ).all()
+    for job_id, auth_profile_id in sorted(candidates, key=lambda job: (running[job[1]], job[0])):
+        now = datetime.utcnow()
+        claimed = db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.job_id == job_id, IngestionJob.status == JOB_QUEUED)
+            .values(status=JOB_RUNNING, worker_id=worker_id, heartbeat_at=now)
+        ).rowcount
+        db.commit()
+        if claimed:
+            return get_ingestion_job(db, job_id)
+    return None
+
+
+def heartbeat_jobs(db: Session, worker_id: str, job_ids: list):
+    """Tell other workers these jobs are still being worked on"""
+    if not job_ids:
+        return
+    db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.job_id.in_(job_ids), IngestionJob.worker_id == worker_id,
+               IngestionJob.status == JOB_RUNNING)
+        .values(heartbeat_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+def requeue_stale_jobs(db: Session, stale_seconds: int) -> int:
+    """Put running jobs whose worker stopped heartbeating back in the queue.
+
+    They resume from their last checkpoint on the next claim.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    requeued = db.execute(
+        update(IngestionJob)
+        .where(
+            IngestionJob.status == JOB_RUNNING,
+            or_(IngestionJob.heartbeat_at < cutoff,
+                IngestionJob.heartbeat_at.is_(None) & (IngestionJob.updated_date < cutoff)),
+        )
+        .values(status=JOB_QUEUED, worker_id=None)
+    ).rowcount
+    db.commit()
+    return requeued
+
+
+def mark_job_running(db: Session, job: IngestionJob):
+    job.status = JOB_RUNNING
+    job.started_at = job.started_at or datetime.utcnow()
+    job.error = None
+    db.commit()
+
+
+def record_job_progress(db: Session, job_id: int, rows_parsed: int, rows_inserted: int, rows_merged: int,
+                        rows_rejected: int, rows_per_sec: float, checkpoint: tuple = None):
+    """Stage progress counters (and optionally the checkpoint) for the current transaction.
+
+    Counters are incremented in SQL so several writer sessions can report on
+    the same job; they are persisted by the same commit as the rows.
+    """
+    values = {
+        "rows_parsed": IngestionJob.rows_parsed + rows_parsed,
+        "rows_inserted": IngestionJob.rows_inserted + rows_inserted,
+        "rows_merged": IngestionJob.rows_merged + rows_merged,
+        "rows_rejected": IngestionJob.rows_rejected + rows_rejected,
+        "rows_per_sec": rows_per_sec,
+        "heartbeat_at": datetime.utcnow(),
+    }
+    if checkpoint is not None:
+        values["checkpoint_offset"], values["checkpoint_row"] = checkpoint
+    db.execute(update(IngestionJob).where(IngestionJob.job_id == job_id).values(**values))
+
+
+def record_committed_chunk(db: Session, job_id: int, start_offset: int, end_offset: int, rows: int):
+    """Stage the chunk's range for the current transaction, so a resume knows its rows are in"""
+    db.add(IngestionJobChunk(job_id=job_id, start_offset=start_offset, end_offset=end_offset, row_count=rows))
+
+
+def committed_chunks(db: Session, job_id: int, offset: int) -> list:
+    """Chunks committed at or past `offset`, as sorted (start offset, end offset, rows)"""
+    return [
+        tuple(chunk) for chunk in db.execute(
+            select(IngestionJobChunk.start_offset, IngestionJobChunk.end_offset, IngestionJobChunk.row_count)
+            .where(IngestionJobChunk.job_id == job_id, IngestionJobChunk.start_offset >= offset)
+            .order_by(IngestionJobChunk.start_offset)
+        ).all()
+    ]
+
+
+def prune_committed_chunks(db: Session, job_id: int, offset: int = None):
+    """Forget chunks behind the checkpoint `offset` (all of them when None), in the current transaction"""
+    query = delete(IngestionJobChunk).where(IngestionJobChunk.job_id == job_id)
+    if offset is not None:
+        query = query.where(IngestionJobChunk.end_offset <= offset)
+    db.execute(query)
+
+
+def resume_checkpoint(db: Session, job: IngestionJob, failed_job: IngestionJob):
+    """Start `job` where `failed_job`, an earlier run over the same file, stopped.
+
+    Copies its checkpoint and the chunks it committed past it, so the rows
+    it wrote are not inserted again (in insert mode they would fail the
+    unique email index). Staged in the current transaction.
+    """
+    job.checkpoint_offset = failed_job.checkpoint_offset
+    job.checkpoint_row = failed_job.checkpoint_row
+    for start_offset, end_offset, rows in committed_chunks(db, failed_job.job_id, failed_job.checkpoint_offset):
+        record_committed_chunk(db, job.job_id, start_offset, end_offset, rows)
+
+
+def advance_job_checkpoint(db: Session, job_id: int, checkpoint: tuple):
+    """Move the checkpoint forward (never backwards) in its own transaction"""
+    offset, row = checkpoint
+    db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.job_id == job_id, IngestionJob.checkpoint_offset < offset)
+        .values(checkpoint_offset=offset, checkpoint_row=row)
+    )
+    prune_committed_chunks(db, job_id, offset)
+    db.commit()
+
+
+def mark_job_finished(db: Session, job: IngestionJob, error: str = None):
+    job.status = JOB_FAILED if error else JOB_COMPLETED
+    job.error = error[:1000] if error else None
+    job.finished_at = datetime.utcnow()
+    if not error:
+        prune_committed_chunks(db, job.job_id)
+    db.commit()
+
+
+def job_to_dict(job: IngestionJob) -> dict:
+    return {
+        "job_id": job.job_id,
+        "file_name": job.file_name,
+        "status": job.status,
+        "mode": job.mode,
+        "rows_parsed": job.rows_parsed,
+        "rows_inserted": job.rows_inserted,
+        "rows_merged": job.rows_merged,
+        "rows_rejected": job.rows_rejected,
+        "rows_per_sec": job.rows_per_sec,
+        "checkpoint_offset": job.checkpoint_offset,
+        "checkpoint_row": job.checkpoint_row,
+        "reject_file_path": job.reject_file_path,
+        "load_warnings": job.load_warnings,
+        "error": job.error,
+        "worker_id": job.worker_id,
+        "created_date": job.created_date.isoformat() if job.created_date else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,85 @@
+from collections import Counter
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+from db_module.commit_log import record_commit
+from db_module.dataset_state import mark_backfilled
+from models import CompanyProfile, CompanyProfileRollup
+
+# Exact-match dimensions kept in company_profile_rollup
+ROLLUP_DIMENSIONS = ("city", "state", "country", "industry", "year_founded")
+
+rollup_table = CompanyProfileRollup.__table__
+
+# Set in dataset_state once the rollup covers every profile. Ingest keeps it in
+# step from then on; profiles loaded before the rollup existed are only
+# counted after rebuild_rollup, so readers must not trust it until then
+ROLLUP_BACKFILLED = "company_profile_rollup_backfilled"
+
+
+def row_dimensions(row: dict) -> tuple:
+    return tuple(row[dimension] for dimension in ROLLUP_DIMENSIONS)
+
+
+def _increment_statement(dialect_name: str):
+    if dialect_name == "mysql":
+        statement = mysql.insert(rollup_table)
+        return statement.on_duplicate_key_update(row_count=rollup_table.c.row_count + statement.inserted.row_count)
+    if dialect_name == "sqlite":
+        statement = sqlite.insert(rollup_table)
+        return statement.on_conflict_do_update(
+            index_elements=list(ROLLUP_DIMENSIONS),
+            set_={"row_count": rollup_table.c.row_count + statement.excluded.row_count},
+        )
+    raise ValueError(f"Rollup maintenance is not supported on {dialect_name}")
+
+
+def apply_rollup_deltas(db: Session, deltas: Counter):
+    """Stage per-dimension count changes in the current transaction.
+
+    Keys are applied in sorted order so concurrent writers take the rollup
+    row locks in the same order.
+    """
+    params = [
+        dict(zip(ROLLUP_DIMENSIONS, dimensions), row_count=delta)
+        for dimensions, delta in sorted(deltas.items())
+        if delta
+    ]
+    if params:
+        db.execute(_increment_statement(db.get_bind().dialect.name), params)
+
+
+def rollup_deltas_after(db: Session, after_id: int) -> Counter:
+    """Counts per dimension combination of the profiles with id > after_id (rows just bulk loaded)"""
+    dimensions = [getattr(CompanyProfile, dimension) for dimension in ROLLUP_DIMENSIONS]
+    rows = db.execute(select(*dimensions, func.count()).where(CompanyProfile.id > after_id).group_by(*dimensions))
+    return Counter({tuple(row[:-1]): row[-1] for row in rows})
+
+
+def rebuild_rollup(db: Session):
+    """Recompute the rollup from the base table (initial backfill or repair).
+
+    Moves the dataset generation on in the same transaction, so counts
+    cached from the old rollup are not served again.
+    """
+    dimensions = [getattr(CompanyProfile, dimension) for dimension in ROLLUP_DIMENSIONS]
+    db.execute(delete(CompanyProfileRollup))
+    db.execute(
+        insert(CompanyProfileRollup).from_select(
+            list(ROLLUP_DIMENSIONS) + ["row_count"],
+            select(*dimensions, func.count()).group_by(*dimensions),
+        )
+    )
+    mark_backfilled(db, ROLLUP_BACKFILLED)
+    record_commit(db)
+
+
+if __name__ == "__main__":
+    from db_module.connection import SessionLocal
+
+    session = SessionLocal()
+    try:
+        rebuild_rollup(session)
+        session.commit()
+    finally:
+        session.close()
@@ -0,0 +1,141 @@
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+from db_module.commit_log import record_commit
+from db_module.dataset_state import bump_generation, get_generation, mark_backfilled, set_generation
+from models import CompanyProfile, CompanyProfileSample
+
+# Columns copied into company_profile_sample; the filters run against them
+SAMPLE_FIELDS = ("first_name", "city", "state", "country", "industry", "year_founded")
+
+# dataset_state row counting the profiles offered to the reservoir so far
+SAMPLE_DATASET = "company_profile_sample"
+# Set once the sample was drawn over every profile; before rebuild_sample ran
+# on an existing table it only holds profiles ingested since the upgrade
+SAMPLE_BACKFILLED = "company_profile_sample_backfilled"
+
+sample_table = CompanyProfileSample.__table__
+
+_rng = np.random.default_rng()
+
+
+def _replace_statement(dialect_name: str):
+    """INSERT that overwrites whatever row holds the slot"""
+    columns = ["profile_id"] + list(SAMPLE_FIELDS)
+    if dialect_name == "mysql":
+        statement = mysql.insert(sample_table)
+        return statement.on_duplicate_key_update({column: statement.inserted[column] for column in columns})
+    if dialect_name == "sqlite":
+        statement = sqlite.insert(sample_table)
+        return statement.on_conflict_do_update(
+            index_elements=["slot"],
+            set_={column: statement.excluded[column] for column in columns},
+        )
+    raise ValueError(f"Sample maintenance is not supported on {dialect_name}")
+
+
+def _sample_row(slot: int, profile_id: int, row: dict) -> dict:
+    return dict({field: row[field] for field in SAMPLE_FIELDS}, slot=slot, profile_id=profile_id)
+
+
+def add_to_sample(db: Session, rows: list, sample_size: int):
+    """Offer newly inserted profiles to the reservoir (Algorithm R).
+
+    The i-th profile ever offered fills slot i while the reservoir is not
+    full, and afterwards replaces a random slot with probability
+    sample_size / (i + 1), which keeps the sample uniform over all profiles.
+    The counter update locks its dataset_state row, so concurrent writers
+    draw positions one after another.
+
+    Args:
+        rows: (profile id, row dict) pairs
+    """
+    if not rows or sample_size <= 0:
+        return
+    bump_generation(db, SAMPLE_DATASET, step=len(rows))
+    seen = get_generation(db, SAMPLE_DATASET)
+    positions = np.arange(seen - len(rows), seen)
+    draws = _rng.integers(0, positions + 1)
+    slots = np.where(positions < sample_size, positions, draws)
+
+    # A later row drawing the same slot replaces the earlier one
+    replacements = {}
+    for slot, (profile_id, row) in zip(slots.tolist(), rows):
+        if slot < sample_size:
+            replacements[slot] = _sample_row(slot, profile_id, row)
+    if replacements:
+        db.execute(_replace_statement(db.get_bind().dialect.name), [replacements[slot] for slot in sorted(replacements)])
+
+
+def refresh_sampled_rows(db: Session, rows: list):
+    """Copy the new values of upserted profiles into the slots holding them"""
+    if not rows:
+        return
+    values = dict(rows)
+    held = db.execute(
+        select(CompanyProfileSample.slot, CompanyProfileSample.profile_id)
+        .where(CompanyProfileSample.profile_id.in_(list(values)))
+    ).all()
+    if held:
+        db.execute(
+            _replace_statement(db.get_bind().dialect.name),
+            [_sample_row(slot, profile_id, values[profile_id]) for slot, profile_id in sorted(held)],
+        )
+
+
+def sample_profiles_after(db: Session, after_id: int, sample_size: int, batch_size: int = 5000):
+    """Offer the profiles with id > after_id (rows just bulk loaded) to the reservoir, a page at a time"""
+    if sample_size <= 0:
+        return
+    columns = [CompanyProfile.id] + [getattr(CompanyProfile, field) for field in SAMPLE_FIELDS]
+    last_id = after_id
+    while True:
+        rows = db.execute(
+            select(*columns).where(CompanyProfile.id > last_id).order_by(CompanyProfile.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        add_to_sample(db, [(row[0], dict(zip(SAMPLE_FIELDS, row[1:]))) for row in rows], sample_size)
+        last_id = rows[-1][0]
+
+
+def rebuild_sample(db: Session, sample_size: int, batch_size: int = 5000):
+    """Draw a fresh uniform sample from company_profile (initial backfill or repair).
+
+    Moves the dataset generation on in the same transaction, so cached
+    estimates from the old sample are not served again.
+    """
+    db.execute(delete(CompanyProfileSample))
+    ids = np.array(db.execute(select(CompanyProfile.id)).scalars().all(), dtype=np.int64)
+    set_generation(db, SAMPLE_DATASET, len(ids))
+    mark_backfilled(db, SAMPLE_BACKFILLED)
+    if sample_size > 0 and len(ids) > 0:
+        chosen = _rng.choice(ids, size=min(sample_size, len(ids)), replace=False)
+        columns = [CompanyProfile.id] + [getattr(CompanyProfile, field) for field in SAMPLE_FIELDS]
+        statement = _replace_statement(db.get_bind().dialect.name)
+        slot = 0
+        for start in range(0, len(chosen), batch_size):
+            batch = chosen[start:start + batch_size].tolist()
+            params = []
+            for row in db.execute(select(*columns).where(CompanyProfile.id.in_(batch))):
+                params.append(_sample_row(slot, row[0], dict(zip(SAMPLE_FIELDS, row[1:]))))
+                slot += 1
+            db.execute(statement, params)
+    record_commit(db)
+
+
+def sample_size(db: Session) -> int:
+    return db.execute(select(func.count()).select_from(CompanyProfileSample)).scalar()
+
+
+if __name__ == "__main__":
+    from db_module.connection import SessionLocal
+    from utils.config import get_settings
+
+    session = SessionLocal()
+    try:
+        rebuild_sample(session, get_settings().QUERY_SAMPLE_SIZE)
+        session.commit()
+    finally:
+        session.close()
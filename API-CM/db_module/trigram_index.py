@@ -0,0 +1,125 @@
+import unicodedata
+from sqlalchemy import delete, distinct, func, insert, literal, select
+from sqlalchemy.orm import Session
+from db_module.commit_log import record_commit
+from db_module.dataset_state import mark_backfilled
+from models import CompanyProfile, CompanyProfileTrigram
+
+# Text columns searchable by substring through the trigram index
+TRIGRAM_FIELDS = ("first_name", "city", "state", "country", "industry")
+TRIGRAM_SIZE = 3
+
+trigram_table = CompanyProfileTrigram.__table__
+
+# Set in dataset_state once every profile has postings. Profiles stored before
+# the index existed have none, so substring filters must not be narrowed by
+# it until rebuild_trigram_index ran
+TRIGRAM_BACKFILLED = "company_profile_trigram_backfilled"
+
+
+def fold(value: str) -> str:
+    """Lower-cased value without accents, as the case- and accent-insensitive
+    collation of the company data columns compares it
+    """
+    value = unicodedata.normalize("NFKD", (value or "").strip())
+    return "".join(char for char in value if not unicodedata.combining(char)).lower()
+
+
+def trigrams(value: str) -> set:
+    """Distinct folded trigrams of a value"""
+    value = fold(value)
+    return {value[i:i + TRIGRAM_SIZE] for i in range(len(value) - TRIGRAM_SIZE + 1)}
+
+
+def index_profiles(db: Session, rows: list, replace_ids: list = ()):
+    """Stage trigram postings for profiles in the current transaction.
+
+    Args:
+        rows: (profile id, row dict) pairs to index
+        replace_ids: profiles whose previous postings are dropped first
+            (rows rewritten by an upsert)
+    """
+    if replace_ids:
+        db.execute(delete(CompanyProfileTrigram).where(CompanyProfileTrigram.profile_id.in_(list(replace_ids))))
+    postings = [
+        {"field_name": field, "trigram": trigram, "profile_id": profile_id}
+        for profile_id, row in rows
+        for field in TRIGRAM_FIELDS
+        for trigram in trigrams(row[field])
+    ]
+    if postings:
+        db.execute(insert(trigram_table), postings)
+
+
+def selective_trigrams(db: Session, field: str, value: str, max_postings: int) -> list:
+    """Trigrams of `value` with at most `max_postings` postings for `field`.
+
+    Intersecting a trigram most profiles share costs more than the LIKE scan
+    it saves. Each posting list is probed with LIMIT max_postings + 1, so a
+    common trigram is never counted in full.
+    """
+    selective = []
+    for gram in sorted(trigrams(value)):
+        probe = (
+            select(literal(1))
+            .where(CompanyProfileTrigram.field_name == field, CompanyProfileTrigram.trigram == gram)
+            .limit(max_postings + 1)
+            .subquery()
+        )
+        if db.execute(select(func.count()).select_from(probe)).scalar() <= max_postings:
+            selective.append(gram)
+    return selective
+
+
+def trigram_candidates(field: str, grams: list):
+    """Subquery of profile ids whose `field` has every one of `grams`.
+
+    Intersects the posting lists in the database; the caller still applies
+    the substring condition since trigrams can match out of order. Returns
+    None when there is no trigram to narrow with.
+    """
+    if not grams:
+        return None
+    return (
+        select(CompanyProfileTrigram.profile_id)
+        .where(CompanyProfileTrigram.field_name == field, CompanyProfileTrigram.trigram.in_(grams))
+        .group_by(CompanyProfileTrigram.profile_id)
+        .having(func.count(distinct(CompanyProfileTrigram.trigram)) == len(grams))
+    )
+
+
+def index_profiles_after(db: Session, after_id: int, batch_size: int = 5000):
+    """Index the profiles with id > after_id, a page of ids at a time"""
+    columns = [CompanyProfile.id] + [getattr(CompanyProfile, field) for field in TRIGRAM_FIELDS]
+    last_id = after_id
+    while True:
+        rows = db.execute(
+            select(*columns).where(CompanyProfile.id > last_id).order_by(CompanyProfile.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        index_profiles(db, [(row[0], dict(zip(TRIGRAM_FIELDS, row[1:]))) for row in rows])
+        last_id = rows[-1][0]
+
+
+def rebuild_trigram_index(db: Session, batch_size: int = 5000):
+    """Index every stored profile again (initial backfill or repair).
+
+    Moves the dataset generation on in the same transaction, so counts
+    cached before the index was usable are not served again.
+    """
+    db.execute(delete(CompanyProfileTrigram))
+    index_profiles_after(db, 0, batch_size)
+    mark_backfilled(db, TRIGRAM_BACKFILLED)
+    record_commit(db)
+
+
+if __name__ == "__main__":
+    from db_module.connection import SessionLocal
+
+    session = SessionLocal()
+    try:
+        rebuild_trigram_index(session)
+        session.commit()
+    finally:
+        session.close()
@@ -0,0 +1,45 @@
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from models import UploadedFile
+
+
+class UploadConflict(Exception):
+    """Another request moved the content hash to its own job first"""
+
+
+def get_uploaded_file(db: Session, content_hash: str):
+    return db.query(UploadedFile).filter(UploadedFile.content_hash == content_hash).first()
+
+
+def record_uploaded_file(db: Session, content_hash: str, file_path: str, size_bytes: int, job_id: int,
+                         commit: bool = True) -> UploadedFile:
+    """Register new content and point it at the job ingesting it.
+
+    Raises IntegrityError when another request registered the same content
+    first. With commit=False the row is only flushed, so the caller can
+    commit it together with the job it points at.
+    """
+    uploaded_file = UploadedFile(content_hash=content_hash, file_path=file_path, size_bytes=size_bytes, job_id=job_id)
+    db.add(uploaded_file)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return uploaded_file
+
+
+def move_uploaded_file(db: Session, content_hash: str, file_path: str, size_bytes: int, job_id: int,
+                       from_job_id: int):
+    """Point registered content at a new job, staged in the current transaction.
+
+    The UPDATE only applies while the hash still points at `from_job_id`, so
+    of several requests re-uploading the same content only one takes it
+    over; the others get UploadConflict.
+    """
+    moved = db.execute(
+        update(UploadedFile)
+        .where(UploadedFile.content_hash == content_hash, UploadedFile.job_id == from_job_id)
+        .values(file_path=file_path, size_bytes=size_bytes, job_id=job_id)
+    ).rowcount
+    if not moved:
+        raise UploadConflict(f"Content {content_hash} was registered by another upload")
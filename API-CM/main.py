@@ -1,5 +1,9 @@
-from fastapi import FastAPI, HTTPException
+import argparse
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.params import Depends
 import uvicorn
 from sqlalchemy.orm import Session
@@ -11,12 +15,38 @@ import re
 from authorization.api import auth_router
 from upload_csv.api import csv_router
 from query_builder.api import query_router
+from utils.config import get_settings
+from db_module.connection import dispose_engines, prepare_process
+from utils.basic_auth import get_admin_user
+from utils.metrics import MetricsMiddleware, process_startup_seconds, process_uptime, registry
+from utils.services import app_logger, log_levels
+import asyncio
 import hashlib
 
+import_seconds = process_uptime()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-process setup and teardown, run by every uvicorn worker"""
+    await prepare_process()
+    ingest_worker = None
+    if get_settings().INGEST_EMBEDDED_WORKER:
+        # Ingestion normally runs in `python -m upload_csv.worker` processes; imported here, it loads pandas
+        from upload_csv.worker import start_embedded_worker
+        ingest_worker = start_embedded_worker()
+    ready_seconds = process_uptime()
+    process_startup_seconds.set(round(import_seconds, 3), "import")
+    process_startup_seconds.set(round(ready_seconds, 3), "ready")
+    app_logger.info(f"Worker {os.getpid()} ready | imports {import_seconds:.3f}s | ready {ready_seconds:.3f}s")
+    yield
+    if ingest_worker is not None:
+        ingest_worker.stop()
+    await dispose_engines()
 
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -31,7 +61,70 @@ app.include_router(auth_router)
 app.include_router(csv_router)
 app.include_router(query_router)
 
+if get_settings().METRICS_ENABLED:
+    # Added last so it is outermost and times CORS handling too
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """
+        Prometheus text exposition of request, query, pool and ingestion timings.\n
+        Returns:\n
+            text/plain metrics in the Prometheus 0.0.4 format.\n
+        """
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/admin/log-levels/")
+async def get_log_levels(current_user: dict = Depends(get_admin_user)):
+    """
+    Minimum log level per module in the worker process serving the request (ADMIN_EMAILS users only).\n
+    Returns:\n
+        the default level and the per-module overrides, and the process id\n
+    """
+    return {**log_levels.levels(), "process": os.getpid()}
+
+
+@app.put("/admin/log-levels/")
+async def set_log_level(
+    level: str = Query(..., description="TRACE, DEBUG, INFO, WARNING, ERROR or CRITICAL"),
+    logger: str = Query("", description="Module path such as query_builder.api, empty for the default"),
+    current_user: dict = Depends(get_admin_user)
+):
+    """
+    Change a module's minimum log level without restarting (ADMIN_EMAILS users only).\n
+    Levels live in process memory: with several uvicorn workers (--workers)
+    only the worker that served this request changes, and every worker goes
+    back to LOG_LEVEL / LOG_LEVELS when it restarts. Set those for a change
+    that should apply everywhere.\n
+    Args:\n
+        level: new minimum level\n
+        logger: module path, a package applies to all its modules\n
+    Returns:\n
+        the levels now in effect in this process, and its process id\n
+    """
+    try:
+        log_levels.set(logger, level)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Unknown log level: {level}")
+    app_logger.warning(
+        f"Log level of '{logger or 'default'}' set to {level.upper()} in process {os.getpid()} "
+        f"by user {current_user['email']}"
+    )
+    return {**log_levels.levels(), "process": os.getpid()}
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
+    parser = argparse.ArgumentParser(description="Run the API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="uvicorn worker processes, each with its own engines and pools")
+    parser.add_argument("--no-reload", action="store_true", help="single worker without restarting on code changes")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Production: workers are spawned, each imports the app and runs the lifespan itself
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers, proxy_headers=True)
+    else:
+        uvicorn.run("main:app", host=args.host, port=args.port, reload=not args.no_reload)
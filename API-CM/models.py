@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, Date, Numeric, Boolean, DateTime, ForeignKey, String, Float, DECIMAL
+from sqlalchemy import Column, Integer, BigInteger, Date, Numeric, Boolean, DateTime, ForeignKey, String, Float, DECIMAL, Text
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 
@@ -7,7 +8,7 @@ Base = declarative_base()
 class AuthProfile(Base):
     __tablename__ = 'auth_profile'
     auth_profile_id = Column(Integer, primary_key=True, autoincrement=True)
-    email = Column(String(50), nullable=False)
+    email = Column(String(50), nullable=False, index=True)
     password = Column(String(128), nullable=False)
     first_name = Column(String(50), nullable=False)
     last_name = Column(String(50), nullable=False)
@@ -19,15 +20,129 @@ class CompanyProfile(Base):
     __tablename__ = 'company_profile'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    first_name = Column(String(50), nullable=False)
+    first_name = Column(String(50), nullable=False, index=True)
     last_name = Column(String(50), nullable=False)
     email = Column(String(100), nullable=False, unique=True)
     mobile_number = Column(String(10), nullable=False)
+    city = Column(String(50), nullable=False, index=True)
+    state = Column(String(50), nullable=False, index=True)
+    country = Column(String(50), nullable=False, index=True)
+    industry = Column(String(100), nullable=False, index=True)
+    year_founded = Column(Integer, nullable=False)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class IngestionJob(Base):
+    __tablename__ = 'ingestion_job'
+
+    job_id = Column(Integer, primary_key=True, autoincrement=True)
+    auth_profile_id = Column(Integer, nullable=True)
+    file_name = Column(String(255), nullable=False)
+    file_path = Column(String(500), nullable=False)
+    status = Column(String(20), nullable=False, default='queued', index=True)
+    mode = Column(String(20), nullable=False, default='insert')
+    rows_parsed = Column(BigInteger, nullable=False, default=0)
+    rows_inserted = Column(BigInteger, nullable=False, default=0)
+    rows_merged = Column(BigInteger, nullable=False, default=0)
+    rows_rejected = Column(BigInteger, nullable=False, default=0)
+    rows_per_sec = Column(Float, nullable=False, default=0)
+    checkpoint_offset = Column(BigInteger, nullable=False, default=0)
+    checkpoint_row = Column(BigInteger, nullable=False, default=0)
+    reject_file_path = Column(String(500), nullable=True)
+    load_warnings = Column(BigInteger, nullable=False, default=0)  # skipped or truncated rows of a LOAD DATA run
+    error = Column(String(1000), nullable=True)
+    worker_id = Column(String(100), nullable=True)  # process that claimed the job
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed while the job runs, stale jobs are requeued
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    created_date = Column(DateTime, default=datetime.utcnow)
+    updated_date = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IngestionJobChunk(Base):
+    __tablename__ = 'ingestion_job_chunk'
+
+    # Chunks committed past the job's checkpoint, skipped when the job resumes
+    job_id = Column(Integer, primary_key=True)
+    start_offset = Column(BigInteger, primary_key=True)
+    end_offset = Column(BigInteger, nullable=False)
+    row_count = Column(BigInteger, nullable=False, default=0)  # rows parsed from the chunk
+    created_date = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadedFile(Base):
+    __tablename__ = 'uploaded_file'
+
+    content_hash = Column(String(64), primary_key=True)  # sha256 of the uploaded bytes
+    file_path = Column(String(500), nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    job_id = Column(Integer, nullable=True)
+    created_date = Column(DateTime, default=datetime.utcnow)
+    updated_date = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DatasetState(Base):
+    __tablename__ = 'dataset_state'
+
+    name = Column(String(50), primary_key=True)
+    generation = Column(BigInteger, nullable=False, default=0)  # bumped by every ingest commit
+    updated_date = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CompanyProfileCommit(Base):
+    __tablename__ = 'company_profile_commit'
+
+    # One row per company_profile generation: the ids that commit inserted,
+    # in commit order (the generation row lock serializes ingest commits)
+    generation = Column(BigInteger, primary_key=True, autoincrement=False)
+    min_id = Column(BigInteger, nullable=True)  # NULL when the commit inserted nothing
+    max_id = Column(BigInteger, nullable=True)
+    row_count = Column(BigInteger, nullable=False, default=0)
+    created_date = Column(DateTime, default=datetime.utcnow)
+
+
+class CompanyProfileRollup(Base):
+    __tablename__ = 'company_profile_rollup'
+
+    city = Column(String(50), primary_key=True)
+    state = Column(String(50), primary_key=True)
+    country = Column(String(50), primary_key=True)
+    industry = Column(String(100), primary_key=True)
+    year_founded = Column(Integer, primary_key=True)
+    row_count = Column(BigInteger, nullable=False, default=0)
+
+
+class CompanyProfileTrigram(Base):
+    __tablename__ = 'company_profile_trigram'
+
+    field_name = Column(String(20), primary_key=True)
+    # Binary collation: trigrams are folded before they are stored, and the
+    # case- and accent-insensitive default would make 'sao' and 'são' collide
+    trigram = Column(String(3).with_variant(mysql.CHAR(3, charset="utf8mb4", collation="utf8mb4_bin"), "mysql"),
+                     primary_key=True)
+    profile_id = Column(Integer, primary_key=True, index=True)
+
+
+class CompanyProfileSample(Base):
+    __tablename__ = 'company_profile_sample'
+
+    slot = Column(Integer, primary_key=True, autoincrement=False)
+    profile_id = Column(Integer, nullable=False, index=True)
+    first_name = Column(String(50), nullable=False)
     city = Column(String(50), nullable=False)
     state = Column(String(50), nullable=False)
     country = Column(String(50), nullable=False)
     industry = Column(String(100), nullable=False)
     year_founded = Column(Integer, nullable=False)
-    is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+
+
+class QueryPatternStat(Base):
+    __tablename__ = 'query_pattern_stat'
+
+    pattern = Column(String(255), primary_key=True)
+    calls = Column(BigInteger, nullable=False, default=0)
+    total_ms = Column(Float, nullable=False, default=0)
+    max_ms = Column(Float, nullable=False, default=0)
+    sample_filters = Column(Text, nullable=True)
+    updated_date = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
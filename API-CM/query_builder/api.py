@@ -1,73 +1,349 @@
+import csv
+import io
+import json
+import math
+import time
+from collections import Counter
 from typing import Dict, List, Optional
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from db_module.connection import get_db
-from models import CompanyProfile
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from sqlalchemy import String, and_, case, cast, func, literal, select, true, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from db_module.bulk_insert import CSV_COLUMNS
+from db_module.connection import ReadSessionLocal, SessionLocal, get_read_db
+from db_module.dataset_state import get_generation, is_backfilled
+from db_module.rollup import ROLLUP_BACKFILLED, ROLLUP_DIMENSIONS
+from db_module.row_sample import SAMPLE_BACKFILLED, sample_size
+from models import CompanyProfile, CompanyProfileRollup, CompanyProfileSample
+from schemas.schemas import BatchQueryRequest
+from query_builder.columnar import columnar_enabled, refresh_snapshot, snapshot
+from query_builder.index_advisor import run_advisor
+from query_builder.recorder import recorder
+from query_builder.filters import (
+    filter_conditions,
+    filters_digest,
+    filters_key,
+    normalize_filters,
+    plan_trigrams,
+    MATCH_EXACT,
+    MATCH_SUBSTRING,
+)
+from utils.cache import TTLCache
+from utils.config import get_settings
+from utils.metrics import register_cache
 from utils.services import app_logger  # Assuming app_logger is properly initialized
 import traceback
 from sqlalchemy.exc import IntegrityError
-from utils.basic_auth import get_current_user
-from fastapi.responses import JSONResponse
+from utils.basic_auth import get_admin_user, get_current_user
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+settings = get_settings()
+
+# Counts keyed by (dataset generation, normalized filters); an ingest commit
+# bumps the generation, so stale entries are never read again and age out
+count_cache = TTLCache(max_size=settings.QUERY_CACHE_SIZE, ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS)
+register_cache("query_count", count_cache)
 
 query_router = APIRouter(
     prefix="/query", tags=["Query Builder"], responses={422: {"description": "Not Found"}}
 )
 
 
-@query_router.get("/company-profiles/")
-async def query_company_profiles(
+# Columns returned by the rows and export endpoints
+ROW_COLUMNS = ["id"] + CSV_COLUMNS
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def company_profile_filters(
     first_name: Optional[str] = Query(None, description="Filter by first name"),
     city: Optional[str] = Query(None, description="Filter by city"),
     state: Optional[str] = Query(None, description="Filter by state"),
     country: Optional[str] = Query(None, description="Filter by country"),
     industry: Optional[str] = Query(None, description="Filter by industry"),
     year_founded: Optional[int] = Query(None, description="Filter by year founded"),
-    db: Session = Depends(get_db),
+    match_mode: str = Query(MATCH_SUBSTRING, description="substring, prefix or exact matching of the text filters"),
+    match: Optional[str] = Query(None, description="Per-field match modes, e.g. city:exact,industry:prefix"),
+) -> dict:
+    """Filter query parameters shared by the query builder endpoints, normalized"""
+    try:
+        return normalize_filters(
+            first_name=first_name,
+            city=city,
+            state=state,
+            country=country,
+            industry=industry,
+            year_founded=year_founded,
+            match_mode=match_mode,
+            match=match,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def rows_query(filters: dict, trigram_plan: dict = None):
+    columns = [getattr(CompanyProfile, column) for column in ROW_COLUMNS]
+    return select(*columns).where(*filter_conditions(filters, trigram_plan=trigram_plan)).order_by(CompanyProfile.id)
+
+
+def export_rows(filters: dict, export_format: str):
+    """Stream matching rows as CSV or NDJSON text.
+
+    Owns its session, since the response body is produced after the request
+    dependencies are closed. The server-side cursor with yield_per keeps
+    memory flat however many rows match.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        # Header goes out before the query runs, so the client sees the first byte at once
+        writer.writerow(ROW_COLUMNS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    db = ReadSessionLocal()
+    try:
+        result = db.execute(
+            rows_query(filters, plan_trigrams(db, filters)).execution_options(
+                stream_results=True, yield_per=settings.QUERY_EXPORT_YIELD_PER
+            )
+        )
+        for partition in result.partitions():
+            for row in partition:
+                if export_format == "csv":
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(dict(zip(ROW_COLUMNS, row))) + "\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    except Exception as e:
+        app_logger.error(f"Export failed: {str(e)}\n{traceback.format_exc()}")
+        raise
+    finally:
+        db.close()
+
+
+async def can_use_rollup(db: AsyncSession, filters: dict) -> bool:
+    """Only exact matches on rollup dimensions can be answered from the rollup,
+    and only once it was backfilled; before that it misses the older profiles
+    """
+    if not settings.QUERY_USE_ROLLUP or not all(
+        field in ROLLUP_DIMENSIONS and mode == MATCH_EXACT for field, (mode, value) in filters.items()
+    ):
+        return False
+    return await db.run_sync(is_backfilled, ROLLUP_BACKFILLED)
+
+
+async def refresh_columnar(generation: int = None):
+    """Have the columnar snapshot follow the data without making requests wait.
+
+    Only the first load is awaited (in a worker thread, it reads with a sync
+    session). After that a stale snapshot is refreshed in the background
+    and requests are answered from its current state meanwhile.
+    """
+    if not snapshot.loaded:
+        await run_in_threadpool(refresh_snapshot, generation)
+    elif generation is None or generation != snapshot.generation:
+        snapshot.refresh_in_background(generation)
+
+
+async def count_company_profiles(db: AsyncSession, filters: dict, generation: int = None) -> tuple:
+    """Count matching profiles.
+
+    Returns:
+        (count, generation it reflects); the columnar engine can answer from
+        an older generation than `generation` while it refreshes
+    """
+    if columnar_enabled():
+        await refresh_columnar(generation)
+        return snapshot.count_at(filters)
+    if await can_use_rollup(db, filters):
+        query = select(func.coalesce(func.sum(CompanyProfileRollup.row_count), 0)).where(
+            *filter_conditions(filters, model=CompanyProfileRollup)
+        )
+        return int((await db.execute(query)).scalar()), generation
+    trigram_plan = await db.run_sync(plan_trigrams, filters)
+    query = select(func.count(CompanyProfile.id)).where(*filter_conditions(filters, trigram_plan=trigram_plan))
+    return (await db.execute(query)).scalar(), generation
+
+
+async def total_company_profiles(db: AsyncSession) -> Optional[int]:
+    """Row count of company_profile, read from the rollup instead of a table scan.
+
+    None until the rollup was backfilled, since it then misses older profiles.
+    """
+    if not await db.run_sync(is_backfilled, ROLLUP_BACKFILLED):
+        return None
+    return int((await db.execute(select(func.coalesce(func.sum(CompanyProfileRollup.row_count), 0)))).scalar())
+
+
+async def estimate_company_profiles(db: AsyncSession, filters: dict, z: float = 1.96) -> dict:
+    """Estimate the count from the reservoir sample, with a 95% Wilson interval.
+
+    Scales the fraction of sampled rows that match by the table size. When
+    the sample holds the whole table the count is exact. Falls back to the
+    exact count when there is nothing trustworthy to scale: an empty sample
+    (QUERY_SAMPLE_SIZE is 0), a sample or rollup not backfilled yet, or a
+    table total below the sample size.
+    """
+    sampled = 0
+    total = None
+    if await db.run_sync(is_backfilled, SAMPLE_BACKFILLED):
+        sampled = await db.run_sync(sample_size)
+        total = await total_company_profiles(db)
+    if sampled == 0 or total is None or total < sampled:
+        count, _ = await count_company_profiles(db, filters)
+        return {"count": count, "approximate": False, "confidence_interval": [count, count], "sample_size": 0}
+    hits = (await db.execute(
+        select(func.count()).select_from(CompanyProfileSample).where(
+            *filter_conditions(filters, model=CompanyProfileSample)
+        )
+    )).scalar()
+    if sampled >= total:
+        return {"count": hits, "approximate": False, "confidence_interval": [hits, hits], "sample_size": sampled}
+
+    fraction = hits / sampled
+    denominator = 1 + z * z / sampled
+    center = (fraction + z * z / (2 * sampled)) / denominator
+    margin = z * math.sqrt(fraction * (1 - fraction) / sampled + z * z / (4 * sampled * sampled)) / denominator
+    return {
+        "count": round(fraction * total),
+        "approximate": True,
+        "confidence_interval": [max(0, math.floor((center - margin) * total)), min(total, math.ceil((center + margin) * total))],
+        "confidence": 0.95,
+        "sample_size": sampled,
+    }
+
+
+async def count_filter_sets(db: AsyncSession, filter_sets: dict, generation: int = None) -> tuple:
+    """Counts of several filter sets from a single pass over company_profile.
+
+    Each set becomes one SUM(CASE WHEN <conditions> THEN 1 ELSE 0 END)
+    column of the same SELECT. The columnar engine answers from memory.
+
+    Returns:
+        ({name: count}, generation they reflect), as count_company_profiles
+    """
+    if columnar_enabled():
+        await refresh_columnar(generation)
+        counts = {}
+        answered = None
+        for name, filters in filter_sets.items():
+            counts[name], answered = snapshot.count_at(filters)
+        return counts, answered
+    names = list(filter_sets)
+    columns = [
+        func.coalesce(
+            func.sum(case((and_(true(), *filter_conditions(filter_sets[name])), 1), else_=0)),
+            0,
+        )
+        for name in names
+    ]
+    row = (await db.execute(select(*columns).select_from(CompanyProfile))).one()
+    return {name: int(count) for name, count in zip(names, row)}, generation
+
+
+async def facet_company_profiles(db: AsyncSession, filters: dict, facets: list, top_n: int) -> dict:
+    """Total and top-N value counts per facet from one statement.
+
+    The filtered rows (rollup rows when the filters allow it) are a shared
+    CTE, each facet groups it on its own column, and the per-facet groups
+    come back through UNION ALL. Grouping by all facets at once would
+    return their cross product instead.
+    """
+    trigram_plan = None
+    if await can_use_rollup(db, filters):
+        model = CompanyProfileRollup
+        filtered = select(*[getattr(model, facet) for facet in facets], model.row_count)
+    else:
+        model = CompanyProfile
+        filtered = select(*[getattr(model, facet) for facet in facets])
+        trigram_plan = await db.run_sync(plan_trigrams, filters)
+    filtered = filtered.where(*filter_conditions(filters, model=model, trigram_plan=trigram_plan)).cte("filtered")
+    weight = func.sum(filtered.c.row_count) if model is CompanyProfileRollup else func.count()
+    # Values travel as text so every UNION ALL branch has the same column type
+    query = union_all(*[
+        select(literal(facet).label("facet"), cast(filtered.c[facet], String).label("value"), weight.label("count"))
+        .group_by(filtered.c[facet])
+        for facet in facets
+    ])
+
+    counters = {facet: Counter() for facet in facets}
+    for facet, value, count in await db.execute(query):
+        if value is not None:
+            value = getattr(model, facet).type.python_type(value)
+        counters[facet][value] += int(count or 0)
+    return {
+        "total": sum(counters[facets[0]].values()),
+        "facets": {
+            facet: [{"value": value, "count": count} for value, count in counter.most_common(top_n) if count]
+            for facet, counter in counters.items()
+        },
+    }
+
+
+@query_router.get("/company-profiles/")
+async def query_company_profiles(
+    request: Request,
+    response: Response,
+    approximate: bool = Query(False, description="Estimate the count from a row sample, with a confidence interval"),
+    filters: dict = Depends(company_profile_filters),
+    db: AsyncSession = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     try:
         # Log the start of the request
-        app_logger.info(f"Starting query for company profiles with user {current_user['username']}")
-        
-        # Build the query
-        query = db.query(func.count(CompanyProfile.id))
-        
-        if first_name:
-            query = query.filter(CompanyProfile.first_name.ilike(f"%{first_name}%"))
-            app_logger.info(f"Filtering by first_name: {first_name}")
-        
-        if city:
-            query = query.filter(CompanyProfile.city.ilike(f"%{city}%"))
-            app_logger.info(f"Filtering by city: {city}")
-        
-        if state:
-            query = query.filter(CompanyProfile.state.ilike(f"%{state}%"))
-            app_logger.info(f"Filtering by state: {state}")
-        
-        if country:
-            query = query.filter(CompanyProfile.country.ilike(f"%{country}%"))
-            app_logger.info(f"Filtering by country: {country}")
-        
-        if industry:
-            query = query.filter(CompanyProfile.industry.ilike(f"%{industry}%"))
-            app_logger.info(f"Filtering by industry: {industry}")
-        
-        if year_founded:
-            query = query.filter(CompanyProfile.year_founded == year_founded)
-            app_logger.info(f"Filtering by year_founded: {year_founded}")
-        
-        # Execute the query
-        count = query.scalar()
+        app_logger.info(f"Starting query for company profiles with user {current_user['email']}")
+
+        app_logger.info(f"Filtering by {filters}")
+
+        # The ETag changes with the data, so clients can poll with If-None-Match
+        generation = await db.run_sync(get_generation)
+        etag = f'"{generation}-{filters_digest(filters)}{"-approximate" if approximate else ""}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        if approximate:
+            cache_key = (generation, filters_key(filters), "approximate")
+            estimate = count_cache.get(cache_key)
+            if estimate is None:
+                estimate = await estimate_company_profiles(db, filters)
+                count_cache.set(cache_key, estimate)
+            # An estimate of 0 is not proof of no match, so no 404 here
+            app_logger.info(f"Estimated {estimate['count']} matching company profiles.")
+            response.headers["ETag"] = etag
+            return estimate
+
+        cache_key = (generation, filters_key(filters))
+        count = count_cache.get(cache_key)
+        if count is None:
+            # Execute the query
+            started = time.perf_counter()
+            count, answered = await count_company_profiles(db, filters, generation)
+            recorder.record(filters, (time.perf_counter() - started) * 1000)
+            if answered != generation:
+                # Answered from a snapshot that is still catching up: neither cache nor tag it
+                etag = None
+            else:
+                count_cache.set(cache_key, count)
+        else:
+            app_logger.info(f"Count served from cache for generation {generation}")
 
         if count == 0:
             app_logger.warning(f"No matching company profiles found for the provided filters.")
             raise HTTPException(status_code=404, detail="No matching company profiles found")
-        
+
         # Log the count result
         app_logger.info(f"Found {count} matching company profiles.")
+        if etag is not None:
+            response.headers["ETag"] = etag
         return {"count": count}
 
+    except HTTPException:
+        raise
+
     except IntegrityError as e:
         # Handle database-related errors
         error_message = f"Database Integrity Error: {str(e)}"
@@ -79,3 +355,248 @@ async def query_company_profiles(
         error_message = f"Unexpected error: {str(e)}"
         app_logger.error(f"{error_message}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred.")
+
+
+@query_router.get("/company-profiles/facets/")
+async def facet_company_profiles_endpoint(
+    request: Request,
+    response: Response,
+    facets: List[str] = Query(..., description=f"Dimensions to break down: {', '.join(ROLLUP_DIMENSIONS)}"),
+    top_n: int = Query(10, ge=1, le=1000, description="Values returned per facet"),
+    filters: dict = Depends(company_profile_filters),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Count matching company profiles broken down by several dimensions at once.\n
+    Args:\n
+        facets: dimensions to group by, repeat the parameter for several\n
+        top_n: number of values returned per facet, by descending count\n
+    Returns:\n
+        total and {facet: [{value, count}]}\n
+    """
+    try:
+        app_logger.info(f"Starting facet query {facets} for company profiles with user {current_user['email']}")
+
+        facets = list(dict.fromkeys(facet.strip() for facet in facets if facet.strip()))
+        unknown = [facet for facet in facets if facet not in ROLLUP_DIMENSIONS]
+        if not facets or unknown:
+            raise HTTPException(
+                status_code=400, detail=f"facets should be among {', '.join(ROLLUP_DIMENSIONS)}"
+            )
+
+        generation = await db.run_sync(get_generation)
+        etag = f'"{generation}-{filters_digest(filters)}-{"+".join(facets)}-{top_n}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        cache_key = (generation, filters_key(filters), "facets", tuple(facets), top_n)
+        result = count_cache.get(cache_key)
+        if result is None:
+            result = await facet_company_profiles(db, filters, facets, top_n)
+            count_cache.set(cache_key, result)
+
+        app_logger.info(f"Facet query matched {result['total']} company profiles.")
+        response.headers["ETag"] = etag
+        return result
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        error_message = f"Unexpected error: {str(e)}"
+        app_logger.error(f"{error_message}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred.")
+
+
+@query_router.get("/company-profiles/rows/")
+async def company_profile_rows(
+    after_id: int = Query(0, ge=0, description="Cursor: id of the last row of the previous page"),
+    limit: int = Query(100, ge=1, description="Rows per page"),
+    filters: dict = Depends(company_profile_filters),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Page through matching company profiles in id order.\n
+    Args:\n
+        after_id: next_cursor of the previous page, 0 for the first page\n
+        limit: rows per page, up to QUERY_PAGE_MAX_ROWS\n
+    Returns:\n
+        rows and next_cursor (null on the last page)\n
+    """
+    try:
+        app_logger.info(f"Fetching company profile rows after id {after_id} for user {current_user['email']}")
+        limit = min(limit, settings.QUERY_PAGE_MAX_ROWS)
+
+        # Keyset pagination: seeks on the primary key instead of skipping an OFFSET
+        trigram_plan = await db.run_sync(plan_trigrams, filters)
+        query = rows_query(filters, trigram_plan).where(CompanyProfile.id > after_id).limit(limit + 1)
+        rows = [dict(zip(ROW_COLUMNS, row)) for row in await db.execute(query)]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]["id"]
+
+        return {"rows": rows, "next_cursor": next_cursor}
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        error_message = f"Unexpected error: {str(e)}"
+        app_logger.error(f"{error_message}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred.")
+
+
+@query_router.get("/company-profiles/export/")
+async def export_company_profiles(
+    export_format: str = Query("csv", alias="format", description="csv or ndjson"),
+    filters: dict = Depends(company_profile_filters),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Stream every matching company profile as CSV or NDJSON.\n
+    Args:\n
+        format: csv or ndjson\n
+    Returns:\n
+        the rows in id order, streamed as they are read\n
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format should be one of {', '.join(EXPORT_FORMATS)}")
+    app_logger.info(f"Exporting company profiles as {export_format} for user {current_user['email']}")
+    return StreamingResponse(
+        export_rows(filters, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="company_profiles.{export_format}"'},
+    )
+
+
+@query_router.post("/company-profiles/batch/")
+async def batch_query_company_profiles(
+    request: BatchQueryRequest,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Count company profiles for many named filter sets in one request.\n
+    Args:\n
+        request: filter_sets, each a name plus the filters of the count endpoint\n
+    Returns:\n
+        counts: {name: count}\n
+    """
+    try:
+        app_logger.info(
+            f"Starting batch query of {len(request.filter_sets)} filter sets with user {current_user['email']}"
+        )
+        if not request.filter_sets:
+            raise HTTPException(status_code=400, detail="filter_sets should not be empty")
+        if len(request.filter_sets) > settings.QUERY_BATCH_MAX_SETS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {settings.QUERY_BATCH_MAX_SETS} filter sets are accepted per request",
+            )
+
+        filter_sets = {}
+        for filter_set in request.filter_sets:
+            if filter_set.name in filter_sets:
+                raise HTTPException(status_code=400, detail=f"Duplicate filter set name: {filter_set.name}")
+            try:
+                filter_sets[filter_set.name] = normalize_filters(
+                    first_name=filter_set.first_name,
+                    city=filter_set.city,
+                    state=filter_set.state,
+                    country=filter_set.country,
+                    industry=filter_set.industry,
+                    year_founded=filter_set.year_founded,
+                    match_mode=filter_set.match_mode,
+                    match=filter_set.match,
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"{filter_set.name}: {str(e)}")
+
+        # Sets already in the count cache are not scanned again
+        generation = await db.run_sync(get_generation)
+        counts = {}
+        missing = {}
+        for name, filters in filter_sets.items():
+            count = count_cache.get((generation, filters_key(filters)))
+            if count is None:
+                missing[name] = filters
+            else:
+                counts[name] = count
+        if missing:
+            missing_counts, answered = await count_filter_sets(db, missing, generation)
+            for name, count in missing_counts.items():
+                counts[name] = count
+                if answered == generation:
+                    count_cache.set((generation, filters_key(missing[name])), count)
+
+        app_logger.info(f"Batch query counted {len(missing)} filter sets, {len(counts) - len(missing)} from cache")
+        return {"counts": {name: counts[name] for name in filter_sets}}
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        error_message = f"Unexpected error: {str(e)}"
+        app_logger.error(f"{error_message}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred.")
+
+
+@query_router.get("/engine/stats/")
+async def query_engine_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Report the active count engine and, for the columnar engine, its snapshot size.\n
+    Returns:\n
+        engine, and rows, distinct values and memory use of the snapshot\n
+    """
+    if not columnar_enabled():
+        return {"engine": settings.QUERY_ENGINE}
+    return {"engine": settings.QUERY_ENGINE, "snapshot": snapshot.stats()}
+
+
+def _advise_indexes(apply: bool, repeat: int) -> dict:
+    recorder.flush()
+    db = SessionLocal()
+    try:
+        return run_advisor(db, apply=apply, repeat=repeat)
+    finally:
+        db.close()
+
+
+@query_router.get("/admin/index-advice/")
+async def index_advice(current_user: dict = Depends(get_admin_user)):
+    """
+    Propose company_profile indexes from the recorded query patterns (ADMIN_EMAILS users only).\n
+    Returns:\n
+        proposals with their columns, DDL and the recorded time they would serve\n
+    """
+    try:
+        app_logger.info(f"Index advice requested by user {current_user['email']}")
+        return await run_in_threadpool(_advise_indexes, False, 0)
+    except Exception as e:
+        app_logger.error(f"Index advice failed: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred.")
+
+
+@query_router.post("/admin/index-advice/apply/")
+async def apply_index_advice(
+    repeat: int = Query(3, ge=1, le=20, description="Timed runs per pattern when replaying"),
+    current_user: dict = Depends(get_admin_user)
+):
+    """
+    Build the proposed indexes online and replay the recorded workload around it.\n
+    Runs ALTER TABLE on company_profile, so only ADMIN_EMAILS users may call it;
+    `python -m query_builder.index_advisor --apply` does the same from a shell.\n
+    Args:\n
+        repeat: timed runs per pattern, the median is reported\n
+    Returns:\n
+        applied index names and before/after latency per pattern\n
+    """
+    try:
+        app_logger.info(f"Index advice applied by user {current_user['email']}")
+        return await run_in_threadpool(_advise_indexes, True, repeat)
+    except Exception as e:
+        app_logger.error(f"Applying index advice failed: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred.")
@@ -0,0 +1,287 @@
+import sys
+import threading
+import time
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from db_module.commit_log import commits_after
+from db_module.connection import ReadSessionLocal
+from db_module.dataset_state import get_generation, COMPANY_PROFILE_REWRITES
+from models import CompanyProfile
+from query_builder.filters import TEXT_FILTERS, MATCH_EXACT, MATCH_PREFIX
+from utils.config import get_settings
+from utils.services import app_logger
+
+settings = get_settings()
+
+
+class _GrowableArray:
+    """Append-only NumPy array with amortized doubling.
+
+    Readers slice `[:length]` of the buffer they captured; appends past the
+    capacity copy into a new buffer, so captured views stay valid.
+    """
+
+    def __init__(self, dtype):
+        self.buffer = np.empty(1024, dtype=dtype)
+        self.length = 0
+
+    def extend(self, values: np.ndarray):
+        needed = self.length + len(values)
+        if needed > len(self.buffer):
+            grown = np.empty(max(needed, len(self.buffer) * 2), dtype=self.buffer.dtype)
+            grown[:self.length] = self.buffer[:self.length]
+            self.buffer = grown
+        self.buffer[self.length:needed] = values
+        self.length = needed
+
+    def view(self) -> np.ndarray:
+        return self.buffer[:self.length]
+
+
+class _Dictionary:
+    """Dictionary encoding of a text column: distinct values and their codes"""
+
+    def __init__(self):
+        self.values = []
+        self.lowered = []
+        self.codes = {}
+
+    def encode(self, values: list) -> np.ndarray:
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.values)
+                self.values.append(value)
+                self.lowered.append((value or "").lower())
+            codes[i] = code
+        return codes
+
+    def matching_codes(self, mode: str, value: str, size: int) -> np.ndarray:
+        """Boolean mask over the first `size` codes; one test per distinct value"""
+        lowered = self.lowered[:size]
+        if mode == MATCH_EXACT:
+            test = value.__eq__
+        elif mode == MATCH_PREFIX:
+            test = lambda candidate: candidate.startswith(value)
+        else:
+            test = lambda candidate: value in candidate
+        return np.fromiter((test(candidate) for candidate in lowered), dtype=bool, count=size)
+
+    def nbytes(self) -> int:
+        return sum(sys.getsizeof(value) for value in self.values) + sys.getsizeof(self.codes)
+
+
+class _IdSet:
+    """Bitmap of the ids already loaded, one bit per id, grown on demand"""
+
+    def __init__(self):
+        self.bits = np.zeros(1024, dtype=np.uint8)
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        inside = (ids >> 3) < len(self.bits)
+        found = np.zeros(len(ids), dtype=bool)
+        found[inside] = (self.bits[ids[inside] >> 3] >> (ids[inside] & 7)) & 1 == 1
+        return found
+
+    def add(self, ids: np.ndarray):
+        if not len(ids):
+            return
+        needed = int(ids.max() >> 3) + 1
+        if needed > len(self.bits):
+            grown = np.zeros(max(needed, len(self.bits) * 2), dtype=np.uint8)
+            grown[:len(self.bits)] = self.bits
+            self.bits = grown
+        np.bitwise_or.at(self.bits, ids >> 3, (1 << (ids & 7)).astype(np.uint8))
+
+
+def _merge_ranges(ranges: list) -> list:
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    return merged
+
+
+class ColumnarSnapshot:
+    """In-memory copy of the company_profile filter columns for count queries.
+
+    Text columns are dictionary-encoded into int32 codes and year_founded is
+    an int32 array, so a count is a handful of vectorized boolean masks.
+    Text filters are evaluated once per distinct value and the result is
+    gathered through the codes.
+
+    company_profile is append-mostly. A refresh reads the id ranges that the
+    commits since the snapshot's generation inserted (company_profile_commit)
+    and loads those ranges, skipping ids it already holds. Ids are not
+    committed in order, so an id high-water mark would miss rows. A full
+    reload happens when the log does not reach back far enough, or when an
+    upsert rewrote stored rows (the rewrite counter changed).
+    """
+
+    def __init__(self):
+        # _lock guards the published arrays and is only held briefly;
+        # _refresh_lock serializes refreshes, which read the database
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.dictionaries = {field: _Dictionary() for field in TEXT_FILTERS}
+        self.columns = {field: _GrowableArray(np.int32) for field in TEXT_FILTERS}
+        self.columns["year_founded"] = _GrowableArray(np.int32)
+        self.loaded_ids = _IdSet()
+        self.high_water_id = 0
+        self.generation = None
+        self.rewrites = None
+        self.rows = 0
+        self.last_refresh_seconds = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self.generation is not None
+
+    def refresh(self, db: Session, generation: int = None):
+        """Bring the snapshot up to `generation` (read from the database when None).
+
+        Counts keep being served from the previous state while this runs.
+        """
+        if generation is not None and generation == self.generation:
+            return
+        with self._refresh_lock:
+            self._refresh(db, generation)
+
+    def refresh_in_background(self, generation: int = None) -> bool:
+        """Start a refresh in a thread of its own unless one is already running.
+
+        Callers go on answering from the current state, so queries never
+        queue behind a refresh.
+        """
+        if generation is not None and generation == self.generation:
+            return False
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+
+        def run():
+            db = ReadSessionLocal()
+            try:
+                self._refresh(db, generation)
+            except Exception as e:
+                app_logger.error(f"Columnar snapshot | background refresh failed | {e}")
+            finally:
+                db.close()
+                self._refresh_lock.release()
+
+        threading.Thread(target=run, name="columnar-refresh", daemon=True).start()
+        return True
+
+    def _refresh(self, db: Session, generation: int = None):
+        if generation is not None and generation == self.generation:
+            return
+        started = time.perf_counter()
+        # Mark the generation of the rows actually read; a replica may lag the caller's.
+        # The commit log and the rows are read in the same transaction, so they agree
+        generation = get_generation(db)
+        if generation == self.generation:
+            return
+        rewrites = get_generation(db, COMPANY_PROFILE_REWRITES)
+        commits = []
+        if self.loaded and rewrites == self.rewrites:
+            commits = commits_after(db, self.generation, generation)
+        if self.loaded and rewrites == self.rewrites and len(commits) == generation - self.generation:
+            ranges = [(low, high) for _, low, high in commits if low is not None]
+            loaded = sum(self._load(db, low, high) for low, high in _merge_ranges(ranges))
+        else:
+            if self.loaded:
+                app_logger.info("Columnar snapshot | stored rows were rewritten or the commit log is short, reloading")
+            fresh = ColumnarSnapshot()
+            loaded = fresh._load(db)
+            with self._lock:
+                self.dictionaries, self.columns = fresh.dictionaries, fresh.columns
+                self.loaded_ids, self.rows, self.high_water_id = fresh.loaded_ids, fresh.rows, fresh.high_water_id
+        with self._lock:
+            self.generation = generation
+            self.rewrites = rewrites
+        self.last_refresh_seconds = round(time.perf_counter() - started, 3)
+        app_logger.info(
+            f"Columnar snapshot | +{loaded} rows, {self.rows} total, "
+            f"generation {generation}, {self.last_refresh_seconds}s"
+        )
+
+    def _load(self, db: Session, low: int = None, high: int = None) -> int:
+        """Append the rows with ids in [low, high] that are not loaded yet"""
+        fields = list(TEXT_FILTERS) + ["year_founded"]
+        query = select(CompanyProfile.id, *(getattr(CompanyProfile, field) for field in fields))
+        if low is not None:
+            query = query.where(CompanyProfile.id.between(low, high))
+        query = query.order_by(CompanyProfile.id).execution_options(
+            stream_results=True, yield_per=settings.QUERY_EXPORT_YIELD_PER
+        )
+        loaded = 0
+        for partition in db.execute(query).partitions():
+            ids = np.fromiter((row[0] for row in partition), dtype=np.int64, count=len(partition))
+            new = ~self.loaded_ids.contains(ids)
+            if not new.any():
+                continue
+            partition = [row for row, keep in zip(partition, new) if keep]
+            values = list(zip(*partition))
+            with self._lock:
+                for field, column in zip(TEXT_FILTERS, values[1:]):
+                    self.columns[field].extend(self.dictionaries[field].encode(list(column)))
+                self.columns["year_founded"].extend(np.asarray(values[-1], dtype=np.int32))
+                self.loaded_ids.add(ids[new])
+                self.high_water_id = max(self.high_water_id, int(ids[new].max()))
+                self.rows += len(partition)
+            loaded += len(partition)
+        return loaded
+
+    def count(self, filters: dict) -> int:
+        return self.count_at(filters)[0]
+
+    def count_at(self, filters: dict) -> tuple:
+        """(count, generation of the state that answered it)"""
+        with self._lock:
+            generation = self.generation
+            rows = self.rows
+            columns = {field: column.view() for field, column in self.columns.items()}
+            dictionaries = self.dictionaries
+            sizes = {field: len(dictionary.values) for field, dictionary in dictionaries.items()}
+        mask = np.ones(rows, dtype=bool)
+        for field, (mode, value) in filters.items():
+            if field == "year_founded":
+                mask &= columns[field] == value
+            else:
+                matching = dictionaries[field].matching_codes(mode, value, sizes[field])
+                mask &= matching[columns[field]]
+        return int(np.count_nonzero(mask)), generation
+
+    def stats(self) -> dict:
+        with self._lock:
+            column_bytes = {field: column.buffer.nbytes for field, column in self.columns.items()}
+            dictionary_bytes = {field: dictionary.nbytes() for field, dictionary in self.dictionaries.items()}
+            return {
+                "rows": self.rows,
+                "high_water_id": self.high_water_id,
+                "generation": self.generation,
+                "last_refresh_seconds": self.last_refresh_seconds,
+                "distinct_values": {field: len(dictionary.values) for field, dictionary in self.dictionaries.items()},
+                "column_bytes": column_bytes,
+                "dictionary_bytes": dictionary_bytes,
+                "total_bytes": sum(column_bytes.values()) + sum(dictionary_bytes.values()),
+            }
+
+
+snapshot = ColumnarSnapshot()
+
+
+def columnar_enabled() -> bool:
+    return settings.QUERY_ENGINE == "columnar"
+
+
+def refresh_snapshot(generation: int = None):
+    """Catch the snapshot up and wait for it, with its own session (first load, CLI)"""
+    db = ReadSessionLocal()
+    try:
+        snapshot.refresh(db, generation)
+    finally:
+        db.close()
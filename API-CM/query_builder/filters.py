@@ -0,0 +1,150 @@
+import hashlib
+from sqlalchemy import Boolean, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ColumnElement
+from db_module.dataset_state import is_backfilled
+from db_module.trigram_index import TRIGRAM_BACKFILLED, selective_trigrams, trigram_candidates
+from models import CompanyProfile
+from utils.config import get_settings
+
+settings = get_settings()
+
+TEXT_FILTERS = ("first_name", "city", "state", "country", "industry")
+
+MATCH_SUBSTRING = "substring"
+MATCH_PREFIX = "prefix"
+MATCH_EXACT = "exact"
+MATCH_MODES = (MATCH_SUBSTRING, MATCH_PREFIX, MATCH_EXACT)
+
+
+class CaseInsensitiveEquals(ColumnElement):
+    """`column = value` ignoring case.
+
+    MySQL compares the company data columns under their case-insensitive
+    collation and can use an index; other databases compare lower(column).
+    """
+
+    type = Boolean()
+    inherit_cache = False
+
+    def __init__(self, column, value):
+        self.column = column
+        self.value = value
+
+    def self_group(self, against=None):
+        # Already a complete comparison; stops where() from adding "= 1" on MySQL
+        return self
+
+
+@compiles(CaseInsensitiveEquals)
+def _compile_case_insensitive_equals(element, compiler, **kw):
+    return compiler.process(func.lower(element.column) == element.value, **kw)
+
+
+@compiles(CaseInsensitiveEquals, "mysql")
+def _compile_case_insensitive_equals_mysql(element, compiler, **kw):
+    return compiler.process(element.column == element.value, **kw)
+
+
+def parse_match_modes(match: str) -> dict:
+    """Per-field match modes from "city:exact,industry:prefix" """
+    modes = {}
+    for item in (match or "").split(","):
+        if not item.strip():
+            continue
+        field, _, mode = item.partition(":")
+        field, mode = field.strip(), mode.strip()
+        if field not in TEXT_FILTERS:
+            raise ValueError(f"match field should be one of {', '.join(TEXT_FILTERS)}")
+        if mode not in MATCH_MODES:
+            raise ValueError(f"match mode should be one of {', '.join(MATCH_MODES)}")
+        modes[field] = mode
+    return modes
+
+
+def normalize_filters(first_name=None, city=None, state=None, country=None, industry=None, year_founded=None,
+                      match_mode: str = MATCH_SUBSTRING, match: str = None) -> dict:
+    """Canonical form of the company profile filters.
+
+    Text values are stripped and lower-cased (matching is case-insensitive)
+    and empty filters are dropped, so equivalent requests share a cache key.
+    `match_mode` applies to every text filter not listed in `match`
+    ("city:exact,industry:prefix"); year_founded always matches exactly.
+
+    Returns:
+        {field: (match mode, value)}
+    """
+    if match_mode not in MATCH_MODES:
+        raise ValueError(f"match_mode should be one of {', '.join(MATCH_MODES)}")
+    field_modes = parse_match_modes(match)
+    text_values = {
+        "first_name": first_name,
+        "city": city,
+        "state": state,
+        "country": country,
+        "industry": industry,
+    }
+    filters = {}
+    for field, value in text_values.items():
+        value = (value or "").strip().lower()
+        if value:
+            filters[field] = (field_modes.get(field, match_mode), value)
+    if year_founded is not None:
+        filters["year_founded"] = (MATCH_EXACT, int(year_founded))
+    return filters
+
+
+def filters_key(filters: dict) -> tuple:
+    return tuple(sorted(filters.items()))
+
+
+def filters_digest(filters: dict) -> str:
+    return hashlib.sha1(repr(filters_key(filters)).encode()).hexdigest()[:16]
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def plan_trigrams(db: Session, filters: dict) -> dict:
+    """Trigrams to narrow each substring filter with.
+
+    Empty unless the trigram index is enabled and was backfilled. Common
+    trigrams (over TRIGRAM_MAX_POSTINGS postings) are dropped; a field left
+    without any falls back to the plain LIKE.
+
+    Returns:
+        {field: trigrams}, for filter_conditions
+    """
+    substrings = {field: value for field, (mode, value) in filters.items() if mode == MATCH_SUBSTRING}
+    if not substrings or not settings.TRIGRAM_INDEX_ENABLED or not is_backfilled(db, TRIGRAM_BACKFILLED):
+        return {}
+    plan = {}
+    for field, value in substrings.items():
+        grams = selective_trigrams(db, field, value, settings.TRIGRAM_MAX_POSTINGS)
+        if grams:
+            plan[field] = grams
+    return plan
+
+
+def filter_conditions(filters: dict, model=CompanyProfile, trigram_plan: dict = None) -> list:
+    """SQL conditions for normalized filters against `model`'s columns.
+
+    Prefix matches use LIKE 'value%' so the column index applies. Substring
+    matches on company_profile are narrowed to the ids holding the trigrams
+    `trigram_plan` (from plan_trigrams) lists for the field; the LIKE stays
+    as the final check of each candidate.
+    """
+    conditions = []
+    for field, (mode, value) in filters.items():
+        column = getattr(model, field)
+        if mode == MATCH_EXACT:
+            conditions.append(CaseInsensitiveEquals(column, value) if isinstance(value, str) else column == value)
+        elif mode == MATCH_PREFIX:
+            conditions.append(column.like(f"{escape_like(value)}%", escape="\\"))
+        else:
+            if trigram_plan and model is CompanyProfile and field in trigram_plan:
+                conditions.append(CompanyProfile.id.in_(trigram_candidates(field, trigram_plan[field])))
+            conditions.append(column.ilike(f"%{escape_like(value)}%", escape="\\"))
+    return conditions
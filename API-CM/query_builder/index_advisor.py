@@ -0,0 +1,194 @@
+import argparse
+import json
+import statistics
+import time
+from sqlalchemy import distinct, func, inspect, select, text
+from sqlalchemy.orm import Session
+from models import CompanyProfile, QueryPatternStat
+from query_builder.filters import filter_conditions, plan_trigrams, MATCH_EXACT, MATCH_PREFIX
+from query_builder.recorder import load_filters
+from utils.config import get_settings
+from utils.services import app_logger
+
+settings = get_settings()
+
+TABLE_NAME = CompanyProfile.__tablename__
+
+
+def load_workload(db: Session) -> list:
+    """Recorded filter patterns, heaviest (total time) first"""
+    rows = db.execute(
+        select(QueryPatternStat).where(QueryPatternStat.sample_filters.is_not(None))
+        .order_by(QueryPatternStat.total_ms.desc())
+    ).scalars()
+    return [
+        {
+            "pattern": row.pattern,
+            "calls": row.calls,
+            "total_ms": row.total_ms,
+            "avg_ms": round(row.total_ms / row.calls, 3) if row.calls else 0.0,
+            "filters": load_filters(row.sample_filters),
+        }
+        for row in rows
+    ]
+
+
+def existing_indexes(db: Session) -> list:
+    """Column lists of the indexes company_profile already has"""
+    inspector = inspect(db.get_bind())
+    indexes = [tuple(index["column_names"]) for index in inspector.get_indexes(TABLE_NAME)]
+    indexes += [
+        tuple(constraint["column_names"]) for constraint in inspector.get_unique_constraints(TABLE_NAME)
+    ]
+    indexes.append(tuple(inspector.get_pk_constraint(TABLE_NAME)["constrained_columns"]))
+    return indexes
+
+
+def column_cardinality(db: Session, columns: set) -> dict:
+    columns = sorted(columns)
+    if not columns:
+        return {}
+    counts = db.execute(
+        select(*(func.count(distinct(getattr(CompanyProfile, column))) for column in columns))
+    ).one()
+    return dict(zip(columns, counts))
+
+
+def index_columns(filters: dict, cardinality: dict) -> tuple:
+    """B-tree column order serving a filter set.
+
+    Equality columns come first, most selective first; a B-tree can use at
+    most one range after them, so the most selective prefix match goes last.
+    Substring filters cannot use a B-tree (the trigram index serves them).
+    """
+    equality = [field for field, (mode, value) in filters.items() if mode == MATCH_EXACT]
+    prefix = [field for field, (mode, value) in filters.items() if mode == MATCH_PREFIX]
+    columns = sorted(equality, key=lambda field: -cardinality[field])
+    if prefix:
+        columns.append(max(prefix, key=lambda field: cardinality[field]))
+    return tuple(columns)
+
+
+def index_name(columns: tuple) -> str:
+    return f"ix_{TABLE_NAME}_{'_'.join(columns)}"[:64]
+
+
+def index_ddl(dialect_name: str, columns: tuple) -> str:
+    name = index_name(columns)
+    if dialect_name == "mysql":
+        # Online DDL: reads and writes continue while the index builds
+        return f"ALTER TABLE {TABLE_NAME} ADD INDEX {name} ({', '.join(columns)}), ALGORITHM=INPLACE, LOCK=NONE"
+    return f"CREATE INDEX {name} ON {TABLE_NAME} ({', '.join(columns)})"
+
+
+def propose_indexes(db: Session, workload: list, max_indexes: int = None) -> list:
+    """Composite indexes for the recorded workload, by recorded time they would serve.
+
+    A pattern already served by the leading columns of an index is skipped;
+    a proposal whose columns lead a longer one is folded into it.
+    """
+    if max_indexes is None:
+        max_indexes = settings.INDEX_ADVISOR_MAX_INDEXES
+    fields = {
+        field for entry in workload for field, (mode, value) in entry["filters"].items()
+        if mode in (MATCH_EXACT, MATCH_PREFIX)
+    }
+    cardinality = column_cardinality(db, fields)
+    existing = existing_indexes(db)
+    dialect_name = db.get_bind().dialect.name
+
+    proposals = {}
+    for entry in workload:
+        columns = index_columns(entry["filters"], cardinality)
+        if not columns or any(index[:len(columns)] == columns for index in existing):
+            continue
+        served_by = next((other for other in proposals if other[:len(columns)] == columns), None)
+        if served_by is not None:
+            proposals[served_by]["benefit_ms"] += entry["total_ms"]
+            proposals[served_by]["patterns"].append(entry["pattern"])
+            continue
+        proposal = {"benefit_ms": entry["total_ms"], "patterns": [entry["pattern"]]}
+        for shorter in [other for other in proposals if columns[:len(other)] == other]:
+            folded = proposals.pop(shorter)
+            proposal["benefit_ms"] += folded["benefit_ms"]
+            proposal["patterns"] += folded["patterns"]
+        proposals[columns] = proposal
+
+    ranked = sorted(proposals.items(), key=lambda item: -item[1]["benefit_ms"])[:max_indexes]
+    return [
+        {
+            "columns": list(columns),
+            "name": index_name(columns),
+            "ddl": index_ddl(dialect_name, columns),
+            "benefit_ms": round(proposal["benefit_ms"], 3),
+            "patterns": proposal["patterns"],
+        }
+        for columns, proposal in ranked
+    ]
+
+
+def replay_workload(db: Session, workload: list, repeat: int = 3) -> dict:
+    """Median latency (ms) of each recorded pattern's count on company_profile"""
+    latencies = {}
+    for entry in workload:
+        conditions = filter_conditions(entry["filters"], trigram_plan=plan_trigrams(db, entry["filters"]))
+        query = select(func.count(CompanyProfile.id)).where(*conditions)
+        timings = []
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            db.execute(query).scalar()
+            timings.append((time.perf_counter() - started) * 1000)
+        latencies[entry["pattern"]] = round(statistics.median(timings), 3)
+    return latencies
+
+
+def weighted_total(workload: list, latencies: dict) -> float:
+    return round(sum(entry["calls"] * latencies[entry["pattern"]] for entry in workload), 3)
+
+
+def run_advisor(db: Session, apply: bool = False, repeat: int = 3) -> dict:
+    """Propose indexes for the recorded workload and optionally build them.
+
+    With apply, the workload is replayed before and after the indexes are
+    created, and the report carries both latencies per pattern and the
+    call-weighted totals.
+    """
+    workload = load_workload(db)
+    proposals = propose_indexes(db, workload)
+    report = {"patterns": len(workload), "proposals": proposals}
+    if not apply:
+        return report
+
+    before = replay_workload(db, workload, repeat)
+    for proposal in proposals:
+        app_logger.info(f"Index advisor | {proposal['ddl']}")
+        db.execute(text(proposal["ddl"]))
+        db.commit()
+    after = replay_workload(db, workload, repeat)
+    report.update(
+        {
+            "applied": [proposal["name"] for proposal in proposals],
+            "latency_ms": [
+                {"pattern": entry["pattern"], "calls": entry["calls"],
+                 "before": before[entry["pattern"]], "after": after[entry["pattern"]]}
+                for entry in workload
+            ],
+            "weighted_total_ms": {"before": weighted_total(workload, before), "after": weighted_total(workload, after)},
+        }
+    )
+    return report
+
+
+if __name__ == "__main__":
+    from db_module.connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Propose (and apply) company_profile indexes from recorded queries")
+    parser.add_argument("--apply", action="store_true", help="create the proposed indexes and replay the workload")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per pattern when replaying")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        print(json.dumps(run_advisor(session, apply=args.apply, repeat=args.repeat), indent=2))
+    finally:
+        session.close()
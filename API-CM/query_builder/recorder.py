@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, sqlite
+from db_module.connection import SessionLocal
+from models import QueryPatternStat
+from utils.config import get_settings
+from utils.services import app_logger
+
+settings = get_settings()
+
+pattern_table = QueryPatternStat.__table__
+
+
+def filter_pattern(filters: dict) -> str:
+    """Shape of a filter set without its values, e.g. "city:exact,year_founded:exact" """
+    return ",".join(f"{field}:{mode}" for field, (mode, value) in sorted(filters.items()))
+
+
+def dump_filters(filters: dict) -> str:
+    return json.dumps({field: [mode, value] for field, (mode, value) in filters.items()})
+
+
+def load_filters(text: str) -> dict:
+    return {field: (mode, value) for field, (mode, value) in json.loads(text).items()}
+
+
+def _accumulate_statement(dialect_name: str):
+    if dialect_name == "mysql":
+        statement = mysql.insert(pattern_table)
+        return statement.on_duplicate_key_update(
+            calls=pattern_table.c.calls + statement.inserted.calls,
+            total_ms=pattern_table.c.total_ms + statement.inserted.total_ms,
+            max_ms=func.greatest(pattern_table.c.max_ms, statement.inserted.max_ms),
+            sample_filters=statement.inserted.sample_filters,
+        )
+    if dialect_name == "sqlite":
+        statement = sqlite.insert(pattern_table)
+        return statement.on_conflict_do_update(
+            index_elements=["pattern"],
+            set_={
+                "calls": pattern_table.c.calls + statement.excluded.calls,
+                "total_ms": pattern_table.c.total_ms + statement.excluded.total_ms,
+                "max_ms": func.max(pattern_table.c.max_ms, statement.excluded.max_ms),
+                "sample_filters": statement.excluded.sample_filters,
+            },
+        )
+    raise ValueError(f"Query recording is not supported on {dialect_name}")
+
+
+class QueryRecorder:
+    """Aggregates count query latency per filter pattern in memory.
+
+    Totals are added to query_pattern_stat at most every
+    QUERY_RECORDER_FLUSH_SECONDS, so recording costs a dict update per query.
+    The latest filters of each pattern are kept to replay the workload.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._flushing = False
+
+    def record(self, filters: dict, elapsed_ms: float):
+        if not settings.QUERY_RECORDER_ENABLED:
+            return
+        pattern = filter_pattern(filters)
+        with self._lock:
+            calls, total_ms, max_ms, sample = self._pending.get(pattern, (0, 0.0, 0.0, None))
+            self._pending[pattern] = (calls + 1, total_ms + elapsed_ms, max(max_ms, elapsed_ms), filters)
+            # Claimed under the lock, so the queries arriving while it runs start no other flush
+            due = not self._flushing and time.monotonic() - self._last_flush >= settings.QUERY_RECORDER_FLUSH_SECONDS
+            if due:
+                self._flushing = True
+        if due:
+            # Flushing writes with a sync session, keep it off the request's event loop
+            threading.Thread(target=self._background_flush, name="query-recorder-flush", daemon=True).start()
+
+    def _background_flush(self):
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._flushing = False
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(
+                _accumulate_statement(db.get_bind().dialect.name),
+                [
+                    {
+                        "pattern": pattern[:255],
+                        "calls": calls,
+                        "total_ms": round(total_ms, 3),
+                        "max_ms": round(max_ms, 3),
+                        "sample_filters": dump_filters(filters),
+                    }
+                    for pattern, (calls, total_ms, max_ms, filters) in sorted(pending.items())
+                ],
+            )
+            db.commit()
+        except Exception as e:
+            # Statistics are best effort, never fail the query for them
+            db.rollback()
+            app_logger.error(f"Could not flush query pattern stats: {str(e)}")
+        finally:
+            db.close()
+
+
+recorder = QueryRecorder()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, EmailStr, Field, validator
 from fastapi import HTTPException
 import re
@@ -94,4 +94,18 @@ class HashSlugRequest(BaseModel):
     def validate_hash_slug(cls, hash_slug):
         if not hash_slug:
             raise HTTPException(status_code=422, detail='hash slug should not be empty')
-        return hash_slug
\ No newline at end of file
+        return hash_slug
+ 
+class FilterSet(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    first_name: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    country: Optional[str] = None
+    industry: Optional[str] = None
+    year_founded: Optional[int] = None
+    match_mode: str = "substring"
+    match: Optional[str] = None
+ 
+class BatchQueryRequest(BaseModel):
+    filter_sets: List[FilterSet]
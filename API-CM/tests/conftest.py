@@ -0,0 +1,130 @@
+"""Test setup: a SQLite primary and a SQLite read replica instead of MySQL.
+
+The DB_* settings are read when db_module.connection is imported, so the
+URLs are set here before any application module is loaded. The other
+required settings come from the .env file; run the tests from API-CM.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_db_dir = tempfile.mkdtemp(prefix="api-cm-tests-")
+PRIMARY_PATH = os.path.join(_db_dir, "primary.db")
+REPLICA_PATH = os.path.join(_db_dir, "replica.db")
+os.environ["DB_URL"] = f"sqlite:///{PRIMARY_PATH}"
+os.environ["ASYNC_DB_URL"] = f"sqlite+aiosqlite:///{PRIMARY_PATH}"
+os.environ["DB_REPLICA_URLS"] = f"sqlite:///{REPLICA_PATH}"
+os.environ["ASYNC_DB_REPLICA_URLS"] = f"sqlite+aiosqlite:///{REPLICA_PATH}"
+os.environ["INGEST_PARSE_WORKERS"] = "1"
+os.environ["INGEST_WRITER_WORKERS"] = "1"
+os.environ["PROJECT_FILE_DIR"] = os.path.join(_db_dir, "files")
+os.makedirs(os.environ["PROJECT_FILE_DIR"])
+
+import pytest
+from sqlalchemy import create_engine, delete
+
+import models
+
+for _path in (PRIMARY_PATH, REPLICA_PATH):
+    _engine = create_engine(f"sqlite:///{_path}")
+    models.Base.metadata.create_all(_engine)
+    _engine.dispose()
+
+
+@pytest.fixture
+def primary_path():
+    return PRIMARY_PATH
+
+
+@pytest.fixture
+def replica_path():
+    return REPLICA_PATH
+
+
+@pytest.fixture
+def db():
+    """Session on the primary; the tables written by the tests are emptied afterwards"""
+    from db_module.connection import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for model in (models.CompanyProfile, models.CompanyProfileSample, models.CompanyProfileRollup,
+                      models.CompanyProfileTrigram, models.CompanyProfileCommit, models.DatasetState,
+                      models.IngestionJob, models.IngestionJobChunk, models.UploadedFile,
+                      models.QueryPatternStat, models.AuthProfile):
+            session.execute(delete(model))
+        session.commit()
+        session.close()
+
+
+@pytest.fixture
+def add_profiles(db):
+    """Insert company profiles through the ingest writer (rollup and commit log included).
+
+    Each row is a valid profile numbered by its position, with the given
+    columns overridden: add_profiles([{"city": "Pune"}, {}]).
+    """
+    from db_module.bulk_insert import BulkInserter, CSV_COLUMNS
+
+    def add(overrides: list, sample_size: int = 0):
+        start = db.query(models.CompanyProfile).count()
+        rows = []
+        for index, values in enumerate(overrides, start=start):
+            row = {
+                "first_name": f"Name{index}",
+                "last_name": "Tester",
+                "email": f"user{index}@example.com",
+                "mobile_number": f"{9000000000 + index}",
+                "city": "Kochi",
+                "state": "Kerala",
+                "country": "India",
+                "industry": "Printmaker",
+                "year_founded": 2000,
+            }
+            row.update(values)
+            rows.append(row)
+        inserter = BulkInserter(db, batch_size=100, sample_size=sample_size)
+        inserter.add_columns({column: [row[column] for row in rows] for column in CSV_COLUMNS})
+        inserter.flush()
+
+    return add
+
+
+@pytest.fixture
+def as_user():
+    """Authenticate API requests as another user: as_user(2)"""
+    import main
+    from utils.basic_auth import get_current_user
+
+    def login(user_id: int):
+        user = {"user_id": user_id, "email": f"tester{user_id}@example.com", "username": f"tester{user_id}"}
+        main.app.dependency_overrides[get_current_user] = lambda: user
+
+    return login
+
+
+@pytest.fixture
+def client(db, as_user, monkeypatch):
+    """API client authenticated as user 1.
+
+    Query builder reads go to the primary, since the tests only write there.
+    Cached counts are dropped, as the generation restarts with every test,
+    and the query recorder is off unless a test turns it back on.
+    """
+    from fastapi.testclient import TestClient
+    import main
+    from db_module.connection import get_async_db, get_read_db
+    from query_builder.api import count_cache, settings
+
+    count_cache.clear()
+    monkeypatch.setattr(settings, "QUERY_RECORDER_ENABLED", False)
+    as_user(1)
+    main.app.dependency_overrides[get_read_db] = get_async_db
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
@@ -0,0 +1,39 @@
+import asyncio
+import time
+from sqlalchemy import text
+from db_module.connection import AsyncSessionLocal
+
+WAIT_SECONDS = 0.3
+
+
+async def _slow_query():
+    """Run a query that waits WAIT_SECONDS inside the database driver"""
+    async with AsyncSessionLocal() as db:
+        connection = await (await db.connection()).get_raw_connection()
+        await connection.driver_connection.create_function(
+            "wait_seconds", 1, lambda seconds: time.sleep(seconds) or 0
+        )
+        return (await db.execute(text("SELECT wait_seconds(:seconds)"), {"seconds": WAIT_SECONDS})).scalar()
+
+
+def test_concurrent_sessions_overlap_their_database_waits():
+    async def run():
+        started = time.perf_counter()
+        await asyncio.gather(_slow_query(), _slow_query())
+        return time.perf_counter() - started
+
+    # Run one after the other the two waits would take 2 * WAIT_SECONDS
+    assert asyncio.run(run()) < 1.6 * WAIT_SECONDS
+
+
+def test_event_loop_keeps_running_during_a_query():
+    async def run():
+        ticks = 0
+        query = asyncio.ensure_future(_slow_query())
+        while not query.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        await query
+        return ticks
+
+    assert asyncio.run(run()) >= 5
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+from fastapi import HTTPException
+from sqlalchemy import update
+from starlette.requests import Request
+from db_module.connection import AsyncSessionLocal
+from models import AuthProfile
+from utils.basic_auth import get_current_user, invalidate_principal, principal_cache
+from utils.password import PasswordHasher, hasher
+
+EMAIL = "ravi@example.com"
+
+
+def _add_user(db, first_name: str = "Ravi") -> int:
+    user = AuthProfile(email=EMAIL, password="unused", first_name=first_name, last_name="Kumar")
+    db.add(user)
+    db.commit()
+    return user.auth_profile_id
+
+
+def _current_user(email: str = EMAIL) -> dict:
+    """get_current_user for a request whose bearer token decoded to `email`"""
+    async def run():
+        request = Request({"type": "http", "headers": [], "state": {"jwt_payload": {"email": email}}})
+        async with AsyncSessionLocal() as db:
+            return await get_current_user(request, token="", db=db)
+    return asyncio.run(run())
+
+
+def test_principal_is_cached_until_invalidated(db):
+    principal_cache.clear()
+    user_id = _add_user(db)
+    assert _current_user()["first_name"] == "Ravi"
+    db.execute(update(AuthProfile).where(AuthProfile.email == EMAIL).values(first_name="Ravindra"))
+    db.commit()
+    assert _current_user() == {"user_id": user_id, "email": EMAIL, "first_name": "Ravi", "last_name": "Kumar",
+                               "is_active": True}
+    invalidate_principal(EMAIL)
+    assert _current_user()["first_name"] == "Ravindra"
+
+
+def test_cached_principal_is_a_copy(db):
+    principal_cache.clear()
+    _add_user(db)
+    _current_user()["email"] = "someone@else.com"
+    assert _current_user()["email"] == EMAIL
+
+
+def test_expired_principal_is_read_again(db, monkeypatch):
+    principal_cache.clear()
+    _add_user(db)
+    monkeypatch.setattr(principal_cache, "ttl_seconds", 0)
+    _current_user()
+    db.execute(update(AuthProfile).where(AuthProfile.email == EMAIL).values(is_active=False))
+    db.commit()
+    assert _current_user()["is_active"] is False
+
+
+def test_registering_drops_a_stale_principal(client):
+    principal_cache.set(EMAIL, {"user_id": 999, "email": EMAIL, "first_name": "Old", "last_name": "User",
+                                "is_active": False})
+    response = client.post("/auth/register/", json={
+        "first_name": "Ravi", "last_name": "Kumar", "email": EMAIL,
+        "password": "Secret123!", "confirm_password": "Secret123!",
+    })
+    assert response.status_code == 200, response.text
+    assert principal_cache.get(EMAIL) is None
+
+
+def test_full_hasher_queue_answers_503(client, monkeypatch):
+    monkeypatch.setattr(hasher, "pending", hasher.workers + hasher.max_queue)
+    rejected = hasher.rejected
+    response = client.post("/auth/register/", json={
+        "first_name": "Ravi", "last_name": "Kumar", "email": EMAIL,
+        "password": "Secret123!", "confirm_password": "Secret123!",
+    })
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert hasher.rejected == rejected + 1
+
+
+def test_hasher_rejects_beyond_its_workers_and_queue():
+    blocked = PasswordHasher(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def run():
+        waiting = [asyncio.ensure_future(blocked.submit(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        status_code = None
+        try:
+            await blocked.submit(release.wait)
+        except HTTPException as e:
+            status_code = e.status_code
+        release.set()
+        await asyncio.gather(*waiting)
+        return status_code
+
+    assert asyncio.run(run()) == 503
+    assert blocked.stats()["completed"] == 2
+    assert blocked.stats()["rejected"] == 1
+
+
+def test_signup_login_and_an_authenticated_query(client, add_profiles):
+    import main
+
+    main.app.dependency_overrides.pop(get_current_user)
+    principal_cache.clear()
+    add_profiles([{"city": "Pune"}])
+    signup = {"first_name": "Ravi", "last_name": "Kumar", "email": EMAIL,
+              "password": "Secret123!", "confirm_password": "Secret123!"}
+    assert client.post("/auth/register/", json=signup).status_code == 200
+    assert client.post("/auth/register/", json=signup).json()["detail"]["flag"] == 0
+
+    assert client.post("/auth/login/", json={"email": EMAIL, "password": "Wrong123!"}).json()["detail"]["flag"] == 2
+    assert client.post("/auth/login/", json={"email": "nobody@example.com", "password": "Secret123!"}) \
+        .json()["detail"]["flag"] == 1
+    login = client.post("/auth/login/", json={"email": EMAIL, "password": "Secret123!"})
+    assert login.status_code == 200
+    assert login.json()["user_details"]["email"] == EMAIL
+
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    count = client.get("/query/company-profiles/", params={"city": "pune"}, headers=headers)
+    assert count.json() == {"count": 1}
+    assert client.get("/query/company-profiles/", params={"city": "pune"},
+                      headers={"Authorization": "Bearer not-a-token"}).status_code == 403
+
+    refreshed = client.post("/auth/refresh_token/", json={"hash_slug": login.json()["refresh_token"]})
+    assert refreshed.status_code == 200
+    headers = {"Authorization": f"Bearer {refreshed.json()['access_token']}"}
+    assert client.get("/query/company-profiles/", params={"city": "pune"}, headers=headers).status_code == 200
@@ -0,0 +1,53 @@
+import query_builder.api as query_api
+
+BATCH_URL = "/query/company-profiles/batch/"
+PROFILES = [{"city": "Pune"}, {"city": "Pune", "year_founded": 1990}, {"industry": "Fintech"}, {}]
+
+
+def _batch(client, *filter_sets):
+    return client.post(BATCH_URL, json={"filter_sets": list(filter_sets)})
+
+
+def test_each_set_gets_the_count_of_the_count_endpoint(client, add_profiles):
+    add_profiles(PROFILES)
+    response = _batch(
+        client,
+        {"name": "pune", "city": "pune", "match_mode": "exact"},
+        {"name": "old pune", "city": "pun", "year_founded": 1990},
+        {"name": "fintech", "industry": "fin", "match_mode": "prefix"},
+        {"name": "nowhere", "city": "goa"},
+        {"name": "all"},
+    )
+    assert response.status_code == 200
+    counts = response.json()["counts"]
+    assert counts == {"pune": 2, "old pune": 1, "fintech": 1, "nowhere": 0, "all": 4}
+    assert list(counts) == ["pune", "old pune", "fintech", "nowhere", "all"]
+    single = client.get("/query/company-profiles/", params={"city": "pun", "year_founded": 1990})
+    assert single.json() == {"count": counts["old pune"]}
+
+
+def test_sets_already_counted_come_from_the_cache(client, add_profiles, monkeypatch):
+    add_profiles(PROFILES)
+    client.get("/query/company-profiles/", params={"city": "pune", "match_mode": "exact"})
+    scanned = []
+    count_filter_sets = query_api.count_filter_sets
+
+    async def recording(db, filter_sets, *args):
+        scanned.append(sorted(filter_sets))
+        return await count_filter_sets(db, filter_sets, *args)
+
+    monkeypatch.setattr(query_api, "count_filter_sets", recording)
+    sets = ({"name": "pune", "city": "PUNE", "match_mode": "exact"}, {"name": "kochi", "city": "kochi"})
+    assert _batch(client, *sets).json() == {"counts": {"pune": 2, "kochi": 2}}
+    assert _batch(client, *sets).json() == {"counts": {"pune": 2, "kochi": 2}}
+    assert scanned == [["kochi"]]
+
+
+def test_invalid_batches_are_refused(client, monkeypatch):
+    assert _batch(client).status_code == 400
+    assert _batch(client, {"name": "a"}, {"name": "a", "city": "pune"}).status_code == 400
+    refused = _batch(client, {"name": "bad", "city": "pune", "match_mode": "fuzzy"})
+    assert refused.status_code == 400
+    assert refused.json()["detail"].startswith("bad:")
+    monkeypatch.setattr(query_api.settings, "QUERY_BATCH_MAX_SETS", 2)
+    assert _batch(client, {"name": "a"}, {"name": "b"}, {"name": "c"}).status_code == 400
@@ -0,0 +1,57 @@
+from sqlalchemy import select
+from db_module.bulk_insert import BulkInserter, CSV_COLUMNS
+from models import CompanyProfile, CompanyProfileCommit, CompanyProfileSample, CompanyProfileTrigram
+
+
+def _columns(count: int, start: int = 0) -> dict:
+    rows = [
+        {
+            "first_name": f"Name{index}",
+            "last_name": "Tester",
+            "email": f"bulk{index}@example.com",
+            "mobile_number": f"{9100000000 + index}",
+            "city": f"City{index}",
+            "state": "Kerala",
+            "country": "India",
+            "industry": "Printmaker",
+            "year_founded": 2000,
+        }
+        for index in range(start, start + count)
+    ]
+    return {column: [row[column] for row in rows] for column in CSV_COLUMNS}
+
+
+def test_insert_mode_takes_ids_from_the_insert(db):
+    inserter = BulkInserter(db, batch_size=7, index_trigrams=True, sample_size=100)
+    counts = inserter.add_columns(_columns(20))
+    inserter.flush()
+
+    assert counts == {"inserted": 20, "merged": 0, "rejected": 0}
+    stored = dict(db.execute(select(CompanyProfile.email, CompanyProfile.id)).all())
+    commit = db.execute(select(CompanyProfileCommit)).scalars().one()
+    assert (commit.min_id, commit.max_id, commit.row_count) == (min(stored.values()), max(stored.values()), 20)
+    # Postings and sample slots point at the row each value came from
+    postings = dict(db.execute(
+        select(CompanyProfileTrigram.trigram, CompanyProfileTrigram.profile_id)
+        .where(CompanyProfileTrigram.field_name == "first_name", CompanyProfileTrigram.trigram.like("e1_"))
+    ).all())
+    assert postings == {f"e1{digit}": stored[f"bulk1{digit}@example.com"] for digit in range(10)}
+    sampled = db.execute(select(CompanyProfileSample.profile_id, CompanyProfileSample.city)).all()
+    assert len(sampled) == 20
+    by_id = {profile_id: email for email, profile_id in stored.items()}
+    assert all(by_id[profile_id] == f"bulk{city[4:]}@example.com" for profile_id, city in sampled)
+
+
+def test_commit_log_covers_each_transaction(db):
+    inserter = BulkInserter(db, batch_size=100)
+    inserter.add_columns(_columns(3))
+    inserter.flush()
+    inserter.add_columns(_columns(4, start=3))
+    inserter.flush()
+
+    ids = sorted(db.execute(select(CompanyProfile.id)).scalars())
+    commits = db.execute(
+        select(CompanyProfileCommit.min_id, CompanyProfileCommit.max_id, CompanyProfileCommit.row_count)
+        .order_by(CompanyProfileCommit.generation)
+    ).all()
+    assert commits == [(ids[0], ids[2], 3), (ids[3], ids[6], 4)]
@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy import func, select
+from db_module.bulk_insert import BulkInserter, CSV_COLUMNS, INGEST_UPSERT
+from db_module.dataset_state import get_generation
+from db_module.rollup import rebuild_rollup
+from db_module.row_sample import rebuild_sample
+from db_module.trigram_index import rebuild_trigram_index
+from models import CompanyProfile
+from query_builder.columnar import ColumnarSnapshot
+from query_builder.filters import filter_conditions, normalize_filters
+
+PROFILES = [
+    {"city": "Kochi", "year_founded": 1990},
+    {"city": "Kozhikode"},
+    {"city": "Pune", "state": "Maharashtra", "industry": "Fintech"},
+    {"city": "Goa", "state": "Goa", "year_founded": 1990},
+    {"first_name": "Ankit", "city": "Kochi", "industry": "Print_Shop"},
+]
+FILTER_SETS = [
+    {},
+    {"city": "kochi"},
+    {"city": "KO", "match_mode": "prefix"},
+    {"city": "o"},
+    {"state": "kerala", "year_founded": 1990, "match_mode": "exact"},
+    {"industry": "print", "city": "ch", "match": "industry:prefix"},
+    {"industry": "t_s"},
+    {"first_name": "ank", "match_mode": "prefix"},
+    {"city": "delhi", "match_mode": "exact"},
+    {"year_founded": 1990, "country": "india"},
+]
+
+
+def _assert_parity(db, snapshot: ColumnarSnapshot):
+    for arguments in FILTER_SETS:
+        filters = normalize_filters(**arguments)
+        expected = db.execute(
+            select(func.count()).select_from(CompanyProfile).where(*filter_conditions(filters))
+        ).scalar()
+        assert snapshot.count(filters) == expected, arguments
+
+
+def test_columnar_counts_match_sql(db, add_profiles):
+    add_profiles(PROFILES)
+    snapshot = ColumnarSnapshot()
+    snapshot.refresh(db)
+    assert snapshot.rows == len(PROFILES)
+    _assert_parity(db, snapshot)
+
+
+def test_incremental_refresh_keeps_parity(db, add_profiles):
+    add_profiles(PROFILES[:2])
+    snapshot = ColumnarSnapshot()
+    snapshot.refresh(db)
+    add_profiles(PROFILES[2:])
+    snapshot.refresh(db)
+    assert snapshot.generation == get_generation(db)
+    assert snapshot.rows == len(PROFILES)
+    _assert_parity(db, snapshot)
+
+
+def test_upsert_reload_keeps_parity(db, add_profiles):
+    add_profiles(PROFILES)
+    snapshot = ColumnarSnapshot()
+    snapshot.refresh(db)
+    row = dict(db.execute(select(*(getattr(CompanyProfile, column) for column in CSV_COLUMNS))).mappings().first())
+    row["city"] = "Delhi"
+    inserter = BulkInserter(db, batch_size=100, mode=INGEST_UPSERT)
+    inserter.add_columns({column: [row[column]] for column in CSV_COLUMNS})
+    inserter.flush()
+    snapshot.refresh(db)
+    assert snapshot.rows == len(PROFILES)
+    assert snapshot.count(normalize_filters(city="delhi", match_mode="exact")) == 1
+    _assert_parity(db, snapshot)
+
+
+@pytest.mark.parametrize("rebuild", [
+    rebuild_rollup,
+    rebuild_trigram_index,
+    lambda db: rebuild_sample(db, 2),
+])
+def test_rebuilds_move_the_generation(db, add_profiles, rebuild):
+    add_profiles(PROFILES)
+    snapshot = ColumnarSnapshot()
+    snapshot.refresh(db)
+    before = get_generation(db)
+    rebuild(db)
+    db.commit()
+    assert get_generation(db) == before + 1
+    # No rows were inserted, so the snapshot follows without loading any
+    snapshot.refresh(db)
+    assert snapshot.generation == before + 1
+    assert snapshot.rows == len(PROFILES)
+    _assert_parity(db, snapshot)
@@ -0,0 +1,60 @@
+from db_module.rollup import rebuild_rollup
+from query_builder.api import count_cache
+
+FACETS_URL = "/query/company-profiles/facets/"
+PROFILES = [
+    {"city": "Kochi", "year_founded": 1990},
+    {"city": "Kochi", "year_founded": 2000},
+    {"city": "Pune", "year_founded": 2000},
+    {"city": "Pune", "state": "Maharashtra", "year_founded": 2000},
+    {"city": "Goa", "state": "Goa", "year_founded": 2010},
+]
+
+
+def _facets(client, **params) -> dict:
+    response = client.get(FACETS_URL, params={"facets": ["city", "year_founded"], **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_each_facet_is_counted_on_its_own(client, add_profiles):
+    add_profiles(PROFILES)
+    result = _facets(client, state="kerala", match_mode="exact")
+    assert result["total"] == 3
+    assert result["facets"] == {
+        "city": [{"value": "Kochi", "count": 2}, {"value": "Pune", "count": 1}],
+        "year_founded": [{"value": 2000, "count": 2}, {"value": 1990, "count": 1}],
+    }
+
+
+def test_top_n_keeps_the_largest_values(client, add_profiles):
+    add_profiles(PROFILES)
+    result = _facets(client, top_n=1)
+    assert result["total"] == 5
+    assert result["facets"] == {
+        "city": [{"value": "Kochi", "count": 2}],
+        "year_founded": [{"value": 2000, "count": 3}],
+    }
+
+
+def test_rollup_and_base_table_give_the_same_facets(client, db, add_profiles):
+    add_profiles(PROFILES)
+    from_base_table = _facets(client, country="india", match_mode="exact")
+    rebuild_rollup(db)
+    db.commit()
+    count_cache.clear()
+    assert _facets(client, country="india", match_mode="exact") == from_base_table
+
+
+def test_substring_filters_are_applied_to_the_facets(client, add_profiles):
+    add_profiles(PROFILES)
+    result = _facets(client, state="hara")
+    assert result["total"] == 1
+    assert result["facets"]["city"] == [{"value": "Pune", "count": 1}]
+
+
+def test_unknown_facets_and_filters_are_refused(client, add_profiles):
+    add_profiles(PROFILES)
+    assert client.get(FACETS_URL, params={"facets": "email"}).status_code == 400
+    assert client.get(FACETS_URL, params={"facets": "city", "match_mode": "fuzzy"}).status_code == 400
+    assert client.get("/query/company-profiles/", params={"city": "kochi", "match": "email:exact"}).status_code == 400
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import func, select
+from models import CompanyProfile, CompanyProfileRollup
+from query_builder.filters import (
+    filter_conditions,
+    filters_key,
+    normalize_filters,
+    MATCH_EXACT,
+    MATCH_PREFIX,
+    MATCH_SUBSTRING,
+)
+
+
+def test_values_are_stripped_lowered_and_empty_ones_dropped():
+    filters = normalize_filters(city="  Kochi ", state="", country=None, year_founded=1999)
+    assert filters == {"city": (MATCH_SUBSTRING, "kochi"), "year_founded": (MATCH_EXACT, 1999)}
+
+
+def test_match_overrides_the_default_mode_per_field():
+    filters = normalize_filters(city="Kochi", industry="Print", match_mode=MATCH_EXACT, match="industry:prefix")
+    assert filters == {"city": (MATCH_EXACT, "kochi"), "industry": (MATCH_PREFIX, "print")}
+
+
+@pytest.mark.parametrize("arguments", [
+    {"match_mode": "fuzzy"},
+    {"match": "email:exact"},
+    {"match": "city:fuzzy"},
+])
+def test_unknown_modes_and_fields_are_refused(arguments):
+    with pytest.raises(ValueError):
+        normalize_filters(city="Kochi", **arguments)
+
+
+def test_equivalent_requests_share_a_key():
+    assert filters_key(normalize_filters(city="KOCHI", state="Kerala")) == \
+        filters_key(normalize_filters(state=" kerala", city="kochi"))
+
+
+def _count(db, filters, model=CompanyProfile) -> int:
+    conditions = filter_conditions(filters, model=model)
+    if model is CompanyProfileRollup:
+        column = func.coalesce(func.sum(CompanyProfileRollup.row_count), 0)
+    else:
+        column = func.count()
+    return db.execute(select(column).select_from(model).where(*conditions)).scalar()
+
+
+def test_conditions_match_each_mode(db, add_profiles):
+    add_profiles([
+        {"city": "Kochi", "industry": "Printmaker"},
+        {"city": "Kochin", "industry": "Print_maker"},
+        {"city": "New Kochi", "industry": "100% Printing"},
+    ])
+    assert _count(db, normalize_filters(city="kochi", match_mode=MATCH_EXACT)) == 1
+    assert _count(db, normalize_filters(city="koch", match_mode=MATCH_PREFIX)) == 2
+    assert _count(db, normalize_filters(city="kochi")) == 3
+    # LIKE wildcards in a value are matched literally
+    assert _count(db, normalize_filters(industry="print_")) == 1
+    assert _count(db, normalize_filters(industry="100%")) == 1
+
+
+def test_exact_filters_give_the_same_count_on_the_rollup(db, add_profiles):
+    add_profiles([{"city": "Kochi"}, {"city": "Kochi", "year_founded": 1990}, {"city": "Pune"}])
+    filters = normalize_filters(city="kochi", year_founded=1990, match_mode=MATCH_EXACT)
+    assert _count(db, filters) == _count(db, filters, model=CompanyProfileRollup) == 1
@@ -0,0 +1,60 @@
+from sqlalchemy import select
+import query_builder.recorder as recorder_module
+from models import QueryPatternStat
+from query_builder.filters import normalize_filters
+from query_builder.index_advisor import propose_indexes
+from query_builder.recorder import QueryRecorder
+
+
+def _entry(total_ms: float, **arguments) -> dict:
+    filters = normalize_filters(match_mode="exact", **arguments)
+    pattern = ",".join(f"{field}:{mode}" for field, (mode, value) in sorted(filters.items()))
+    return {"pattern": pattern, "calls": 1, "total_ms": total_ms, "filters": filters}
+
+
+def test_recorder_starts_one_flush_at_a_time(db, monkeypatch):
+    started = []
+
+    class PendingThread:
+        def __init__(self, target, name, daemon):
+            self.target = target
+
+        def start(self):
+            started.append(self.target)
+
+    monkeypatch.setattr(recorder_module.threading, "Thread", PendingThread)
+    monkeypatch.setattr(recorder_module.settings, "QUERY_RECORDER_ENABLED", True)
+    monkeypatch.setattr(recorder_module.settings, "QUERY_RECORDER_FLUSH_SECONDS", 0)
+    recorder = QueryRecorder()
+    for _ in range(50):
+        recorder.record(normalize_filters(city="kochi"), 2.0)
+    assert len(started) == 1
+
+    started[0]()
+    stat = db.execute(select(QueryPatternStat)).scalar_one()
+    assert (stat.pattern, stat.calls, stat.total_ms) == ("city:substring", 50, 100.0)
+    # Once that flush is done the next due query starts another
+    recorder.record(normalize_filters(city="kochi"), 2.0)
+    assert len(started) == 2
+
+
+def test_proposal_is_folded_into_the_longer_one_it_leads(db, add_profiles):
+    # year_founded is the most selective column, so it leads both proposals
+    add_profiles([{"year_founded": 1990 + index} for index in range(6)])
+    workload = [
+        _entry(10.0, year_founded=1990),
+        _entry(5.0, year_founded=1990, city="kochi"),
+    ]
+    for entries in (workload, workload[::-1]):
+        proposals = propose_indexes(db, entries)
+        assert [proposal["columns"] for proposal in proposals] == [["year_founded", "city"]]
+        assert proposals[0]["benefit_ms"] == 15.0
+        assert sorted(proposals[0]["patterns"]) == ["city:exact,year_founded:exact", "year_founded:exact"]
+
+
+def test_patterns_served_by_an_existing_index_are_skipped(db, add_profiles):
+    add_profiles([{}, {}])
+    workload = [_entry(10.0, city="kochi"), _entry(3.0, city="kochi", year_founded=2000), _entry(1.0, state="k")]
+    proposals = propose_indexes(db, workload)
+    assert [proposal["columns"] for proposal in proposals] == [["city", "year_founded"]]
+    assert proposals[0]["benefit_ms"] == 3.0
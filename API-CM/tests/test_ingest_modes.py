@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from db_module.bulk_insert import (
+    BulkInserter,
+    CSV_COLUMNS,
+    INGEST_INSERT,
+    INGEST_SKIP_DUPLICATES,
+    INGEST_UPSERT,
+)
+from models import CompanyProfile, CompanyProfileRollup
+
+
+def _chunk(rows: list) -> pd.DataFrame:
+    return pd.DataFrame([
+        {
+            "first_name": "Name",
+            "last_name": "Tester",
+            "email": email,
+            "mobile_number": "9424339341",
+            "city": city,
+            "state": "Kerala",
+            "country": "India",
+            "industry": "Printmaker",
+            "year_founded": 2001,
+        }
+        for email, city in rows
+    ], columns=CSV_COLUMNS)
+
+
+def _write(db, mode: str, rows: list) -> dict:
+    inserter = BulkInserter(db, batch_size=100, mode=mode)
+    counts = inserter.add_chunk(_chunk(rows))
+    inserter.flush()
+    return counts
+
+
+def _cities(db) -> dict:
+    return dict(db.execute(select(CompanyProfile.email, CompanyProfile.city)).all())
+
+
+def _rollup(db) -> dict:
+    return dict(db.execute(select(CompanyProfileRollup.city, CompanyProfileRollup.row_count)).all())
+
+
+def test_insert_fails_on_a_stored_email(db):
+    _write(db, INGEST_INSERT, [("a@example.com", "Kochi")])
+    with pytest.raises(IntegrityError):
+        _write(db, INGEST_INSERT, [("b@example.com", "Kochi"), ("a@example.com", "Pune")])
+
+
+def test_skip_duplicates_keeps_stored_and_first_rows(db):
+    _write(db, INGEST_INSERT, [("a@example.com", "Kochi")])
+    counts = _write(db, INGEST_SKIP_DUPLICATES, [
+        ("a@example.com", "Pune"),
+        ("b@example.com", "Delhi"),
+        ("b@example.com", "Goa"),
+    ])
+
+    assert counts == {"inserted": 1, "merged": 0, "rejected": 2}
+    assert _cities(db) == {"a@example.com": "Kochi", "b@example.com": "Delhi"}
+    assert _rollup(db) == {"Kochi": 1, "Delhi": 1}
+
+
+def test_upsert_overwrites_with_the_last_row(db):
+    _write(db, INGEST_INSERT, [("a@example.com", "Kochi")])
+    counts = _write(db, INGEST_UPSERT, [
+        ("a@example.com", "Pune"),
+        ("b@example.com", "Delhi"),
+        ("b@example.com", "Goa"),
+    ])
+
+    assert counts == {"inserted": 1, "merged": 2, "rejected": 0}
+    assert _cities(db) == {"a@example.com": "Pune", "b@example.com": "Goa"}
+    # The rewritten row moved from its old rollup row to the new one
+    assert _rollup(db) == {"Kochi": 0, "Pune": 1, "Goa": 1}
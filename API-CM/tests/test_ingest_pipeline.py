@@ -0,0 +1,86 @@
+import io
+from models import IngestionJob
+from utils.csv_reader import iter_csv_tasks
+from utils.helper import ingest_stored_file
+from utils.ingest_pipeline import CheckpointTracker
+
+
+def test_checkpoint_advances_in_order():
+    tracker = CheckpointTracker(offset=10, row=0)
+    tracker.register(0, 20, 5)
+    assert tracker.checkpoint_if_next(0) == (20, 5)
+    assert tracker.complete(0) == (20, 5)
+
+
+def test_checkpoint_waits_for_earlier_chunks():
+    tracker = CheckpointTracker(offset=0, row=0)
+    for seq, end in enumerate((10, 20, 30)):
+        tracker.register(seq, end, 2)
+    # Chunks 1 and 2 commit first, the prefix stays put
+    assert tracker.checkpoint_if_next(1) is None
+    assert tracker.complete(1) == (0, 0)
+    assert tracker.complete(2) == (0, 0)
+    # Chunk 0 closes the gap and the prefix covers all three
+    assert tracker.checkpoint_if_next(0) == (10, 2)
+    assert tracker.complete(0) == (30, 6)
+
+
+def _csv(lines: int) -> bytes:
+    return b"name\n" + b"".join(b"row%d\n" % i for i in range(lines))
+
+
+def _ranges(tasks):
+    return [(start, end) for function, args, start, end in tasks]
+
+
+def test_csv_tasks_cover_the_file_on_line_boundaries():
+    data = _csv(20)
+    tasks = list(iter_csv_tasks(io.BytesIO(data), 0, 16, "insert"))
+    ranges = _ranges(tasks)
+    assert ranges[0][0] == len(b"name\n")
+    assert ranges[-1][1] == len(data)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert all(data[end - 1:end] == b"\n" for _, end in ranges)
+
+
+def test_csv_tasks_skip_committed_ranges():
+    data = _csv(20)
+    ranges = _ranges(iter_csv_tasks(io.BytesIO(data), 0, 16, "insert"))
+    # A crash left chunk 1 and 3 committed past a checkpoint at the end of chunk 0
+    committed = [(ranges[1][0], ranges[1][1], 3), (ranges[3][0], ranges[3][1], 3)]
+    tasks = list(iter_csv_tasks(io.BytesIO(data), ranges[0][1], 16, "insert", committed))
+
+    skipped = [(start, end, args) for function, args, start, end in tasks if function is None]
+    assert skipped == [(start, end, (rows,)) for start, end, rows in committed]
+    parsed = b"".join(args[1] for function, args, start, end in tasks if function is not None)
+    expected = b"".join(
+        data[start:end] for start, end in ranges[2:] if (start, end) != (ranges[3][0], ranges[3][1])
+    )
+    assert parsed == expected
+
+
+def test_csv_tasks_cut_blocks_at_committed_edges():
+    data = _csv(20)
+    # Committed by a run with a different block size, so not aligned with these blocks
+    start = data.index(b"row3\n")
+    end = data.index(b"row9\n")
+    tasks = list(iter_csv_tasks(io.BytesIO(data), 0, 16, "insert", [(start, end, 6)]))
+
+    covered = b"".join(data[task_start:task_end] for _, _, task_start, task_end in tasks)
+    assert covered == data[len(b"name\n"):]
+    parsed = b"".join(args[1] for function, args, _, _ in tasks if function is not None)
+    assert b"row3\n" not in parsed and b"row8\n" not in parsed
+    assert b"row2\n" in parsed and b"row9\n" in parsed
+
+
+def test_finished_job_reports_its_throughput(client, db):
+    content = (
+        b"first_name,last_name,email,mobile_number,city,state,country,industry,year_founded\n"
+        b"Jai,Toor,rate@example.com,9424339341,Kochi,Kerala,India,Printmaker,2001\n"
+    )
+    upload = client.post("/upload_csv/upload-csv/", files={"file": ("rate.csv", content, "text/csv")}).json()
+    stats = ingest_stored_file(upload["job_id"])
+
+    job = db.get(IngestionJob, upload["job_id"])
+    assert job.rows_inserted == 1
+    assert job.rows_per_sec == stats["rows_per_sec"] > 0
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select, update
+from db_module.ingestion_job import (
+    JOB_COMPLETED,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    claim_next_job,
+    create_ingestion_job,
+    heartbeat_jobs,
+    requeue_stale_jobs,
+)
+from models import CompanyProfile, IngestionJob, IngestionJobChunk, UploadedFile
+from utils.config import get_settings
+from utils.helper import ingest_stored_file
+
+settings = get_settings()
+
+HEADER = b"first_name,last_name,email,mobile_number,city,state,country,industry,year_founded\n"
+
+
+def _csv(emails: list) -> bytes:
+    return HEADER + b"".join(
+        b"Name,Tester,%s,9424339341,Kochi,Kerala,India,Printmaker,2001\n" % email.encode() for email in emails
+    )
+
+
+def _emails(db) -> list:
+    return sorted(db.execute(select(CompanyProfile.email)).scalars())
+
+
+def test_reupload_of_a_failed_file_resumes_from_its_checkpoint(client, db, add_profiles, monkeypatch):
+    # One line per chunk, so the job commits a checkpoint after each row
+    monkeypatch.setattr(settings, "INGEST_CHUNK_BYTES", 8)
+    add_profiles([{"email": "c@example.com"}])
+    content = _csv(["a@example.com", "b@example.com", "c@example.com"])
+    first = client.post("/upload_csv/upload-csv/", files={"file": ("profiles.csv", content, "text/csv")}).json()
+
+    # The third row hits the unique email index and fails the job after two committed chunks
+    with pytest.raises(RuntimeError):
+        ingest_stored_file(first["job_id"])
+    failed = db.get(IngestionJob, first["job_id"])
+    assert (failed.status, failed.checkpoint_row) == (JOB_FAILED, 2)
+
+    # Once the conflicting row is gone the same file is uploaded again
+    db.execute(CompanyProfile.__table__.delete().where(CompanyProfile.email == "c@example.com"))
+    db.commit()
+    second = client.post("/upload_csv/upload-csv/", files={"file": ("profiles.csv", content, "text/csv")}).json()
+
+    assert second["duplicate"] is False
+    assert second["resumed_from_row"] == 2
+    assert db.get(UploadedFile, second["sha256"]).job_id == second["job_id"]
+    stats = ingest_stored_file(second["job_id"])
+    db.expire_all()
+    resumed = db.get(IngestionJob, second["job_id"])
+    assert (resumed.status, resumed.rows_inserted, resumed.checkpoint_row) == (JOB_COMPLETED, 1, 3)
+    assert stats["rows_inserted"] == 1
+    assert _emails(db) == ["a@example.com", "b@example.com", "c@example.com"]
+
+
+def test_resume_skips_chunks_committed_past_the_checkpoint(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_CHUNK_BYTES", 8)
+    content = _csv(["a@example.com", "b@example.com", "c@example.com"])
+    first = client.post("/upload_csv/upload-csv/", files={"file": ("profiles.csv", content, "text/csv")}).json()
+    ingest_stored_file(first["job_id"])
+
+    # As if the job had failed with the first row checkpointed and the third committed out of order
+    lines = content.split(b"\n")
+    first_end = len(lines[0]) + len(lines[1]) + 2
+    third_start = first_end + len(lines[2]) + 1
+    job = db.get(IngestionJob, first["job_id"])
+    job.status, job.checkpoint_offset, job.checkpoint_row = JOB_FAILED, first_end, 1
+    db.add(IngestionJobChunk(job_id=job.job_id, start_offset=third_start, end_offset=len(content), row_count=1))
+    db.execute(CompanyProfile.__table__.delete().where(CompanyProfile.email == "b@example.com"))
+    db.commit()
+
+    second = client.post("/upload_csv/upload-csv/", files={"file": ("profiles.csv", content, "text/csv")}).json()
+    ingest_stored_file(second["job_id"])
+
+    db.expire_all()
+    assert db.get(IngestionJob, second["job_id"]).rows_inserted == 1
+    assert _emails(db) == ["a@example.com", "b@example.com", "c@example.com"]
+
+
+def _queue(db, *users) -> list:
+    return [create_ingestion_job(db, user, "profiles.csv", f"/files/{index}.csv").job_id
+            for index, user in enumerate(users)]
+
+
+def test_claims_go_to_the_user_with_the_fewest_running_jobs(db):
+    # User 1 queued a backlog before user 2's single upload
+    first, second, third, other = _queue(db, 1, 1, 1, 2)
+    claimed = [claim_next_job(db, "worker-a").job_id for _ in range(4)]
+    assert claimed == [first, other, second, third]
+    assert claim_next_job(db, "worker-a") is None
+
+
+def test_a_job_is_claimed_by_one_worker(db):
+    job_id, = _queue(db, 1)
+    job = claim_next_job(db, "worker-a")
+    assert (job.job_id, job.status, job.worker_id) == (job_id, JOB_RUNNING, "worker-a")
+    assert claim_next_job(db, "worker-b") is None
+
+
+def test_jobs_of_a_silent_worker_are_requeued(db):
+    stale_id, alive_id = _queue(db, 1, 2)
+    claim_next_job(db, "worker-a")
+    claim_next_job(db, "worker-b")
+    db.execute(update(IngestionJob).values(heartbeat_at=datetime.utcnow() - timedelta(minutes=10)))
+    db.commit()
+    heartbeat_jobs(db, "worker-b", [alive_id])
+
+    assert requeue_stale_jobs(db, stale_seconds=60) == 1
+    db.expire_all()
+    stale, alive = db.get(IngestionJob, stale_id), db.get(IngestionJob, alive_id)
+    assert (stale.status, stale.worker_id) == (JOB_QUEUED, None)
+    assert (alive.status, alive.worker_id) == (JOB_RUNNING, "worker-b")
+    assert claim_next_job(db, "worker-c").job_id == stale_id
+
+
+def test_heartbeat_of_another_worker_does_not_keep_a_job(db):
+    job_id, = _queue(db, 1)
+    claim_next_job(db, "worker-a")
+    db.execute(update(IngestionJob).values(heartbeat_at=datetime.utcnow() - timedelta(minutes=10)))
+    db.commit()
+    heartbeat_jobs(db, "worker-b", [job_id])
+    assert requeue_stale_jobs(db, stale_seconds=60) == 1
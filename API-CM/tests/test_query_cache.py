@@ -0,0 +1,50 @@
+import query_builder.api as query_api
+
+
+COUNT_URL = "/query/company-profiles/"
+EXACT_PUNE = {"city": "pune", "match_mode": "exact"}
+
+
+def test_repeated_count_is_served_from_the_cache(client, add_profiles, monkeypatch):
+    add_profiles([{"city": "Pune"}, {}])
+    calls = []
+    count_company_profiles = query_api.count_company_profiles
+
+    async def counting(*args, **kwargs):
+        calls.append(args[1])
+        return await count_company_profiles(*args, **kwargs)
+
+    monkeypatch.setattr(query_api, "count_company_profiles", counting)
+    first = client.get(COUNT_URL, params=EXACT_PUNE)
+    second = client.get(COUNT_URL, params=EXACT_PUNE)
+    assert first.json() == second.json() == {"count": 1}
+    assert len(calls) == 1
+
+
+def test_matching_etag_answers_304(client, add_profiles):
+    add_profiles([{"city": "Pune"}, {}])
+    first = client.get(COUNT_URL, params=EXACT_PUNE)
+    etag = first.headers["ETag"]
+    second = client.get(COUNT_URL, params=EXACT_PUNE, headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+    assert second.content == b""
+
+
+def test_ingest_commit_changes_the_etag_and_the_count(client, add_profiles):
+    add_profiles([{"city": "Pune"}, {}])
+    first = client.get(COUNT_URL, params=EXACT_PUNE)
+    add_profiles([{"city": "Pune"}])
+    second = client.get(COUNT_URL, params=EXACT_PUNE, headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.json() == {"count": 2}
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+
+def test_etag_differs_between_filters(client, add_profiles):
+    add_profiles([{"city": "Pune"}, {}])
+    pune = client.get(COUNT_URL, params=EXACT_PUNE)
+    kochi = client.get(COUNT_URL, params={"city": "kochi", "match_mode": "exact"},
+                       headers={"If-None-Match": pune.headers["ETag"]})
+    assert kochi.status_code == 200
+    assert kochi.json() == {"count": 1}
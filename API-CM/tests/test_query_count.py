@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from sqlalchemy import delete
+from db_module.connection import AsyncSessionLocal
+from db_module.dataset_state import mark_backfilled
+from db_module.rollup import ROLLUP_BACKFILLED
+from db_module.row_sample import SAMPLE_BACKFILLED
+from models import CompanyProfileRollup
+from query_builder.api import estimate_company_profiles
+from query_builder.filters import normalize_filters, MATCH_EXACT
+
+EXACT_FALLBACK = {"count": 1, "approximate": False, "confidence_interval": [1, 1], "sample_size": 0}
+
+
+@pytest.fixture
+def backfilled(db):
+    """Rollup and sample cover every profile, as on a fresh install"""
+    for name in (ROLLUP_BACKFILLED, SAMPLE_BACKFILLED):
+        mark_backfilled(db, name)
+    db.commit()
+
+
+def _estimate(filters: dict) -> dict:
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await estimate_company_profiles(db, filters)
+    return asyncio.run(run())
+
+
+def test_empty_sample_falls_back_to_the_exact_count(add_profiles, backfilled):
+    add_profiles([{"city": "Pune"}, {}, {}])
+    assert _estimate(normalize_filters(city="pune", match_mode=MATCH_EXACT)) == EXACT_FALLBACK
+
+
+def test_sample_not_backfilled_falls_back_to_the_exact_count(db, add_profiles):
+    add_profiles([{"city": "Pune"}, {}, {}, {}], sample_size=10)
+    mark_backfilled(db, ROLLUP_BACKFILLED)
+    db.commit()
+    assert _estimate(normalize_filters(city="pune", match_mode=MATCH_EXACT)) == EXACT_FALLBACK
+
+
+def test_rollup_not_backfilled_falls_back_to_the_exact_count(db, add_profiles):
+    add_profiles([{"city": "Pune"}, {}, {}, {}], sample_size=10)
+    mark_backfilled(db, SAMPLE_BACKFILLED)
+    db.commit()
+    assert _estimate(normalize_filters(city="pune", match_mode=MATCH_EXACT)) == EXACT_FALLBACK
+
+
+def test_total_below_the_sample_size_falls_back_to_the_exact_count(db, add_profiles, backfilled):
+    add_profiles([{"city": "Pune"}, {}, {}, {}], sample_size=10)
+    db.execute(delete(CompanyProfileRollup))
+    db.commit()
+    # Substring match, so the exact count scans the table instead of the emptied rollup
+    assert _estimate(normalize_filters(city="pune")) == EXACT_FALLBACK
+
+
+def test_sample_holding_the_whole_table_is_exact(add_profiles, backfilled):
+    add_profiles([{"city": "Pune"}, {}, {}, {}], sample_size=10)
+    estimate = _estimate(normalize_filters(city="pune", match_mode=MATCH_EXACT))
+    assert estimate == {"count": 1, "approximate": False, "confidence_interval": [1, 1], "sample_size": 4}
+
+
+def test_partial_sample_scales_with_an_interval(add_profiles, backfilled):
+    add_profiles([{"city": "Pune"} if index % 2 else {} for index in range(60)], sample_size=20)
+    estimate = _estimate(normalize_filters(city="pune", match_mode=MATCH_EXACT))
+    assert estimate["approximate"] is True
+    assert estimate["sample_size"] == 20
+    low, high = estimate["confidence_interval"]
+    assert 0 <= low <= estimate["count"] <= high <= 60
+
+
+def test_filter_matching_every_row_estimates_the_total(add_profiles, backfilled):
+    add_profiles([{} for _ in range(60)], sample_size=20)
+    estimate = _estimate(normalize_filters(country="india", match_mode=MATCH_EXACT))
+    assert estimate["approximate"] is True
+    assert estimate["count"] == 60
+    assert estimate["confidence_interval"][1] == 60
@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine, delete, select
+from db_module import connection
+from models import CompanyProfile
+
+
+def test_url_overrides_replace_the_mysql_urls(primary_path, replica_path):
+    assert connection.engine.url.database == primary_path
+    assert connection.async_engine.url.drivername == "sqlite+aiosqlite"
+    assert [replica.url.database for replica in connection.replica_engines] == [replica_path]
+    assert [replica.url.database for replica in connection.async_replica_engines] == [replica_path]
+
+
+def test_router_without_replicas_uses_the_primary():
+    router = connection.ReadRouter([], connection.SessionLocal)
+    assert router.next() is connection.SessionLocal
+    assert router.next() is connection.SessionLocal
+
+
+def test_router_round_robins_over_replicas():
+    first, second = object(), object()
+    router = connection.ReadRouter([first, second], connection.SessionLocal)
+    assert [router.next() for _ in range(4)] == [first, second, first, second]
+
+
+def test_sync_reads_go_to_the_replica(replica_path):
+    session = connection.ReadSessionLocal()
+    try:
+        assert session.get_bind().url.database == replica_path
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def replica_only_profile(replica_path):
+    """A profile present on the replica file and not on the primary"""
+    replica = create_engine(f"sqlite:///{replica_path}")
+    with replica.begin() as replica_connection:
+        replica_connection.execute(CompanyProfile.__table__.insert().values(
+            first_name="Replica", last_name="Only", email="replica@example.com", mobile_number="9999999999",
+            city="Kochi", state="Kerala", country="India", industry="Printmaker", year_founded=2000,
+        ))
+    yield "replica@example.com"
+    with replica.begin() as replica_connection:
+        replica_connection.execute(delete(CompanyProfile))
+    replica.dispose()
+
+
+def test_async_reads_go_to_the_replica_and_writes_stay_on_the_primary(replica_only_profile):
+    query = select(CompanyProfile.email).where(CompanyProfile.email == replica_only_profile)
+
+    async def run():
+        read_db = connection.get_read_db()
+        db = await read_db.__anext__()
+        try:
+            on_replica = (await db.execute(query)).scalar()
+        finally:
+            await read_db.aclose()
+        async for db in connection.get_async_db():
+            on_primary = (await db.execute(query)).scalar()
+        return on_replica, on_primary
+
+    assert asyncio.run(run()) == (replica_only_profile, None)
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+import pytest
+import query_builder.api as query_api
+from db_module.connection import SessionLocal
+
+ROWS_URL = "/query/company-profiles/rows/"
+EXPORT_URL = "/query/company-profiles/export/"
+
+
+@pytest.fixture
+def export_from_primary(monkeypatch):
+    """The export opens its own read session; point it at the primary the tests write to"""
+    monkeypatch.setattr(query_api, "ReadSessionLocal", SessionLocal)
+
+
+def _pages(client, **params) -> list:
+    pages, after_id = [], 0
+    while after_id is not None:
+        page = client.get(ROWS_URL, params={"after_id": after_id, **params}).json()
+        pages.append(page["rows"])
+        after_id = page["next_cursor"]
+    return pages
+
+
+def test_cursor_walks_every_matching_row_once(client, add_profiles):
+    add_profiles([{"city": "Pune"} if index % 3 == 0 else {} for index in range(8)])
+    pages = _pages(client, city="pune", limit=2)
+    assert [len(page) for page in pages] == [2, 1]
+    ids = [row["id"] for page in pages for row in page]
+    assert ids == sorted(ids) and len(set(ids)) == 3
+    assert all(row["city"] == "Pune" for page in pages for row in page)
+
+
+def test_last_page_has_no_cursor(client, add_profiles):
+    add_profiles([{}, {}])
+    page = client.get(ROWS_URL, params={"limit": 2}).json()
+    assert len(page["rows"]) == 2
+    assert page["next_cursor"] is None
+    assert client.get(ROWS_URL, params={"after_id": page["rows"][-1]["id"]}).json() == {"rows": [], "next_cursor": None}
+
+
+def test_page_size_is_capped(client, add_profiles, monkeypatch):
+    add_profiles([{}, {}, {}])
+    monkeypatch.setattr(query_api.settings, "QUERY_PAGE_MAX_ROWS", 2)
+    page = client.get(ROWS_URL, params={"limit": 100}).json()
+    assert len(page["rows"]) == 2
+    assert page["next_cursor"] == page["rows"][-1]["id"]
+
+
+def test_csv_export_streams_the_matching_rows(client, add_profiles, export_from_primary):
+    add_profiles([{"city": "Pune"}, {}, {"city": "Pune"}])
+    response = client.get(EXPORT_URL, params={"city": "pune", "match_mode": "exact"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == query_api.ROW_COLUMNS
+    assert [row[rows[0].index("email")] for row in rows[1:]] == ["user0@example.com", "user2@example.com"]
+
+
+def test_ndjson_export_matches_the_rows_endpoint(client, add_profiles, export_from_primary):
+    add_profiles([{"city": "Pune"}, {}, {"city": "Pune"}])
+    response = client.get(EXPORT_URL, params={"city": "pun", "format": "ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert exported == client.get(ROWS_URL, params={"city": "pun"}).json()["rows"]
+
+
+def test_unknown_export_format_is_refused(client):
+    assert client.get(EXPORT_URL, params={"format": "xml"}).status_code == 400
@@ -0,0 +1,40 @@
+from db_module.trigram_index import rebuild_trigram_index, trigrams
+from query_builder.api import settings
+from query_builder.filters import normalize_filters, plan_trigrams
+
+COUNT_URL = "/query/company-profiles/"
+
+
+def test_trigrams_are_folded_like_the_collation():
+    assert trigrams("São") == trigrams("sao") == trigrams(" SAO ") == {"sao"}
+    assert trigrams("Kö") == set()
+
+
+def test_substring_counts_ignore_the_index_until_it_is_backfilled(client, db, add_profiles):
+    # Written without postings, as profiles stored before the index existed
+    add_profiles([{"city": "Kochi"}, {"city": "Kozhikode"}, {"city": "Pune"}])
+    assert plan_trigrams(db, normalize_filters(city="koch")) == {}
+    assert client.get(COUNT_URL, params={"city": "koch"}).json() == {"count": 1}
+    assert client.get(COUNT_URL, params={"city": "ko"}).json() == {"count": 2}
+
+
+def test_backfilled_index_narrows_substring_filters(client, db, add_profiles):
+    add_profiles([{"city": "São Paulo"}, {"city": "Kochi"}])
+    rebuild_trigram_index(db)
+    db.commit()
+    assert plan_trigrams(db, normalize_filters(city="paulo")) == {"city": ["aul", "pau", "ulo"]}
+    assert client.get(COUNT_URL, params={"city": "paulo"}).json() == {"count": 1}
+    # A profile without postings is not a candidate: the answer went through the index
+    add_profiles([{"city": "Paulo Afonso"}])
+    assert client.get(COUNT_URL, params={"city": "paulo"}).json() == {"count": 1}
+
+
+def test_common_trigrams_are_left_to_the_like(client, db, add_profiles, monkeypatch):
+    add_profiles([{"city": "Kochi"}, {"city": "Kochi"}, {"city": "Pochi"}])
+    rebuild_trigram_index(db)
+    db.commit()
+    monkeypatch.setattr(settings, "TRIGRAM_MAX_POSTINGS", 2)
+    assert plan_trigrams(db, normalize_filters(city="kochi")) == {"city": ["koc"]}
+    assert plan_trigrams(db, normalize_filters(city="ochi")) == {}
+    assert client.get(COUNT_URL, params={"city": "kochi"}).json() == {"count": 2}
+    assert client.get(COUNT_URL, params={"city": "ochi"}).json() == {"count": 3}
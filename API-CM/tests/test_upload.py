@@ -0,0 +1,103 @@
+import hashlib
+import os
+from sqlalchemy import select
+from models import IngestionJob, UploadedFile
+from utils.config import get_settings
+
+settings = get_settings()
+
+CSV = (
+    b"first_name,last_name,email,mobile_number,city,state,country,industry,year_founded\n"
+    b"Jai,Toor,jai@example.com,9424339341,Kochi,Kerala,India,Printmaker,2001\n"
+)
+
+
+def _upload(client, content: bytes = CSV, name: str = "profiles.csv", **params):
+    return client.post("/upload_csv/upload-csv/", params=params, files={"file": (name, content, "text/csv")})
+
+
+def test_upload_is_stored_under_its_hash_and_queued(client, db):
+    response = _upload(client)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["sha256"] == hashlib.sha256(CSV).hexdigest()
+    assert body["size"] == len(CSV)
+    stored = os.path.join(settings.PROJECT_FILE_DIR, f"{body['sha256']}.csv")
+    with open(stored, "rb") as stored_file:
+        assert stored_file.read() == CSV
+    job = db.get(IngestionJob, body["job_id"])
+    assert (job.status, job.file_path, job.auth_profile_id) == ("queued", stored, 1)
+
+
+def test_declared_size_over_the_limit_is_refused_before_reading(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", 1024)
+    response = _upload(client, CSV + b"x" * (80 * 1024))
+
+    assert response.status_code == 413
+    assert db.execute(select(IngestionJob)).first() is None
+    assert not [name for name in os.listdir(settings.PROJECT_FILE_DIR) if name.startswith("incoming-")]
+
+
+def test_body_growing_past_the_limit_is_refused(client, db, monkeypatch):
+    # Within the multipart allowance of the Content-Length check, caught while streaming
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", len(CSV) - 1)
+    response = _upload(client)
+
+    assert response.status_code == 413
+    assert db.execute(select(UploadedFile)).first() is None
+    assert not [name for name in os.listdir(settings.PROJECT_FILE_DIR) if name.startswith("incoming-")]
+
+
+def test_unsupported_format_and_missing_field(client):
+    assert _upload(client, name="profiles.txt").status_code == 400
+    response = client.post("/upload_csv/upload-csv/", files={"other": ("profiles.csv", CSV, "text/csv")})
+    assert response.status_code == 400
+
+
+def test_same_content_from_the_same_user_returns_the_earlier_job(client):
+    first = _upload(client).json()
+    second = _upload(client, name="renamed.csv").json()
+
+    assert second["duplicate"] is True
+    assert second["job_id"] == first["job_id"]
+    assert second["job"]["file_name"] == "profiles.csv"
+
+
+def test_same_content_from_another_user_reveals_no_job(client, as_user):
+    _upload(client)
+    as_user(2)
+    response = _upload(client)
+
+    assert response.json() == {
+        "message": "File was already uploaded and ingested, it is not processed again.",
+        "duplicate": True,
+        "size": len(CSV),
+        "sha256": hashlib.sha256(CSV).hexdigest(),
+    }
+
+
+def test_upsert_of_known_content_is_queued_again(client, db):
+    first = _upload(client).json()
+    second = _upload(client, mode="upsert").json()
+
+    assert second["duplicate"] is False
+    assert second["job_id"] != first["job_id"]
+    assert db.get(IngestionJob, second["job_id"]).mode == "upsert"
+    assert db.get(UploadedFile, first["sha256"]).job_id == second["job_id"]
+
+
+def test_full_ingest_queue_refuses_uploads_with_503(client, monkeypatch):
+    assert _upload(client).status_code == 200
+    monkeypatch.setattr(settings, "INGEST_QUEUE_MAX_JOBS", 1)
+    response = _upload(client, CSV.replace(b"jai@", b"ravi@"))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "60"
+
+
+def test_user_over_the_job_limit_gets_429_while_others_upload(client, as_user, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_USER_MAX_JOBS", 1)
+    assert _upload(client).status_code == 200
+    assert _upload(client, CSV.replace(b"jai@", b"ravi@")).status_code == 429
+    as_user(2)
+    assert _upload(client, CSV.replace(b"jai@", b"anu@")).status_code == 200
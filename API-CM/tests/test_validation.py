@@ -0,0 +1,109 @@
+import os
+import pandas as pd
+import pytest
+from sqlalchemy.exc import OperationalError
+from db_module.bulk_insert import BulkInserter, CSV_COLUMNS
+from models import IngestionJob
+from utils import ingest_pipeline
+from utils.config import get_settings
+from utils.csv_reader import rejects_path_for
+from utils.helper import ingest_stored_file
+from utils.validation import REJECT_REASON_COLUMN, validate_chunk
+
+settings = get_settings()
+
+
+def _chunk(**overrides) -> pd.DataFrame:
+    row = {
+        "first_name": " Jai ",
+        "last_name": "Toor",
+        "email": "jai@example.com",
+        "mobile_number": "9424339341",
+        "city": "Kochi",
+        "state": "Kerala",
+        "country": "India",
+        "industry": "Printmaker",
+        "year_founded": "2001",
+    }
+    row.update(overrides)
+    return pd.DataFrame([row], dtype=object)
+
+
+def test_valid_row_is_cleaned():
+    valid, rejected = validate_chunk(_chunk(), CSV_COLUMNS)
+    assert rejected.empty
+    assert valid.iloc[0]["first_name"] == "Jai"
+    assert valid.iloc[0]["year_founded"] == 2001
+
+
+@pytest.mark.parametrize("overrides, reason", [
+    ({"city": "  "}, "city is required"),
+    ({"email": "not-an-email"}, "Invalid Email Format"),
+    ({"mobile_number": "12345"}, "mobile_number should be 10 digits"),
+    ({"year_founded": "19x0"}, "year_founded should be a number"),
+    ({"year_founded": "1700"}, "year_founded should be between"),
+    ({"first_name": "x" * 51}, "first_name is longer than 50 characters"),
+])
+def test_invalid_rows_are_rejected_with_a_reason(overrides, reason):
+    valid, rejected = validate_chunk(_chunk(**overrides), CSV_COLUMNS)
+    assert valid.empty
+    assert rejected.iloc[0][REJECT_REASON_COLUMN].startswith(reason)
+
+
+def test_only_the_first_failing_rule_is_reported():
+    valid, rejected = validate_chunk(_chunk(email="", mobile_number="1"), CSV_COLUMNS)
+    assert rejected.iloc[0][REJECT_REASON_COLUMN] == "email is required"
+
+
+def test_missing_column_fails_the_chunk():
+    with pytest.raises(ValueError):
+        validate_chunk(_chunk().drop(columns=["city"]), CSV_COLUMNS)
+
+
+CSV_HEADER = b"first_name,last_name,email,mobile_number,city,state,country,industry,year_founded\n"
+
+
+def _upload(client, rows: bytes) -> dict:
+    return client.post("/upload_csv/upload-csv/", files={"file": ("rejects.csv", CSV_HEADER + rows, "text/csv")}).json()
+
+
+def _rejects(job) -> list:
+    return pd.read_csv(job.reject_file_path)["email"].tolist()
+
+
+def test_rejects_are_written_once_when_a_chunk_is_retried(client, db, monkeypatch):
+    upload = _upload(client, (
+        b"Jai,Toor,retry-ok@example.com,9424339341,Kochi,Kerala,India,Printmaker,2001\n"
+        b"Jai,Toor,retry-bad@example.com,123,Kochi,Kerala,India,Printmaker,2001\n"
+    ))
+    flush = BulkInserter.flush
+    calls = []
+
+    def deadlock_once(inserter):
+        calls.append(1)
+        if len(calls) == 1:
+            raise OperationalError("COMMIT", {}, Exception(1213, "Deadlock found"))
+        flush(inserter)
+
+    monkeypatch.setattr(BulkInserter, "flush", deadlock_once)
+    monkeypatch.setattr(ingest_pipeline.time, "sleep", lambda seconds: None)
+    ingest_stored_file(upload["job_id"])
+
+    job = db.get(IngestionJob, upload["job_id"])
+    assert len(calls) == 2
+    assert (job.rows_inserted, job.rows_rejected) == (1, 1)
+    assert _rejects(job) == ["retry-bad@example.com"]
+
+
+def test_rejects_of_a_failed_chunk_are_not_written(client, db, add_profiles):
+    add_profiles([{"email": "taken@example.com"}])
+    upload = _upload(client, (
+        b"Jai,Toor,taken@example.com,9424339341,Kochi,Kerala,India,Printmaker,2001\n"
+        b"Jai,Toor,failed-bad@example.com,123,Kochi,Kerala,India,Printmaker,2001\n"
+    ))
+    with pytest.raises(RuntimeError):
+        ingest_stored_file(upload["job_id"])
+
+    job = db.get(IngestionJob, upload["job_id"])
+    assert job.rows_rejected == 0
+    assert not os.path.exists(rejects_path_for(job.file_path, settings.PROJECT_FILE_DIR))
@@ -1,54 +1,281 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from db_module.connection import get_db
+from db_module.connection import get_async_db
 from models import CompanyProfile
 from utils.services import app_logger  # Assuming app_logger is correctly configured
 from utils.basic_auth import get_current_user
-from utils.config import Settings
+from utils.config import get_settings
+import asyncio
 import os
-from utils.helper import process_csv_in_background
+import traceback
+import uuid
+from sqlalchemy.exc import IntegrityError
+from db_module.ingestion_job import (
+    count_pending_jobs,
+    create_ingestion_job,
+    get_ingestion_job,
+    job_to_dict,
+    mark_job_finished,
+    resume_checkpoint,
+    worker_name,
+    JOB_FAILED,
+)
+from db_module.uploaded_file import get_uploaded_file, move_uploaded_file, record_uploaded_file, UploadConflict
+from db_module.bulk_insert import INGEST_INSERT, INGEST_MODES, INGEST_UPSERT
+from utils.file_formats import detect_file_format, FORMAT_PARQUET, FORMAT_SUFFIXES, UPLOAD_FORMATS
+from utils.streaming import MultipartFileReader, QueueReader, check_content_length, stream_upload_to_disk
 from fastapi.responses import JSONResponse
-import aiofiles
 
-settings = Settings()
+settings = get_settings()
 
 csv_router = APIRouter(
     prefix="/upload_csv", tags=["Upload CSV"], responses={422: {"description": "Not Found"}}
 )
 
 
-@csv_router.post("/upload-csv/")
+def _log_stream_ingest_result(future):
+    if future.exception() is not None:
+        app_logger.error(f"Streaming ingest failed | {future.exception()}")
+
+
+def _duplicate_upload_response(job, sha256: str, size: int, user_id: int) -> JSONResponse:
+    """The earlier job is only described to the user who started it"""
+    if job.auth_profile_id != user_id:
+        return JSONResponse(content={
+            "message": "File was already uploaded and ingested, it is not processed again.",
+            "duplicate": True,
+            "size": size,
+            "sha256": sha256,
+        })
+    return JSONResponse(content={
+        "message": "File was already uploaded, returning the existing ingestion result.",
+        "duplicate": True,
+        "job_id": job.job_id,
+        "job": job_to_dict(job),
+        "size": size,
+        "sha256": sha256,
+    })
+
+
+def _previous_upload(db: Session, sha256: str) -> tuple:
+    """(uploaded_file row, its job) of an earlier upload with the same content, None when missing"""
+    uploaded_file = get_uploaded_file(db, sha256)
+    if uploaded_file is None or uploaded_file.job_id is None:
+        return uploaded_file, None
+    return uploaded_file, get_ingestion_job(db, uploaded_file.job_id)
+
+
+def _register_upload(db: Session, job, auth_profile_id: int, file_name: str, file_path: str, mode: str,
+                     sha256: str, size: int, uploaded_file=None, previous_job=None):
+    """Create the job (or point the overlapped one at the stored file) and register the
+    content hash in one transaction, so a worker can only ever claim the job of the
+    upload that won the hash.
+
+    Content registered before moves from its previous job to the new one. When
+    that job failed on the same stored file, the new one resumes from its
+    checkpoint instead of inserting the rows it committed again.
+    """
+    if job is None:
+        job = create_ingestion_job(db, auth_profile_id, file_name, file_path, mode=mode, commit=False)
+        if previous_job is not None and previous_job.status == JOB_FAILED and previous_job.file_path == file_path:
+            resume_checkpoint(db, job, previous_job)
+    else:
+        job.file_path = file_path
+    if uploaded_file is None:
+        record_uploaded_file(db, sha256, file_path, size, job.job_id, commit=False)
+    else:
+        move_uploaded_file(db, sha256, file_path, size, job.job_id, uploaded_file.job_id)
+    db.commit()
+    return job
+
+
+async def _check_ingest_capacity(db: AsyncSession, user_id: int):
+    """Refuse the upload before reading it when the ingest queue is full"""
+    if await db.run_sync(count_pending_jobs) >= settings.INGEST_QUEUE_MAX_JOBS:
+        app_logger.warning("Upload refused | ingestion queue is full")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The ingestion queue is full, please retry later.",
+            headers={"Retry-After": "60"},
+        )
+    if await db.run_sync(count_pending_jobs, user_id) >= settings.INGEST_USER_MAX_JOBS:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"At most {settings.INGEST_USER_MAX_JOBS} of your uploads can be queued or running at once.",
+            headers={"Retry-After": "60"},
+        )
+
+
+# The body is parsed by the handler (see MultipartFileReader), so describe it for the docs
+_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+@csv_router.post("/upload-csv/", openapi_extra=_UPLOAD_BODY)
 async def upload_csv(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    request: Request,
+    overlap_ingest: bool = Query(False, description="Start parsing while the upload is still arriving"),
+    mode: str = Query(INGEST_INSERT, description="insert, skip-duplicates or upsert on an existing email"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
+    """Upload a company profile file and queue it for the ingest workers\n
+
+    Files are stored under their SHA-256, so uploading content that was
+    already ingested (or is being ingested) answers `duplicate` instead of
+    processing it again, with the earlier job when the same user started
+    it. An upsert upload is always processed, since the stored rows may
+    have changed since. Content whose job failed is queued again, from
+    the checkpoint the failed job reached (an overlapped upload starts
+    over, its parsing began before the content was known). The limits are checked before any of the body is
+    read: 413 when Content-Length is over UPLOAD_MAX_BYTES, 503 when the
+    ingestion queue is full and 429 when the user already has
+    INGEST_USER_MAX_JOBS jobs pending. The body is then read off the
+    request stream, so with `overlap_ingest` parsing starts on the first
+    chunk.\n
+
+    Returns:\n
+        job_id, size, sha256 and `duplicate`, with the existing job when it is the user's own\n
+    """
     try:
-        app_logger.info(f"User {current_user['username']} is uploading file: {file.filename}")
-        
-        # Check if the file is a CSV
-        if not file.filename.endswith('.csv'):
-            app_logger.warning(f"File {file.filename} is not a CSV. Upload aborted.")
-            raise HTTPException(status_code=400, detail="Only CSV files are allowed")
-        
-        # Define the file path
-        file_path = os.path.join(settings.PROJECT_FILE_DIR, file.filename)
-        app_logger.info(f"Saving file to {file_path}")
-        
-        # Save the file asynchronously
-        async with aiofiles.open(file_path, "wb") as out_file:
-            content = await file.read() 
-            await out_file.write(content)
-        
-        app_logger.info(f"File {file.filename} saved successfully.")
-        
-        # Add background task to process the CSV file
-        background_tasks.add_task(process_csv_in_background, file_path)
-        app_logger.info(f"Background task added to process the CSV file: {file.filename}")
-
-        return JSONResponse(content={"message": "File uploaded successfully, processing in background."})
-    
+        if mode not in INGEST_MODES:
+            raise HTTPException(status_code=400, detail=f"mode should be one of {', '.join(INGEST_MODES)}")
+
+        # Nothing of the body has been read yet
+        check_content_length(request, settings.UPLOAD_MAX_BYTES)
+        await _check_ingest_capacity(db, current_user["user_id"])
+
+        file = MultipartFileReader(request, field_name="file")
+        file_name = await file.open()
+        app_logger.info(f"User {current_user['email']} is uploading file: {file_name}")
+        # Check if the file is a CSV (optionally compressed) or Parquet file
+        file_format = detect_file_format(file_name)
+        if file_format is None:
+            app_logger.warning(f"File {file_name} is not a supported format. Upload aborted.")
+            raise HTTPException(status_code=400, detail=f"Only {', '.join(UPLOAD_FORMATS)} files are allowed")
+
+        # Stream into a temporary name first, the final name is the content hash
+        suffix = FORMAT_SUFFIXES[file_format]
+        incoming_path = os.path.join(settings.PROJECT_FILE_DIR, f"incoming-{uuid.uuid4().hex}{suffix}")
+        app_logger.info(f"Saving file to {incoming_path}")
+
+        job = None
+        reader = None
+        if overlap_ingest and not settings.INGEST_ALLOW_OVERLAP:
+            app_logger.info(f"Overlapped ingest is disabled, queueing after upload: {file_name}")
+        elif overlap_ingest and file_format == FORMAT_PARQUET:
+            # The Parquet footer arrives last, nothing can be read before the upload completes
+            app_logger.info(f"Overlapped ingest is not possible for Parquet, ingesting after upload: {file_name}")
+        elif overlap_ingest:
+            # Parse in a worker thread, fed through a bounded queue; pandas is only loaded now
+            from utils.helper import ingest_csv_stream
+
+            # Claimed by this process, so the ingest workers leave it alone
+            job = await db.run_sync(
+                create_ingestion_job, current_user["user_id"], file_name, incoming_path,
+                mode=mode, worker_id=f"api-{worker_name()}",
+            )
+            loop = asyncio.get_running_loop()
+            reader = QueueReader(max_chunks=settings.UPLOAD_STREAM_QUEUE_CHUNKS)
+            ingest_future = loop.run_in_executor(None, ingest_csv_stream, reader, job.job_id)
+            ingest_future.add_done_callback(_log_stream_ingest_result)
+
+            async def feed_parser(chunk):
+                await loop.run_in_executor(None, reader.feed, chunk)
+
+        # Stream the file to disk in fixed-size chunks
+        try:
+            size, sha256 = await stream_upload_to_disk(
+                file,
+                incoming_path,
+                chunk_size=settings.UPLOAD_CHUNK_SIZE,
+                max_bytes=settings.UPLOAD_MAX_BYTES,
+                on_chunk=feed_parser if reader is not None else None,
+            )
+        except BaseException as e:
+            if reader is not None:
+                reader.finish(error=RuntimeError(f"Upload aborted: {e}"))
+            raise
+
+        app_logger.info(f"File {file_name} saved successfully | {size} bytes | sha256 {sha256}")
+
+        uploaded_file, previous_job = await db.run_sync(_previous_upload, sha256)
+        if previous_job is not None and previous_job.status != JOB_FAILED and mode != INGEST_UPSERT:
+            os.remove(incoming_path)
+            if reader is not None:
+                # Stop the overlapped ingest; chunks it already committed stay
+                reader.finish(error=RuntimeError(f"Duplicate upload of job {previous_job.job_id}"))
+            app_logger.info(f"Duplicate upload of {file_name} | sha256 {sha256} | job {previous_job.job_id}")
+            return _duplicate_upload_response(previous_job, sha256, size, current_user["user_id"])
+
+        file_path = os.path.join(settings.PROJECT_FILE_DIR, f"{sha256}{suffix}")
+        os.replace(incoming_path, file_path)
+        try:
+            job = await db.run_sync(
+                _register_upload, job, current_user["user_id"], file_name, file_path, mode, sha256, size,
+                uploaded_file, previous_job,
+            )
+        except (IntegrityError, UploadConflict):
+            # The same content was registered by a concurrent upload; no job of ours was queued
+            await db.rollback()
+            if reader is not None:
+                reader.finish(error=RuntimeError("Duplicate upload"))
+                await db.run_sync(mark_job_finished, job, error="Duplicate upload")
+            uploaded_file, previous_job = await db.run_sync(_previous_upload, sha256)
+            if previous_job is None or previous_job.status == JOB_FAILED or mode == INGEST_UPSERT:
+                raise HTTPException(status_code=409, detail="The same file is being uploaded by another request.")
+            return _duplicate_upload_response(previous_job, sha256, size, current_user["user_id"])
+
+        if reader is not None:
+            reader.finish()
+            app_logger.info(f"Streaming ingest started while uploading: {file_name}")
+        else:
+            # The job row is the queue entry, an ingest worker claims it
+            app_logger.info(f"Ingestion job {job.job_id} queued for {file_name}")
+
+        return JSONResponse(content={
+            "message": "File uploaded successfully, queued for processing.",
+            "duplicate": False,
+            "job_id": job.job_id,
+            "resumed_from_row": job.checkpoint_row,
+            "size": size,
+            "sha256": sha256,
+        })
+
+    except HTTPException:
+        raise
+
     except Exception as e:
         error_message = f"Error occurred during file upload: {str(e)}"
         app_logger.error(f"{error_message}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="An error occurred while uploading the file.")
+
+
+@csv_router.get("/jobs/{job_id}/")
+async def get_upload_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Progress of an ingestion job started by `upload-csv`\n
+
+    Returns:\n
+        status, rows parsed/inserted/rejected, rows/sec and the last checkpoint\n
+    """
+    job = await db.run_sync(get_ingestion_job, job_id)
+    if job is None or job.auth_profile_id != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job_to_dict(job)
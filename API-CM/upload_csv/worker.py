@@ -0,0 +1,128 @@
+import argparse
+import os
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from db_module.connection import SessionLocal
+from db_module.ingestion_job import (
+    claim_next_job,
+    heartbeat_jobs,
+    mark_job_finished,
+    requeue_stale_jobs,
+    worker_name,
+)
+from utils.config import get_settings
+from utils.helper import ingest_stored_file
+from utils.services import app_logger
+
+settings = get_settings()
+
+
+class IngestWorker:
+    """Runs queued ingestion jobs outside the API workers.
+
+    Every poll the worker requeues jobs whose worker stopped heartbeating,
+    heartbeats its own jobs and claims queued jobs until `max_concurrent`
+    are running. Each job runs in a thread of its own with its own session,
+    and parses on the shared process pool as before. Several workers (on
+    one host or many) can share the queue; claims are conditional UPDATEs.
+    """
+
+    def __init__(self, max_concurrent: int = None, poll_seconds: float = None,
+                 heartbeat_seconds: float = None, stale_seconds: float = None, worker_id: str = None):
+        self.max_concurrent = max(1, max_concurrent or settings.INGEST_MAX_CONCURRENT)
+        self.poll_seconds = poll_seconds or settings.INGEST_POLL_SECONDS
+        self.heartbeat_seconds = heartbeat_seconds or settings.INGEST_HEARTBEAT_SECONDS
+        self.stale_seconds = stale_seconds or settings.INGEST_STALE_SECONDS
+        self.worker_id = worker_id or worker_name()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="ingest-job")
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._last_heartbeat = 0.0
+
+    def running_jobs(self) -> list:
+        with self._lock:
+            return sorted(self._running)
+
+    def _run_job(self, job_id: int):
+        try:
+            ingest_stored_file(job_id)
+        except RuntimeError:
+            pass  # the failure is already logged and recorded on the job
+        except Exception as e:
+            app_logger.error(f"Ingest worker | job {job_id} | {e}\n{traceback.format_exc()}")
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+            self._wake.set()
+
+    def _claim(self, db) -> bool:
+        job = claim_next_job(db, self.worker_id)
+        if job is None:
+            return False
+        if not os.path.exists(job.file_path):
+            mark_job_finished(db, job, error="Uploaded file is missing, cannot resume")
+            return True
+        app_logger.info(f"Ingest worker {self.worker_id} | claimed job {job.job_id} from row {job.checkpoint_row}")
+        with self._lock:
+            self._running.add(job.job_id)
+        self._executor.submit(self._run_job, job.job_id)
+        return True
+
+    def run_once(self, db):
+        """One scheduling pass"""
+        requeued = requeue_stale_jobs(db, self.stale_seconds)
+        if requeued:
+            app_logger.warning(f"Ingest worker {self.worker_id} | requeued {requeued} stale jobs")
+        if time.monotonic() - self._last_heartbeat >= self.heartbeat_seconds:
+            heartbeat_jobs(db, self.worker_id, self.running_jobs())
+            self._last_heartbeat = time.monotonic()
+        while not self._stopping.is_set() and len(self.running_jobs()) < self.max_concurrent:
+            if not self._claim(db):
+                break
+
+    def run(self):
+        app_logger.info(f"Ingest worker {self.worker_id} started | {self.max_concurrent} concurrent jobs")
+        db = SessionLocal()
+        try:
+            # After stop() keep heartbeating until the running jobs finish,
+            # so no other worker takes them over mid-way
+            while not self._stopping.is_set() or self.running_jobs():
+                try:
+                    self.run_once(db)
+                except Exception as e:
+                    db.rollback()
+                    app_logger.error(f"Ingest worker {self.worker_id} | {e}\n{traceback.format_exc()}")
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+        finally:
+            self._executor.shutdown(wait=True)
+            db.close()
+            app_logger.info(f"Ingest worker {self.worker_id} stopped")
+
+    def stop(self):
+        """Stop claiming; run() returns once the running jobs are done"""
+        self._stopping.set()
+        self._wake.set()
+
+
+def start_embedded_worker() -> IngestWorker:
+    """Run the scheduler in a thread of this process (single-process deployments)"""
+    worker = IngestWorker()
+    threading.Thread(target=worker.run, name="ingest-scheduler", daemon=True).start()
+    return worker
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued CSV/Parquet ingestion jobs")
+    parser.add_argument("--concurrency", type=int, default=None, help="jobs run at once (INGEST_MAX_CONCURRENT)")
+    args = parser.parse_args()
+
+    ingest_worker = IngestWorker(max_concurrent=args.concurrency)
+    signal.signal(signal.SIGTERM, lambda signum, frame: ingest_worker.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: ingest_worker.stop())
+    ingest_worker.run()
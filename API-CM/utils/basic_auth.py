@@ -1,25 +1,28 @@
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBasic, HTTPBasicCredentials, HTTPAuthorizationCredentials, HTTPBearer
-from passlib.context import CryptContext
-from jose import jwt
-from db_module.connection import get_db
+from jose import jwt, JWTError
+from db_module.connection import get_async_db
 from jwt.exceptions import PyJWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from utils.config import get_settings
 from datetime import datetime, date
 from typing import Optional
 from models import AuthProfile
-from db_module.connection import get_db
+from utils.cache import TTLCache
+from utils.metrics import register_cache
  
  
 settings = get_settings()
 security = HTTPBasic()
-pwd_context = CryptContext(schemes=["django_pbkdf2_sha256"], deprecated="auto")
+
+# Resolved users keyed by email, so authenticated requests skip the auth_profile lookup
+principal_cache = TTLCache(
+    max_size=settings.AUTH_PRINCIPAL_CACHE_SIZE, ttl_seconds=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS
+)
+register_cache("auth_principal", principal_cache)
  
  
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
- 
 async def decodeJWT(token: str) -> Optional[dict]:
     try:
         decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -27,8 +30,13 @@ async def decodeJWT(token: str) -> Optional[dict]:
         return {
             "email": decoded_token.get("sub")
         }
-    except PyJWTError:
+    except (JWTError, PyJWTError):
         return None
+
+
+def invalidate_principal(email: str):
+    """Drop a cached user; call after changing or deactivating an auth_profile row"""
+    principal_cache.invalidate(email)
  
  
 class JWTBearer(HTTPBearer):
@@ -40,42 +48,55 @@ class JWTBearer(HTTPBearer):
         if credentials:
             if not credentials.scheme == "Bearer":
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid authentication scheme.")
-            resp = await self.verify_jwt(credentials.credentials)
-            if not resp:
+            payload = await decodeJWT(credentials.credentials)
+            if not payload:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token or expired token.")
+            # Decoded once per request; get_current_user reads it from here
+            request.state.jwt_payload = payload
             return credentials.credentials
         else:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authorization code.")
- 
-    async def verify_jwt(self, jwtoken: str) -> bool:
-        isTokenValid: bool = False
- 
-        try:
-            payload = await decodeJWT(jwtoken)
-        except:
-            payload = None
-        if payload:
-            isTokenValid = True
-        return isTokenValid
    
  
 jwt_bearer = JWTBearer()
  
 # Dependency to get the current user from the token
-async def get_current_user(token: str = Depends(jwt_bearer), db: Session = Depends(get_db)) -> dict:
-    decoded_token = await decodeJWT(token)
+async def get_current_user(request: Request, token: str = Depends(jwt_bearer),
+                           db: AsyncSession = Depends(get_async_db)) -> dict:
+    decoded_token = getattr(request.state, "jwt_payload", None)
+    if decoded_token is None:
+        decoded_token = await decodeJWT(token)
     if decoded_token is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired token.")
     email = decoded_token.get("email")
-    user = db.query(AuthProfile).filter(AuthProfile.email == email).first()
+
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return dict(principal)
+
+    result = await db.execute(select(AuthProfile).where(AuthProfile.email == email))
+    user = result.scalars().first()
  
     if user is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User not found.")
    
-    return {
+    principal = {
         "user_id": user.auth_profile_id,
         "email": user.email,
         "first_name": user.first_name,
         "last_name": user.last_name,
         "is_active": user.is_active
-    }
\ No newline at end of file
+    }
+    principal_cache.set(email, principal)
+    return dict(principal)
+
+
+def admin_emails() -> set:
+    return {email.strip().lower() for email in settings.ADMIN_EMAILS.split(",") if email.strip()}
+
+
+# Dependency for the /admin endpoints: the user must be listed in ADMIN_EMAILS
+async def get_admin_user(current_user: dict = Depends(get_current_user)) -> dict:
+    if (current_user.get("email") or "").lower() not in admin_emails():
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administrator access required.")
+    return current_user
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 import os
 #  This file is used for read .env file
 
@@ -10,6 +11,16 @@ class Settings(BaseSettings):
     DB_USERNAME: str
     DB_PASSWORD: str
     DB_PORT: int
+    DB_URL: Optional[str] = None  # overrides the mysql:// URL built from the DB_* settings
+    ASYNC_DB_URL: Optional[str] = None  # overrides the mysql+aiomysql:// URL of the async engine
+    DB_REPLICA_HOSTS: str = ""  # comma-separated host[:port] read replicas, same credentials as the primary
+    DB_REPLICA_URLS: str = ""  # comma-separated sync replica URLs, override DB_REPLICA_HOSTS
+    ASYNC_DB_REPLICA_URLS: str = ""  # comma-separated async replica URLs, override DB_REPLICA_HOSTS
+    DB_POOL_SIZE: int = 10  # connections kept open per engine
+    DB_MAX_OVERFLOW: int = 20  # extra connections opened under load
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced, below MySQL wait_timeout
+    DB_POOL_PRE_PING: bool = True  # test connections on checkout, survives server restarts and failovers
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
@@ -21,6 +32,58 @@ class Settings(BaseSettings):
     FILE_LOG_DIR: str
     PROJECT_FILE_DIR: str = os.path.join(os.getcwd(), "static/files")
 
+    # Authentication
+    AUTH_PRINCIPAL_CACHE_SIZE: int = 10000  # users kept resolved in memory
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: int = 60  # bound on staleness for changes made outside this process
+    ADMIN_EMAILS: str = ""  # comma-separated users allowed on the /admin endpoints, empty = nobody
+    PASSWORD_HASH_WORKERS: int = 2  # threads hashing/verifying passwords off the event loop
+    PASSWORD_HASH_MAX_QUEUE: int = 64  # waiting hash requests before answering 503
+
+    # CSV ingestion
+    INGEST_CHUNK_BYTES: int = 16 * 1024 * 1024  # bytes per parsed chunk, transaction and checkpoint
+    INGEST_BATCH_SIZE: int = 5000  # rows per multi-row INSERT
+    INGEST_PARSE_WORKERS: Optional[int] = None  # parser processes, None = one per core, <= 1 parses inline
+    INGEST_WRITER_WORKERS: int = 2  # DB writer threads, each with its own session
+    INGEST_QUEUE_SIZE: int = 8  # parsed chunks waiting for a writer
+    INGEST_DEADLOCK_RETRIES: int = 3  # times a chunk transaction is retried after an InnoDB deadlock
+    INGEST_USE_LOAD_DATA: bool = False  # MySQL LOAD DATA LOCAL INFILE fast path, no row validation or rejects file
+    INGEST_MAX_CONCURRENT: int = 2  # jobs one ingest worker process (python -m upload_csv.worker) runs at once
+    INGEST_QUEUE_MAX_JOBS: int = 100  # queued + running jobs before uploads are refused with 503
+    INGEST_USER_MAX_JOBS: int = 5  # queued + running jobs per user before uploads are refused with 429
+    INGEST_POLL_SECONDS: float = 2.0  # how often a worker looks for queued jobs
+    INGEST_HEARTBEAT_SECONDS: int = 30
+    INGEST_STALE_SECONDS: int = 600  # running jobs without a heartbeat for this long are requeued
+    INGEST_ALLOW_OVERLAP: bool = False  # let overlap_ingest parse inside the API process while uploading
+    INGEST_EMBEDDED_WORKER: bool = False  # run the ingest scheduler inside the API process (single-process setups)
+
+    # Uploads
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes read from the request per step
+    UPLOAD_MAX_BYTES: int = 5 * 1024 * 1024 * 1024
+    UPLOAD_STREAM_QUEUE_CHUNKS: int = 16  # chunks buffered ahead of the parser
+
+    # Query builder
+    QUERY_CACHE_SIZE: int = 1024  # filter sets kept in the result cache
+    QUERY_CACHE_TTL_SECONDS: int = 30
+    QUERY_USE_ROLLUP: bool = True  # answer exact-match counts from company_profile_rollup once it is backfilled
+    QUERY_PAGE_MAX_ROWS: int = 1000  # largest page of the rows endpoint
+    QUERY_EXPORT_YIELD_PER: int = 2000  # rows fetched per round trip while exporting
+    QUERY_BATCH_MAX_SETS: int = 500  # filter sets accepted by one batch request
+    QUERY_ENGINE: str = "sql"  # "columnar" answers counts from an in-memory NumPy snapshot
+    QUERY_COMMIT_LOG_SIZE: int = 100000  # commits kept in company_profile_commit for columnar refreshes
+    QUERY_RECORDER_ENABLED: bool = True  # record filter patterns and latency in query_pattern_stat
+    QUERY_RECORDER_FLUSH_SECONDS: int = 30
+    INDEX_ADVISOR_MAX_INDEXES: int = 5  # composite indexes proposed per run
+    QUERY_SAMPLE_SIZE: int = 10000  # rows kept in company_profile_sample for approximate counts, 0 disables
+    TRIGRAM_INDEX_ENABLED: bool = True  # maintain and use company_profile_trigram for substring filters, once backfilled
+    TRIGRAM_MAX_POSTINGS: int = 50000  # trigrams with more postings are left to the LIKE scan
+
+    # Observability
+    METRICS_ENABLED: bool = True  # time requests, queries and ingestion and serve them on /metrics
+    LOG_LEVEL: str = "TRACE"  # default minimum level of app_logger records
+    LOG_LEVELS: str = ""  # per-module minimum levels, e.g. "query_builder=WARNING,utils.ingest_pipeline=DEBUG"
+    LOG_SAMPLE_RATES: str = ""  # share of INFO records kept per function, e.g. "query_company_profiles=0.05"
+    LOG_QUEUE_SIZE: int = 10000  # records buffered for the log writer thread before dropping
+
     
 
     class Config:
@@ -0,0 +1,147 @@
+import bz2
+import gzip
+import io
+import os
+import pandas as pd
+from db_module.bulk_insert import CSV_COLUMNS, chunk_to_columns, dedupe_chunk
+from utils.file_formats import (
+    detect_file_format,
+    FORMAT_CSV,
+    FORMAT_CSV_BZ2,
+    FORMAT_CSV_GZIP,
+    FORMAT_PARQUET,
+    FORMAT_SUFFIXES,
+    UPLOAD_FORMATS,
+)
+from utils.validation import validate_chunk
+
+
+def open_csv_source(source, file_format: str):
+    """Binary stream of CSV text for a path or raw upload stream.
+
+    Offsets used by checkpoints are positions in the decompressed text;
+    gzip and bz2 streams seek forward by decompressing.
+    """
+    if file_format == FORMAT_CSV_GZIP:
+        return gzip.open(source, "rb")
+    if file_format == FORMAT_CSV_BZ2:
+        return bz2.open(source, "rb")
+    return open(source, "rb") if isinstance(source, str) else source
+
+
+def open_csv_stream(stream, start_offset: int = 0):
+    """Read the header line and position the stream for `iter_csv_blocks`.
+
+    Args:
+        stream: binary file object positioned at the start of the file
+        start_offset: byte offset of a previous checkpoint (0 for a fresh run);
+            only seekable streams can resume past the header
+
+    Returns:
+        (header bytes, absolute byte offset the stream is positioned at)
+    """
+    header = stream.readline()
+    offset = len(header)
+    if start_offset > offset:
+        stream.seek(start_offset)
+        offset = start_offset
+    return header, offset
+
+
+def iter_csv_blocks(stream, offset: int, block_bytes: int):
+    """Split a CSV stream into byte ranges that end on a line boundary.
+
+    Fields with embedded newlines are not supported, which holds for the
+    vendor files we ingest.
+
+    Yields:
+        (block bytes, absolute byte offset just past the block)
+    """
+    leftover = b""
+    while True:
+        data = stream.read(block_bytes)
+        if not data:
+            break
+        data = leftover + data
+        cut = data.rfind(b"\n") + 1
+        if cut == 0:
+            leftover = data
+            continue
+        block, leftover = data[:cut], data[cut:]
+        offset += len(block)
+        yield block, offset
+    if leftover.strip():
+        offset += len(leftover)
+        yield leftover, offset
+
+
+def parse_csv_block(header: bytes, block: bytes):
+    # Everything is read as text (mobile numbers keep leading zeros); validation coerces types
+    return pd.read_csv(io.BytesIO(header + block), dtype=str, keep_default_na=False, na_values=[""])
+
+
+def prepare_frame(chunk, mode: str):
+    """Validate and deduplicate a chunk into insert-ready column lists.
+
+    Returns:
+        (columns, rows parsed, duplicate rows dropped within the chunk,
+        rejected rows DataFrame)
+    """
+    rows = len(chunk)
+    chunk, rejected = validate_chunk(chunk, CSV_COLUMNS)
+    chunk, dropped = dedupe_chunk(chunk, mode)
+    return chunk_to_columns(chunk), rows, dropped, rejected
+
+
+def prepare_chunk(header: bytes, block: bytes, mode: str):
+    """Parse one CSV byte range and prepare it for the writers.
+
+    Runs in the ingest parser processes, so it only depends on pandas and
+    the column definitions, not on the DB connection.
+    """
+    return prepare_frame(parse_csv_block(header, block), mode)
+
+
+def iter_csv_tasks(stream, start_offset: int, block_bytes: int, mode: str, committed: list = ()):
+    """Parse tasks for the ingest pipeline, one per line-aligned byte range.
+
+    Args:
+        committed: sorted (start offset, end offset, rows) of chunks a previous
+            run committed past the checkpoint; their bytes are not parsed again
+            and blocks are cut at their edges
+
+    Yields:
+        (function, args, start offset, end offset); function is None for an
+        already committed range, with args (rows,)
+    """
+    header, offset = open_csv_stream(stream, start_offset)
+    committed = list(committed)
+    for block, end_offset in iter_csv_blocks(stream, offset, block_bytes):
+        block_start = end_offset - len(block)
+        position = block_start
+        while committed and committed[0][0] < end_offset:
+            chunk_start, chunk_end, rows = committed[0]
+            if chunk_start > position:
+                yield prepare_chunk, (header, block[position - block_start:chunk_start - block_start], mode), position, chunk_start
+            if position <= chunk_start:
+                yield None, (rows,), chunk_start, chunk_end
+            if chunk_end > end_offset:
+                # Continues into the next block
+                position = end_offset
+                break
+            position = chunk_end
+            committed.pop(0)
+        if position < end_offset:
+            yield prepare_chunk, (header, block[position - block_start:], mode), position, end_offset
+
+
+def rejects_path_for(file_path: str, file_dir: str) -> str:
+    """Sidecar CSV collecting the rows that failed validation"""
+    return os.path.join(file_dir, f"{os.path.basename(file_path)}.rejects.csv")
+
+
+def append_rejects(rejects_path: str, rejected):
+    if rejected.empty:
+        return
+    write_header = not os.path.exists(rejects_path)
+    rejected.to_csv(rejects_path, mode="a", header=write_header, index=False)
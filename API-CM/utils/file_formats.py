@@ -0,0 +1,23 @@
+# Upload formats, free of pandas so the API process can import them cheaply
+FORMAT_CSV = "csv"
+FORMAT_CSV_GZIP = "csv.gz"
+FORMAT_CSV_BZ2 = "csv.bz2"
+FORMAT_PARQUET = "parquet"
+
+# Accepted upload suffixes; compressed CSVs are decompressed as a stream while parsing
+UPLOAD_FORMATS = {
+    ".csv": FORMAT_CSV,
+    ".csv.gz": FORMAT_CSV_GZIP,
+    ".csv.bz2": FORMAT_CSV_BZ2,
+    ".parquet": FORMAT_PARQUET,
+}
+FORMAT_SUFFIXES = {file_format: suffix for suffix, file_format in UPLOAD_FORMATS.items()}
+
+
+def detect_file_format(file_name: str):
+    """Upload format from the file name, None when it is not supported"""
+    file_name = file_name.lower()
+    for suffix, file_format in UPLOAD_FORMATS.items():
+        if file_name.endswith(suffix):
+            return file_format
+    return None
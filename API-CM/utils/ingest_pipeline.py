@@ -0,0 +1,286 @@
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.exc import OperationalError
+from db_module.bulk_insert import BulkInserter
+from db_module.connection import SessionLocal
+from db_module.ingestion_job import advance_job_checkpoint, record_committed_chunk, record_job_progress
+from utils.config import get_settings
+from utils.csv_reader import append_rejects
+from utils.metrics import ingest_commit_seconds, ingest_rows
+from utils.services import app_logger
+
+settings = get_settings()
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def parse_workers() -> int:
+    if settings.INGEST_PARSE_WORKERS is None:
+        return os.cpu_count() or 1
+    return settings.INGEST_PARSE_WORKERS
+
+
+def get_parse_pool():
+    """Process pool shared by all ingestion jobs of this worker, created on first use"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn: the API process runs threads, forking it is not safe
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=parse_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _parse_pool
+
+
+def is_lock_conflict(error: OperationalError) -> bool:
+    """InnoDB deadlock (1213) or lock wait timeout (1205); the transaction can simply be retried"""
+    args = getattr(error.orig, "args", ())
+    return bool(args) and args[0] in (1205, 1213)
+
+
+class _InlineFuture:
+    def __init__(self, fn, *args):
+        self._result = fn(*args)
+
+    def result(self):
+        return self._result
+
+
+class CheckpointTracker:
+    """Tracks which chunks are committed and the contiguous prefix behind them.
+
+    Writers commit chunks out of order; only the prefix of chunks that are all
+    committed is a safe place to resume from.
+    """
+
+    def __init__(self, offset: int, row: int):
+        self._lock = threading.Lock()
+        self._chunks = {}
+        self._committed = set()
+        self._next_seq = 0
+        self.offset = offset
+        self.row = row
+
+    def register(self, seq: int, end_offset: int, rows: int):
+        with self._lock:
+            self._chunks[seq] = (end_offset, rows)
+
+    def checkpoint_if_next(self, seq: int):
+        """Checkpoint to commit along with chunk `seq` when everything before it is committed"""
+        with self._lock:
+            if seq != self._next_seq:
+                return None
+            end_offset, rows = self._chunks[seq]
+            return end_offset, self.row + rows
+
+    def complete(self, seq: int):
+        """Mark chunk `seq` committed and return the new prefix checkpoint"""
+        with self._lock:
+            self._committed.add(seq)
+            while self._next_seq in self._committed:
+                self._committed.discard(self._next_seq)
+                end_offset, rows = self._chunks.pop(self._next_seq)
+                self.offset = end_offset
+                self.row += rows
+                self._next_seq += 1
+            return self.offset, self.row
+
+
+class IngestPipeline:
+    """Reader -> parser processes -> bounded queue -> DB writer threads.
+
+    The reader turns the file into parse tasks (line-aligned CSV byte ranges
+    or Parquet row groups) and keeps at most two tasks per parser process in
+    flight. Parsed chunks go through a
+    bounded queue, so slow writers stall the reader instead of piling chunks
+    up in memory. Each writer commits one chunk per transaction, together with
+    the job progress and, when it closes the committed prefix, the checkpoint.
+
+    With more than one writer a chunk can commit before the ones ahead of
+    it; its range is then recorded in ingestion_job_chunk in the same
+    transaction. After a crash the task iterators skip those ranges, so a
+    resumed job never writes a row twice, whatever the ingest mode.
+
+    Rows failing validation go to the rejects file once their chunk has
+    committed, so a retried or resumed chunk does not list them twice.
+    """
+
+    def __init__(self, job_id: int, start_offset: int, start_row: int, mode: str, rejects_path: str):
+        self.job_id = job_id
+        self.mode = mode
+        self.rejects_path = rejects_path
+        self.start_offset = start_offset
+        self.tracker = CheckpointTracker(start_offset, start_row)
+        self.work = queue.Queue(maxsize=max(1, settings.INGEST_QUEUE_SIZE))
+        self.rows_inserted = 0
+        self.rows_merged = 0
+        self.rows_rejected = 0
+        self.rows_invalid = 0
+        self.commits = 0
+        self._lock = threading.Lock()
+        self._rejects_lock = threading.Lock()
+        self._error = None
+        self._started = time.perf_counter()
+
+    def rows_per_sec(self, pending: int = 0) -> float:
+        """Insert rate so far, counting `pending` rows of a chunk that is about to commit"""
+        elapsed = time.perf_counter() - self._started
+        return round((self.rows_inserted + pending) / elapsed, 1) if elapsed > 0 else 0.0
+
+    def _put(self, item):
+        while self._error is None:
+            try:
+                self.work.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise self._error
+
+    def _write_chunk(self, db, inserter, seq: int, start_offset: int, end_offset: int, columns: dict, rows: int,
+                     dropped: int, rejected):
+        for attempt in range(settings.INGEST_DEADLOCK_RETRIES + 1):
+            try:
+                return self._commit_chunk(db, inserter, seq, start_offset, end_offset, columns, rows, dropped, rejected)
+            except OperationalError as e:
+                if attempt == settings.INGEST_DEADLOCK_RETRIES or not is_lock_conflict(e):
+                    raise
+                db.rollback()
+                inserter.discard()
+                app_logger.warning(f"Ingest pipeline | job {self.job_id} | chunk {seq} retried after {e.orig}")
+                time.sleep(random.uniform(0.05, 0.2) * (attempt + 1))
+
+    def _commit_chunk(self, db, inserter, seq: int, start_offset: int, end_offset: int, columns: dict, rows: int,
+                      dropped: int, rejected):
+        started = time.perf_counter()
+        counts = inserter.add_columns(columns, duplicates_dropped=dropped)
+        counts["rejected"] += len(rejected)
+        checkpoint = self.tracker.checkpoint_if_next(seq)
+        record_job_progress(
+            db,
+            self.job_id,
+            rows_parsed=rows,
+            rows_inserted=counts["inserted"],
+            rows_merged=counts["merged"],
+            rows_rejected=counts["rejected"],
+            # The counters move after the commit, a retried chunk must not count twice
+            rows_per_sec=self.rows_per_sec(pending=counts["inserted"]),
+            checkpoint=checkpoint,
+        )
+        if checkpoint is None:
+            # Committed ahead of the checkpoint, a resume must not write it again
+            record_committed_chunk(db, self.job_id, start_offset, end_offset, rows)
+        # Applies the staged rollup and sample changes, then the generation bump, and commits
+        inserter.flush()
+        ingest_commit_seconds.observe(time.perf_counter() - started)
+        if not rejected.empty:
+            with self._rejects_lock:
+                append_rejects(self.rejects_path, rejected)
+        for result in ("inserted", "merged", "rejected"):
+            ingest_rows.inc(counts[result], result)
+        with self._lock:
+            self.rows_inserted += counts["inserted"]
+            self.rows_merged += counts["merged"]
+            self.rows_rejected += counts["rejected"]
+            self.rows_invalid += len(rejected)
+            self.commits += 1
+        prefix = self.tracker.complete(seq)
+        if prefix != checkpoint:
+            advance_job_checkpoint(db, self.job_id, prefix)
+
+    def _writer(self):
+        db = SessionLocal()
+        inserter = BulkInserter(
+            db,
+            batch_size=settings.INGEST_BATCH_SIZE,
+            mode=self.mode,
+            index_trigrams=settings.TRIGRAM_INDEX_ENABLED,
+            sample_size=settings.QUERY_SAMPLE_SIZE,
+            commit_log_size=settings.QUERY_COMMIT_LOG_SIZE,
+        )
+        try:
+            while True:
+                item = self.work.get()
+                if item is None:
+                    return
+                # After a failure keep draining so the reader never blocks on a full queue
+                if self._error is not None:
+                    continue
+                try:
+                    self._write_chunk(db, inserter, *item)
+                except Exception as e:
+                    db.rollback()
+                    self._error = e
+        finally:
+            db.close()
+
+    def run(self, tasks) -> dict:
+        """Run parse tasks from `iter_csv_tasks` / `iter_parquet_tasks`"""
+        workers = parse_workers()
+        pool = get_parse_pool() if workers > 1 else None
+        max_in_flight = max(1, workers) * 2
+
+        writers = [
+            threading.Thread(target=self._writer, name=f"ingest-writer-{self.job_id}-{i}", daemon=True)
+            for i in range(max(1, settings.INGEST_WRITER_WORKERS))
+        ]
+        for writer in writers:
+            writer.start()
+
+        in_flight = deque()
+
+        def drain_one():
+            seq, start_offset, end_offset, future = in_flight.popleft()
+            columns, rows, dropped, rejected = future.result()
+            self.tracker.register(seq, end_offset, rows)
+            self._put((seq, start_offset, end_offset, columns, rows, dropped, rejected))
+
+        try:
+            for seq, (function, args, start_offset, end_offset) in enumerate(tasks):
+                if function is None:
+                    # Committed by an earlier run, only the checkpoint has to move past it
+                    self.tracker.register(seq, end_offset, *args)
+                    self.tracker.complete(seq)
+                    continue
+                if pool is not None:
+                    future = pool.submit(function, *args)
+                else:
+                    future = _InlineFuture(function, *args)
+                in_flight.append((seq, start_offset, end_offset, future))
+                if len(in_flight) >= max_in_flight:
+                    drain_one()
+            while in_flight:
+                drain_one()
+        except BaseException as e:
+            if self._error is None:
+                self._error = e
+        finally:
+            for _ in writers:
+                self.work.put(None)
+            for writer in writers:
+                writer.join()
+
+        if self._error is not None:
+            raise self._error
+
+        elapsed = time.perf_counter() - self._started
+        stats = {
+            "rows_inserted": self.rows_inserted,
+            "rows_merged": self.rows_merged,
+            "rows_rejected": self.rows_rejected,
+            "rows_invalid": self.rows_invalid,
+            "commits": self.commits,
+            "parse_workers": workers,
+            "writer_workers": len(writers),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": self.rows_per_sec(),
+        }
+        app_logger.info(f"Ingest pipeline | job {self.job_id} | {stats}")
+        return stats
@@ -0,0 +1,238 @@
+import bisect
+import os
+import threading
+import time
+from sqlalchemy import event
+
+# Latency buckets in seconds, from sub-millisecond queries to multi-second scans
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+THROUGHPUT_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+
+_imported_at = time.perf_counter()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels: tuple, value) -> list:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; an observation is one bisect and three additions"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_value(self, labels: tuple, value) -> list:
+        counts, total, count = value
+        names = self.label_names + ("le",)
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{_format_labels(names, labels + (bound,))} {cumulative}")
+        label_text = _format_labels(self.label_names, labels)
+        lines.append(f"{self.name}_sum{label_text} {round(total, 6)}")
+        lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        """`collect()` refreshes gauges right before each scrape"""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            collect()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route", "status")
+))
+db_query_seconds = registry.register(Histogram(
+    "db_query_duration_seconds", "Statement execution time", ("engine", "statement")
+))
+db_pool_wait_seconds = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("engine",)
+))
+ingest_rows = registry.register(Counter("ingest_rows_total", "Rows processed by ingestion", ("result",)))
+ingest_commit_seconds = registry.register(Histogram(
+    "ingest_commit_duration_seconds", "Time to write and commit one ingested chunk"
+))
+ingest_derived_seconds = registry.register(Counter(
+    "ingest_derived_seconds_total", "Time ingestion spends maintaining a derived table", ("table",)
+))
+ingest_job_rows_per_second = registry.register(Histogram(
+    "ingest_job_rows_per_second", "Insert throughput of finished ingestion jobs", buckets=THROUGHPUT_BUCKETS
+))
+cache_entries = registry.register(Gauge("cache_entries", "Entries held by an in-process cache", ("cache",)))
+cache_hits = registry.register(Gauge("cache_hits", "Lookups answered by an in-process cache", ("cache",)))
+cache_misses = registry.register(Gauge("cache_misses", "Lookups an in-process cache could not answer", ("cache",)))
+process_startup_seconds = registry.register(Gauge(
+    "process_startup_seconds", "Seconds from process start to the app imported and to ready to serve", ("phase",)
+))
+password_hash_tasks = registry.register(Gauge(
+    "password_hash_tasks", "Password hashes by state (running, queued, completed, rejected)", ("state",)
+))
+
+
+def process_uptime() -> float:
+    """Seconds since this process started (from /proc, 10ms resolution), else since this module was imported"""
+    try:
+        with open("/proc/self/stat") as stat:
+            start_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime:
+            return float(uptime.read().split()[0]) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.perf_counter() - _imported_at
+
+
+def register_cache(cache_name: str, cache):
+    """Export a TTLCache's size and hit counts on every scrape"""
+
+    def collect():
+        stats = cache.stats()
+        cache_entries.set(stats["size"], cache_name)
+        cache_hits.set(stats["hits"], cache_name)
+        cache_misses.set(stats["misses"], cache_name)
+
+    registry.register_collector(collect)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request.
+
+    The route label is the matched path template (FastAPI leaves the route
+    in the scope), so /jobs/{job_id}/ is one series however many ids exist.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_holder = {"status": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            http_request_seconds.observe(
+                time.perf_counter() - started,
+                scope.get("method", ""),
+                getattr(route, "path", "unmatched"),
+                status_holder["status"],
+            )
+
+
+def timed_pool(pool_class, engine_name: str):
+    """Subclass of `pool_class` that records how long checkouts wait for a connection"""
+
+    class TimedPool(pool_class):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                db_pool_wait_seconds.observe(time.perf_counter() - started, engine_name)
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+def instrument_engine(engine, engine_name: str):
+    """Time every statement of a (sync) engine; pass `async_engine.sync_engine` for async ones"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_query_seconds.observe(time.perf_counter() - started, engine_name, verb)
+
+    @event.listens_for(engine, "handle_error")
+    def _drop_timer(context):
+        starts = context.connection.info.get("query_started") if context.connection is not None else None
+        if starts:
+            starts.pop()
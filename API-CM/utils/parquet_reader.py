@@ -0,0 +1,46 @@
+from db_module.bulk_insert import CSV_COLUMNS
+from utils.csv_reader import prepare_frame
+
+
+def _parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet uploads need the pyarrow package installed")
+    return pq
+
+
+def prepare_row_group(file_path: str, index: int, mode: str):
+    """Read one row group and prepare it for the writers (runs in a parser process).
+
+    Columns are turned into text so a row group goes through the same
+    validation as a parsed CSV chunk.
+    """
+    parquet_file = _parquet().ParquetFile(file_path)
+    columns = [column for column in CSV_COLUMNS if column in parquet_file.schema_arrow.names]
+    frame = parquet_file.read_row_group(index, columns=columns).to_pandas()
+    for column in columns:
+        frame[column] = frame[column].astype(str).where(frame[column].notna(), None)
+    return prepare_frame(frame, mode)
+
+
+def iter_parquet_tasks(file_path: str, start_row_group: int, mode: str, committed: list = ()):
+    """Parse tasks for the ingest pipeline, one per row group.
+
+    The checkpoint offset of a Parquet job counts row groups, not bytes.
+
+    Args:
+        committed: (start, end, rows) of row groups a previous run committed
+            past the checkpoint, they are not read again
+
+    Yields:
+        (function, args, start offset, end offset); function is None for an
+        already committed row group, with args (rows,)
+    """
+    done = {start: rows for start, end, rows in committed}
+    row_groups = _parquet().ParquetFile(file_path).num_row_groups
+    for index in range(start_row_group, row_groups):
+        if index in done:
+            yield None, (done[index],), index, index + 1
+        else:
+            yield prepare_row_group, (file_path, index, mode), index, index + 1
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from utils.config import get_settings
+from utils.metrics import password_hash_tasks, registry
+from utils.services import app_logger
+
+settings = get_settings()
+
+pwd_context = CryptContext(schemes=["django_pbkdf2_sha256"], deprecated="auto")
+
+
+class PasswordHasher:
+    """Runs PBKDF2 hashing and verification on a small dedicated thread pool.
+
+    hashlib's PBKDF2 releases the GIL, so the event loop keeps serving other
+    requests while a hash runs. At most PASSWORD_HASH_WORKERS hashes run at
+    once and PASSWORD_HASH_MAX_QUEUE more may wait; beyond that callers get
+    a 503 instead of queueing without bound.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_ms_total = 0.0
+        self.run_ms_total = 0.0
+
+    def _run(self, submitted: float, fn, *args):
+        started = time.perf_counter()
+        with self._lock:
+            self.running += 1
+            self.wait_ms_total += (started - submitted) * 1000
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.running -= 1
+                self.pending -= 1
+                self.completed += 1
+                self.run_ms_total += (finished - started) * 1000
+
+    async def submit(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                app_logger.warning(f"Password hashing queue full | {self.pending} pending")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many authentication requests, please retry shortly.",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._run, time.perf_counter(), fn, *args
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.wait_ms_total / self.completed, 3) if self.completed else 0.0,
+                "avg_run_ms": round(self.run_ms_total / self.completed, 3) if self.completed else 0.0,
+            }
+
+
+hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
+
+
+def _collect_hasher_metrics():
+    stats = hasher.stats()
+    for state in ("running", "queued", "completed", "rejected"):
+        password_hash_tasks.set(stats[state], state)
+
+
+registry.register_collector(_collect_hasher_metrics)
+
+
+async def hash_password(password: str) -> str:
+    return await hasher.submit(pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await hasher.submit(pwd_context.verify, plain_password, hashed_password)
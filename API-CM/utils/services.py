@@ -1,27 +1,195 @@
 from loguru import logger as app_logger
+import atexit
+import json
 import os
+import queue
+import random
+import threading
+import traceback
 from utils.config import get_settings
+from utils.metrics import Counter, Gauge, registry
 
 settings = get_settings()
 directory_path = os.getcwd()
 
-_frmt = "{time: YYYY-MM-DD HH:mm:ss.SSS} | {level} | {function} | {message}"
 _log_dir = os.path.join(directory_path, settings.FILE_LOG_DIR)
 
+log_records_dropped = registry.register(Counter(
+    "log_records_dropped_total", "Log records discarded before reaching a file", ("reason",)
+))
+log_queue_depth = registry.register(Gauge("log_queue_depth", "Log records waiting for the writer thread"))
+
+
+def _parse_pairs(value: str) -> dict:
+    """"a=x,b=y" -> {"a": "x", "b": "y"}"""
+    pairs = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            key, val = item.split("=", 1)
+            pairs[key.strip()] = val.strip()
+    return pairs
+
+
+class LogLevels:
+    """Minimum level per logger (module path), changeable while the app runs.
+
+    A record from `query_builder.api` uses the level set for
+    `query_builder.api`, else `query_builder`, else the default.
+    """
+
+    def __init__(self, default: str, overrides: dict):
+        self.default = default
+        self._levels = dict(overrides)
+        self._resolved = {}
+
+    def set(self, name: str, level: str):
+        level = app_logger.level(level.upper()).name  # raises ValueError for unknown levels
+        if name:
+            self._levels[name] = level
+        else:
+            self.default = level
+        self._resolved = {}
+
+    def reset(self, name: str):
+        self._levels.pop(name, None)
+        self._resolved = {}
+
+    def levels(self) -> dict:
+        return {"default": self.default, **self._levels}
+
+    def minimum(self, name: str) -> int:
+        level = self._resolved.get(name)
+        if level is None:
+            level_name = self.default
+            parts = (name or "").split(".")
+            for end in range(len(parts), 0, -1):
+                prefix = ".".join(parts[:end])
+                if prefix in self._levels:
+                    level_name = self._levels[prefix]
+                    break
+            level = self._resolved[name] = app_logger.level(level_name).no
+        return level
+
+
+log_levels = LogLevels(settings.LOG_LEVEL, _parse_pairs(settings.LOG_LEVELS))
+
+# INFO records kept per function, e.g. "query_company_profiles=0.1"; warnings and errors are never sampled
+sample_rates = {function: float(rate) for function, rate in _parse_pairs(settings.LOG_SAMPLE_RATES).items()}
+
+_INFO = app_logger.level("INFO").no
+
+
+def _to_json(record: dict) -> str:
+    entry = {
+        "time": record["time"].isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "process": record["process"].id,
+        "thread": record["thread"].name,
+        "message": record["message"],
+    }
+    extra = {key: value for key, value in record["extra"].items() if key != "sink"}
+    if extra:
+        entry["extra"] = extra
+    if record["exception"] is not None:
+        error_type, error, error_traceback = record["exception"]
+        entry["exception"] = "".join(traceback.format_exception(error_type, error, error_traceback))
+    return json.dumps(entry, default=str, ensure_ascii=False) + "\n"
+
+
+class QueueSink:
+    """Loguru sink that only enqueues; a writer thread formats and writes to disk.
+
+    The queue is bounded: when the writer falls behind, records are dropped
+    and counted (log_records_dropped_total) instead of blocking the caller.
+    The writer re-logs each JSON line with `sink="file"` bound, which only
+    the rotating file handlers accept.
+    """
+
+    def __init__(self, max_size: int):
+        self.queue = queue.Queue(maxsize=max(1, max_size))
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._file_logger = app_logger.bind(sink="file")
+
+    def _ensure_writer(self):
+        # Forked parse workers inherit the sink but not the thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+                self._thread = threading.Thread(target=self._drain, name="log-writer", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def __call__(self, message):
+        self._ensure_writer()
+        try:
+            self.queue.put_nowait(message.record)
+        except queue.Full:
+            log_records_dropped.inc(1, "queue_full")
+
+    def _drain(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            try:
+                self._file_logger.opt(raw=True).log(record["level"].name, _to_json(record))
+            except Exception:
+                log_records_dropped.inc(1, "write_error")
+
+    def close(self):
+        """Write out what is queued, used at interpreter exit"""
+        if self._thread is not None and self._pid == os.getpid():
+            self.queue.put(None)
+            self._thread.join(timeout=5)
+
+
+def _accept(record: dict) -> bool:
+    if record["extra"].get("sink") == "file":
+        return False
+    level = record["level"].no
+    if level < log_levels.minimum(record["name"]):
+        return False
+    if level == _INFO:
+        rate = sample_rates.get(record["function"])
+        if rate is not None and random.random() >= rate:
+            log_records_dropped.inc(1, "sampled")
+            return False
+    return True
+
+
+def _is_written(record: dict) -> bool:
+    return record["extra"].get("sink") == "file"
+
+
+queue_sink = QueueSink(settings.LOG_QUEUE_SIZE)
+registry.register_collector(lambda: log_queue_depth.set(queue_sink.queue.qsize()))
+atexit.register(queue_sink.close)
+
 app_logger.configure(
     handlers=[
+        # Callers only pay for the level check, sampling and an enqueue
+        {"sink": queue_sink, "level": "TRACE", "format": "{message}", "filter": _accept},
         {
             "sink": os.path.join(_log_dir, "application.log"),
             "level": "DEBUG",
-            "colorize": True,
-            "format": _frmt,
+            "colorize": False,
+            "format": "{message}",
+            "filter": _is_written,
             "rotation": "00:00"
         },
         {
             "sink": os.path.join(_log_dir, "application_Trace.log"),
-            "colorize": True,
-            "format": _frmt,
-            "rotation": "00:00",
-            "level": "TRACE"
+            "level": "TRACE",
+            "colorize": False,
+            "format": "{message}",
+            "filter": _is_written,
+            "rotation": "00:00"
         }
-        ])
\ No newline at end of file
+        ])
@@ -0,0 +1,197 @@
+import hashlib
+import io
+import os
+import queue
+import aiofiles
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+
+_EOF = object()
+
+
+class QueueReader(io.RawIOBase):
+    """Binary file object fed chunk by chunk from another thread.
+
+    The upload handler pushes bytes with `feed` while a parser thread reads
+    them, so parsing overlaps with the network transfer. The queue is bounded,
+    which makes a slow parser apply backpressure to the upload.
+    """
+
+    def __init__(self, max_chunks: int = 8):
+        super().__init__()
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._buffer = memoryview(b"")
+        self._eof = False
+        self._error = None
+        self._consumer_closed = False
+
+    def readable(self):
+        return True
+
+    def _put(self, item) -> bool:
+        while not self._consumer_closed:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def feed(self, data: bytes) -> bool:
+        """Producer side; returns False once the reader has gone away"""
+        return self._put(data)
+
+    def finish(self, error: Exception = None):
+        """Producer side; signals end of stream (or an aborted upload)"""
+        self._error = error
+        self._put(_EOF)
+
+    def readinto(self, b) -> int:
+        while not len(self._buffer):
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if item is _EOF:
+                self._eof = True
+                if self._error is not None:
+                    raise self._error
+                return 0
+            self._buffer = memoryview(item)
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        self._consumer_closed = True
+        super().close()
+
+
+class MultipartFileReader:
+    """One file field of a multipart/form-data body, parsed straight off the request stream.
+
+    FastAPI spools a whole multipart body to a temporary file before calling
+    a handler that declares File/Form parameters. Reading `request.stream()`
+    instead lets the handler check limits first and write (or parse) each
+    chunk as it arrives. Parts other than `field_name` are discarded, and
+    the body is not read past the end of the file part.
+    """
+
+    def __init__(self, request: Request, field_name: str = "file"):
+        content_type, options = parse_options_header(request.headers.get("content-type", ""))
+        boundary = options.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+        self.field_name = field_name.encode()
+        self.filename = None
+        self._body = request.stream()
+        self._pending = []
+        self._pending_bytes = 0
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file = False
+        self._file_done = False
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        disposition, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name") == self.field_name and self.filename is None:
+            self._in_file = True
+            self.filename = options.get(b"filename", b"").decode("utf-8", "replace")
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._pending.append(bytes(data[start:end]))
+            self._pending_bytes += end - start
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+
+    async def _feed(self) -> bool:
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            self._parser.finalize()
+            return False
+        self._parser.write(chunk)
+        return True
+
+    async def open(self) -> str:
+        """Read up to the headers of the file part and return its file name"""
+        while self.filename is None:
+            if not await self._feed():
+                raise HTTPException(status_code=400, detail=f"The upload has no '{self.field_name.decode()}' file field")
+        return self.filename
+
+    async def read(self, size: int) -> bytes:
+        """Up to `size` bytes of the file, b"" once it is complete"""
+        while self._pending_bytes < size and not self._file_done:
+            if not await self._feed():
+                raise HTTPException(status_code=400, detail="The upload ended before the file was complete")
+        data = b"".join(self._pending)
+        chunk, rest = data[:size], data[size:]
+        self._pending = [rest] if rest else []
+        self._pending_bytes = len(rest)
+        return chunk
+
+
+def check_content_length(request: Request, max_bytes: int, overhead: int = 64 * 1024):
+    """413 before reading anything when the declared body cannot fit `max_bytes` of file"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + overhead:
+        raise HTTPException(status_code=413, detail=f"File is larger than the {max_bytes} bytes limit")
+
+
+async def stream_upload_to_disk(file, file_path: str, chunk_size: int, max_bytes: int, on_chunk=None):
+    """Copy an upload (anything with an async `read(size)`) to disk in chunks, hashing it on the way.
+
+    A partially written file is removed on failure. Raises 413 when the upload
+    grows beyond `max_bytes`.
+
+    Returns:
+        (size in bytes, sha256 hex digest)
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(file_path, "wb") as out_file:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"File is larger than the {max_bytes} bytes limit")
+                sha256.update(chunk)
+                await out_file.write(chunk)
+                if on_chunk is not None:
+                    await on_chunk(chunk)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return size, sha256.hexdigest()
@@ -0,0 +1,64 @@
+from datetime import datetime
+import pandas as pd
+from models import CompanyProfile
+from schemas.schemas import email_regex
+
+MOBILE_NUMBER_REGEX = r"\d{10}"
+YEAR_FOUNDED_MIN = 1800
+REJECT_REASON_COLUMN = "reject_reason"
+
+# Max lengths of the text columns, straight from the table definition
+_MAX_LENGTHS = {
+    column.name: column.type.length
+    for column in CompanyProfile.__table__.columns
+    if getattr(column.type, "length", None)
+}
+
+
+def validate_chunk(chunk: pd.DataFrame, columns: list):
+    """Validate a whole chunk with vectorized checks.
+
+    Text columns are stripped, required values, column lengths, email and
+    mobile number formats are checked, and year_founded is coerced to an
+    integer within range. Only the first failing rule is reported per row.
+
+    Returns:
+        (valid rows ready to insert, rejected rows with a reject_reason column)
+    """
+    missing = [column for column in columns if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing columns in file: {missing}")
+
+    chunk = chunk[columns].copy()
+    reason = pd.Series(None, index=chunk.index, dtype=object)
+
+    def reject(failed, message):
+        nonlocal reason
+        reason = reason.mask(reason.isna() & failed, message)
+
+    for column in columns:
+        chunk[column] = chunk[column].str.strip()
+        reject(chunk[column].isna() | (chunk[column] == ""), f"{column} is required")
+
+    for column, max_length in _MAX_LENGTHS.items():
+        if column in chunk.columns:
+            reject(chunk[column].str.len() > max_length, f"{column} is longer than {max_length} characters")
+
+    reject(~chunk["email"].str.fullmatch(email_regex).fillna(False).astype(bool), "Invalid Email Format")
+    reject(
+        ~chunk["mobile_number"].str.fullmatch(MOBILE_NUMBER_REGEX).fillna(False).astype(bool),
+        "mobile_number should be 10 digits",
+    )
+
+    year_founded = pd.to_numeric(chunk["year_founded"], errors="coerce")
+    reject(year_founded.isna() | (year_founded % 1 != 0), "year_founded should be a number")
+    reject(
+        (year_founded < YEAR_FOUNDED_MIN) | (year_founded > datetime.utcnow().year),
+        f"year_founded should be between {YEAR_FOUNDED_MIN} and the current year",
+    )
+
+    invalid = reason.notna()
+    rejected = chunk[invalid].assign(**{REJECT_REASON_COLUMN: reason[invalid]})
+    valid = chunk[~invalid]
+    valid = valid.assign(year_founded=year_founded[~invalid].astype("int64"))
+    return valid, rejected